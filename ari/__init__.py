@@ -6,21 +6,66 @@
 """
 
 import ari.client
-import swaggerpy.http_client
+import ari.async_client
+import ari.http
 import urlparse
 
 Client = client.Client
+AsyncClient = async_client.AsyncClient
 
 
-def connect(base_url, username, password):
+def connect(base_url, username, password, **kwargs):
     """Helper method for easily connecting to ARI.
 
     :param base_url: Base URL for Asterisk HTTP server (http://localhost:8088/)
     :param username: ARI username
     :param password: ARI password.
+    :param kwargs: Client options, such as cache_dir, spec or codec (see
+                   Client), and HTTP options, such as pool_maxsize or
+                   timeout (see ari.http.PooledHttpClient).
+    :return:
+    """
+    http_client = build_http_client(base_url, username, password,
+                                    **pop_http_options(kwargs))
+    return Client(base_url, http_client, **kwargs)
+
+
+def connect_async(base_url, username, password, **kwargs):
+    """Helper method for easily connecting to ARI with an AsyncClient.
+
+    :param base_url: Base URL for Asterisk HTTP server (http://localhost:8088/)
+    :param username: ARI username
+    :param password: ARI password.
+    :param kwargs: See AsyncClient and ari.http.PooledHttpClient.
+    :return:
+    """
+    http_client = build_http_client(base_url, username, password,
+                                    **pop_http_options(kwargs))
+    return AsyncClient(base_url, http_client, **kwargs)
+
+
+def build_http_client(base_url, username, password, **kwargs):
+    """Create an HTTP client which authenticates to Asterisk.
+
+    :param base_url: Base URL for Asterisk HTTP server (http://localhost:8088/)
+    :param username: ARI username
+    :param password: ARI password.
+    :param kwargs: Connection pool options. See ari.http.PooledHttpClient.
     :return:
     """
     split = urlparse.urlsplit(base_url)
-    http_client = swaggerpy.http_client.SynchronousHttpClient()
+    http_client = ari.http.PooledHttpClient(**kwargs)
     http_client.set_basic_auth(split.hostname, username, password)
-    return Client(base_url, http_client)
+    return http_client
+
+
+def pop_http_options(kwargs):
+    """Separate the HTTP client options from the Client options.
+
+    :param kwargs: Keyword arguments to connect(); the HTTP options are
+                   removed.
+    :return: HTTP client options.
+    :rtype:  dict
+    """
+    return {name: kwargs.pop(name)
+            for name in ari.http.HTTP_OPTIONS if name in kwargs}
@@ -0,0 +1,267 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Asynchronous ARI client.
+
+The synchronous Client blocks the event loop on every HTTP request a listener
+makes. AsyncClient instead makes its requests from a small pool of worker
+threads, and runs its listeners as coroutines on a single event loop thread,
+so many calls can be in progress at once without a thread per call.
+
+Coroutines are generator functions, in the style of Tornado's gen.coroutine.
+Yielding a future (or a list of futures) suspends the coroutine until the
+future is done; the result is sent back into the generator, or the exception
+is raised at the yield.
+
+::
+
+    def on_start(channel, event):
+        yield channel.answer()
+        playback = yield channel.play(media='sound:hello-world')
+"""
+
+import Queue
+import logging
+import threading
+import types
+
+from concurrent.futures import Future
+
+from ari.client import Client
+from ari.reconnect import iter_messages
+
+log = logging.getLogger(__name__)
+
+
+class AsyncClient(Client):
+    """ARI client with non-blocking operations and coroutine listeners.
+
+    Operations on repositories and domain objects return a
+    concurrent.futures.Future, which resolves to the promoted response.
+
+    Listeners are called on the thread which calls run(). A listener which is
+    a generator function is run as a coroutine (see Task).
+
+    :param base_url: Base URL for accessing Asterisk.
+    :param http_client: HTTP client interface.
+    :param kwargs: See Client. max_workers is the number of threads making
+                   HTTP requests.
+    """
+
+    def __init__(self, base_url, http_client, **kwargs):
+        super(AsyncClient, self).__init__(base_url, http_client, **kwargs)
+        # Callbacks for the event loop, as (fn, args) tuples. None marks the
+        # end of the WebSocket.
+        self.ready = Queue.Queue()
+        self.tasks = set()
+
+    def invoke(self, oper, params):
+        """Invoke a Swagger operation on a worker thread.
+
+        :param oper: Swagger operation.
+        :type  oper: swaggerpy.client.Operation
+        :param params: Operation parameters.
+        :type  params: dict
+        :return: Future for the first class object mapped from HTTP response.
+        :rtype:  concurrent.futures.Future
+        """
+        return self.executor.submit(
+            super(AsyncClient, self).invoke, oper, params)
+
+    def submit_operation(self, method, kwargs):
+        """Invoke an operation; it already returns a future.
+
+        :param method: Repository or domain object method for the operation.
+        :param kwargs: Operation parameters.
+        :return: Future for the first class object mapped from HTTP response.
+        :rtype:  concurrent.futures.Future
+        """
+        return method(**kwargs)
+
+    def call_listener(self, callback, args, kwargs):
+        """Invoke a single event listener, running it as a coroutine if it is
+        a generator function.
+
+        :param callback: Listener callback.
+        :param args: Arguments to pass to callback.
+        :param kwargs: Keyword arguments to pass to callback.
+        :return: Task for coroutines; otherwise, whatever the callback
+                 returns.
+        """
+        result = callback(*args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return self.spawn(result)
+        return result
+
+    def spawn(self, coro):
+        """Start running a coroutine on the event loop.
+
+        Must be called from the event loop thread (for example, from a
+        listener).
+
+        :param coro: Generator to run as a coroutine.
+        :type  coro: types.GeneratorType
+        :return: Future for the result of the coroutine.
+        :rtype:  Task
+        """
+        task = Task(self, coro)
+        self.tasks.add(task)
+        task.step()
+        return task
+
+    def call_soon(self, fn, *args):
+        """Schedule a callback on the event loop. Safe to call from any
+        thread.
+
+        :param fn: Callback.
+        :param args: Arguments to pass to fn.
+        """
+        self.ready.put((fn, args))
+
+    def run(self, apps):
+        """Connect to the WebSocket and run the event loop.
+
+        The WebSocket is read on a separate thread. This method will block
+        until all messages have been received from the WebSocket, and every
+        coroutine has finished.
+
+        :param apps: Application (or list of applications) to connect for
+        :type  apps: str or list of str
+        """
+        if isinstance(apps, list):
+            apps = ','.join(apps)
+        ws = self.swagger.events.eventWebsocket(app=apps)
+        self.websockets.add(ws)
+        errors = []
+        reader = threading.Thread(target=self.__read, args=(ws, errors),
+                                  name='ari-websocket-reader')
+        reader.daemon = True
+        try:
+            self.connected(apps.split(','))
+            reader.start()
+            self.__loop()
+        finally:
+            if self.subscriptions:
+                self.subscriptions.stop()
+            ws.close()
+            self.websockets.remove(ws)
+        if errors:
+            raise errors[0]
+
+    def __read(self, ws, errors):
+        """Drains all messages from a WebSocket onto the event loop.
+
+        :param ws: WebSocket to drain.
+        :param errors: List to append an exception from the WebSocket to.
+        """
+        try:
+            for msg_str in iter_messages(ws):
+                self.call_soon(self.process_message, msg_str)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self.ready.put(None)
+
+    def __loop(self):
+        """Run callbacks until the WebSocket has been drained and there are
+        no more running coroutines.
+        """
+        reading = True
+        while reading or self.tasks:
+            item = self.ready.get()
+            if item is None:
+                reading = False
+                continue
+            fn, args = item
+            # noinspection PyBroadException
+            try:
+                fn(*args)
+            except Exception as e:
+                self.exception_handler(e)
+
+
+class Task(Future):
+    """Future for a coroutine running on an AsyncClient's event loop.
+
+    A coroutine finishes by returning (with a result of None), or by raising
+    StopIteration(result). Exceptions escaping the coroutine are passed to
+    the client's exception_handler, as well as being set on the Task.
+
+    :param client: Client whose event loop runs the coroutine.
+    :type  client: AsyncClient
+    :param coro: Generator to run as a coroutine.
+    """
+
+    def __init__(self, client, coro):
+        super(Task, self).__init__()
+        self.client = client
+        self.coro = coro
+        self.waiting = None
+
+    def step(self, value=None, exc=None):
+        """Resume the coroutine, until its next yield.
+
+        :param value: Value to send into the coroutine.
+        :param exc: Exception to throw into the coroutine instead.
+        """
+        try:
+            if exc is not None:
+                yielded = self.coro.throw(type(exc), exc)
+            else:
+                yielded = self.coro.send(value)
+        except StopIteration as e:
+            self.client.tasks.discard(self)
+            self.set_result(e.args[0] if e.args else None)
+        except Exception as e:
+            self.client.tasks.discard(self)
+            self.set_exception(e)
+            self.client.exception_handler(e)
+        else:
+            self.wait_for(yielded)
+
+    def wait_for(self, yielded):
+        """Suspend the coroutine until the futures it yielded are done.
+
+        :param yielded: Future, or list of futures.
+        """
+        if isinstance(yielded, Future):
+            futures = [yielded]
+        elif isinstance(yielded, (list, tuple)) and \
+                all(isinstance(f, Future) for f in yielded):
+            futures = yielded
+        else:
+            exc = TypeError("Coroutines must yield futures, not %r" %
+                            (yielded,))
+            self.client.call_soon(self.step, None, exc)
+            return
+
+        self.waiting = yielded
+        if not futures:
+            self.client.call_soon(self.resume, yielded)
+        for future in futures:
+            # Done callbacks run on the worker thread; hop back to the loop
+            future.add_done_callback(
+                lambda f: self.client.call_soon(self.resume, yielded))
+
+    def resume(self, yielded):
+        """Resume the coroutine, if all the futures it is waiting for are
+        done.
+
+        :param yielded: The future, or list of futures, that was yielded.
+        """
+        if self.waiting is not yielded:
+            return
+        futures = [yielded] if isinstance(yielded, Future) else yielded
+        if not all(f.done() for f in futures):
+            return
+        self.waiting = None
+
+        for future in futures:
+            if future.exception() is not None:
+                self.step(exc=future.exception())
+                return
+        if isinstance(yielded, Future):
+            self.step(yielded.result())
+        else:
+            self.step([f.result() for f in futures])
@@ -0,0 +1,160 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Cache for the responses of read-only operations.
+"""
+
+import collections
+import threading
+import time
+
+from ari.coalesce import RequestCoalescer
+
+#: Events which invalidate the cached responses of a resource, by event type.
+INVALIDATIONS = {
+    'EndpointStateChange': ('endpoints',),
+    'DeviceStateChanged': ('deviceStates',),
+    'RecordingFinished': ('recordings',),
+}
+
+
+class ResponseCache(object):
+    """Time-limited, size-bounded cache of operation responses.
+
+    Only the GET operations given TTLs are cached, keyed on the operation and
+    its parameters. The least recently used entry is evicted when the cache
+    is full. All of a resource's entries are dropped when it is changed
+    through one of its other operations (such as recordings.deleteStored), or
+    when an event in INVALIDATIONS says it changed.
+
+    As with coalesced requests, the cached objects are shared by all callers,
+    who should not modify them.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    :param ttls: Seconds to cache each operation's responses for, by
+                 resource and operation nickname (i.e. 'sounds.list').
+    :type  ttls: dict
+    :param max_entries: Maximum number of responses to keep.
+    :param invalidations: Resources invalidated by each event type. Defaults
+                          to INVALIDATIONS.
+    :type  invalidations: dict
+    """
+
+    def __init__(self, client, ttls, max_entries=1000, invalidations=None):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # Request key -> (expiry time, resource name, response), least
+        # recently used first
+        self.entries = collections.OrderedDict()
+        # Operation -> resource name, and TTL of the cached ones
+        self.resources = {}
+        self.ttls = {}
+        # Resource name -> number of times it was invalidated, so responses
+        # fetched across an invalidation are not cached
+        self.generations = collections.defaultdict(int)
+        # Invalidations of everything
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        for (name, repo) in client.repositories.items():
+            for (nickname, oper) in repo.operations.items():
+                self.resources[oper] = name
+                ttl = ttls.get('%s.%s' % (name, nickname))
+                if ttl and oper.json['httpMethod'] == 'GET':
+                    self.ttls[oper] = ttl
+        unknown = set(ttls) - set(
+            '%s.%s' % (self.resources[oper], oper.json['nickname'])
+            for oper in self.ttls)
+        if unknown:
+            raise ValueError(
+                "Cannot cache %s" % ', '.join(sorted(unknown)))
+
+        if invalidations is None:
+            invalidations = INVALIDATIONS
+        for (event_type, names) in invalidations.items():
+            client.on_event(
+                event_type, lambda event, names=names: self.invalidate(*names))
+
+    def __repr__(self):
+        return "ResponseCache(%(entries)d entries, %(hits)d hits, " \
+               "%(misses)d misses)" % self.stats()
+
+    def call(self, oper, params, fn):
+        """Gets the response of an operation from the cache, or from fn.
+
+        :param oper: Swagger operation.
+        :param params: Operation parameters.
+        :type  params: dict
+        :param fn: Function making the request, and promoting its response.
+        :return: Cached response, or result of fn.
+        """
+        ttl = self.ttls.get(oper)
+        if ttl is None:
+            result = fn()
+            if oper.json['httpMethod'] != 'GET':
+                self.invalidate(self.resources.get(oper))
+            return result
+
+        key = RequestCoalescer.request_key(oper, params)
+        if key is None:
+            return fn()
+        now = time.time()
+        resource = self.resources[oper]
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry and entry[0] > now:
+                self.entries[key] = entry
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            generation = (self.generation, self.generations[resource])
+
+        result = fn()
+        with self.lock:
+            if generation != (self.generation, self.generations[resource]):
+                # Invalidated while the request was in flight
+                return result
+            self.entries[key] = (now + ttl, resource, result)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def invalidate(self, *names):
+        """Drop the cached responses of resources.
+
+        :param names: Resource names. If none are given, everything is
+                      dropped.
+        """
+        with self.lock:
+            if names:
+                for name in names:
+                    self.generations[name] += 1
+            else:
+                self.generation += 1
+            stale = [key for (key, entry) in self.entries.items()
+                     if not names or entry[1] in names]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """Gets cache statistics.
+
+        :return: Dict with the number of entries, hits, misses, evictions and
+                 invalidated entries.
+        :rtype:  dict
+        """
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
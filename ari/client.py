@@ -5,31 +5,86 @@
 """ARI client library.
 """
 
-import json
+import functools
 import logging
+import re
+import threading
 import urlparse
+import weakref
 import swaggerpy.client
+import ari.spec
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ari.cache import ResponseCache
+from ari.coalesce import RequestCoalescer
+from ari.codec import load_codec
+from ari.dispatch import InlineDispatcher
+from ari.subscriptions import SubscriptionManager
 
 from ari.model import *
+from ari.reconnect import Backoff, CONNECTION_ERRORS, Resynchronizer, \
+    iter_messages
 
 log = logging.getLogger(__name__)
 
+#: Finds the values of "type" fields in a raw event, without decoding it.
+EVENT_TYPE_RE = re.compile(r'"type"\s*:\s*"([^"]*)"')
+
 
 class Client(object):
     """ARI Client object.
 
     :param base_url: Base URL for accessing Asterisk.
     :param http_client: HTTP client interface.
+    :param cache_dir: Optional directory for caching the api-docs between
+                      runs. See ari.spec.SpecCache.
+    :param spec: Optional local api-docs to use instead of downloading them
+                 from Asterisk. See ari.spec.load().
+    :param codec: JSON codec for decoding events and responses. See
+                  ari.codec.load_codec().
+    :param manage_subscriptions: If True, subscribe the running applications
+                                 to objects while they have listeners. See
+                                 ari.subscriptions.SubscriptionManager.
+    :param identity_map: If True, responses and events which refer to an
+                         object which is still in use return that object,
+                         with its JSON refreshed, instead of a new one.
+    :param max_workers: Number of threads making requests for the futures
+                        forms of operations (such as channel.futures.answer()).
+    :param coalesce_reads: If True, identical GET operations made while one
+                           is in flight share its request and result. See
+                           ari.coalesce.RequestCoalescer.
+    :param cache_ttls: Seconds to cache the responses of read-only operations
+                       for, by resource and nickname (i.e. {'sounds.list':
+                       300}). See ari.cache.ResponseCache.
+    :param cache_size: Maximum number of responses to cache.
     """
 
-    def __init__(self, base_url, http_client):
-        url = urlparse.urljoin(base_url, "ari/api-docs/resources.json")
-
-        self.swagger = swaggerpy.client.SwaggerClient(
-            url, http_client=http_client)
+    #: Repository subclass to use for each resource, by name.
+    repository_classes = {}
+    #: Domain classes to promote responses to, by Swagger model id.
+    class_map = CLASS_MAP
+
+    def __init__(self, base_url, http_client, cache_dir=None, spec=None,
+                 codec=None, manage_subscriptions=False, identity_map=False,
+                 max_workers=10, coalesce_reads=False, cache_ttls=None,
+                 cache_size=1000):
+        self.codec = load_codec(codec)
+        self.http_client = http_client
+        # Threads are only started once something is submitted
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.coalescer = None
+        if coalesce_reads:
+            self.coalescer = RequestCoalescer()
+        self.swagger = self.load_api(base_url, http_client, cache_dir, spec)
         self.repositories = {
-            name: Repository(self, name, api)
+            name: self.repository_classes.get(name, Repository)(
+                self, name, api)
             for (name, api) in self.swagger.resources.items()}
+        # Work out how to promote each operation's responses up front
+        for repo in self.repositories.values():
+            for oper in repo.operations.values():
+                oper.promotion = promotion_plan(self, oper.json)
 
         # Extract models out of the events resource
         events = [api['api_declaration']
@@ -40,10 +95,51 @@ class Client(object):
         else:
             self.event_models = {}
 
+        # Domain class -> ari.model.ObjectContext
+        self.object_contexts = {}
+        # (domain class, object id) -> object, for objects still referenced
+        self.identity_map = None
+        self.identity_lock = threading.Lock()
+        if identity_map:
+            self.identity_map = weakref.WeakValueDictionary()
         self.websockets = set()
+        self.closed = threading.Event()
+        # Number of times the WebSocket has been opened, and of those which
+        # were reconnects by run()
+        self.connections = 0
+        self.reconnects = 0
+        self.dispatcher = InlineDispatcher()
+        # Number of messages dropped without decoding, since nothing was
+        # listening for them
+        self.skipped_events = 0
+        # Guards changes to the listener tables, which may be made from
+        # dispatcher threads
+        self.listener_lock = threading.Lock()
         self.event_listeners = {}
+        # 'connect' -> listeners called each time the WebSocket opens
+        self.connect_listeners = {}
+        # Listeners for events about specific objects, indexed by
+        # (event_type, model_id, object id). Each listener has its own
+        # factory_fn, since subclasses of a domain class share its model_id.
+        self.object_listeners = {}
+        # event_type -> model_id -> (id_generator, event fields of that model)
+        self.object_routes = {}
+        # (event_type, model_id) -> number of object listeners using the
+        # route, so routes are removed along with their last listener
+        self.route_counts = {}
+        # (event_type, model_id) -> event fields of that model
+        self.object_fields = {}
+        # id(event) -> {(factory_fn, field): obj}, for events being
+        # dispatched. Shares the promoted objects between listeners.
+        self.promoted = {}
+        self.subscriptions = None
+        if manage_subscriptions:
+            self.subscriptions = SubscriptionManager(self)
         self.exception_handler = \
             lambda ex: log.exception("Event listener threw exception")
+        self.response_cache = None
+        if cache_ttls:
+            self.response_cache = ResponseCache(self, cache_ttls, cache_size)
 
     def __getattr__(self, item):
         """Exposes repositories as fields of the client.
@@ -62,9 +158,32 @@ class Client(object):
         This method will close any currently open WebSockets, and close the
         underlying Swaggerclient.
         """
+        self.closed.set()
         for ws in self.websockets:
             ws.send_close()
         self.swagger.close()
+        if self.subscriptions:
+            self.subscriptions.close()
+        self.executor.shutdown(wait=False)
+
+    def load_api(self, base_url, http_client, cache_dir, spec):
+        """Load the Swagger API for the client.
+
+        :param base_url: Base URL for accessing Asterisk.
+        :param http_client: HTTP client interface.
+        :param cache_dir: Optional api-docs cache directory.
+        :param spec: Optional local api-docs.
+        :return: Swagger client.
+        :rtype:  swaggerpy.client.SwaggerClient
+        """
+        url = urlparse.urljoin(base_url, "ari/api-docs/resources.json")
+        api_docs = url
+        if spec is not None:
+            api_docs = ari.spec.load(spec, base_url)
+        elif cache_dir:
+            api_docs = ari.spec.SpecCache(cache_dir).load(http_client, url)
+        return swaggerpy.client.SwaggerClient(
+            api_docs, http_client=http_client)
 
     def get_repo(self, name):
         """Get a specific repo by name.
@@ -75,50 +194,378 @@ class Client(object):
         """
         return self.repositories.get(name)
 
-    def __run(self, ws):
-        """Drains all messages from a WebSocket, sending them to the client's
-        listeners.
+    def __run(self, apps, resync=None, backoff=None, reconnect=False):
+        """Connect to the WebSocket, and drain all of its messages, sending
+        them to the client's listeners.
+
+        :param apps: Applications to connect for.
+        :type  apps: list of str
+        :param resync: Resynchronizer to run once connected.
+        :type  resync: ari.reconnect.Resynchronizer
+        :param backoff: Reconnect delays, reset once a message is received.
+        :type  backoff: ari.reconnect.Backoff
+        :param reconnect: True if this connection replaces an earlier one.
+        """
+        ws = self.swagger.events.eventWebsocket(app=','.join(apps))
+        self.websockets.add(ws)
+        self.connections += 1
+        if reconnect:
+            self.reconnects += 1
+        try:
+            self.connected(apps)
+            if resync:
+                resync.resync(apps)
+            for msg_str in iter_messages(ws):
+                if backoff:
+                    backoff.reset()
+                self.process_message(msg_str)
+        finally:
+            if self.subscriptions:
+                self.subscriptions.stop()
+            ws.close()
+            self.websockets.remove(ws)
 
-        :param ws: WebSocket to drain.
+    def __run_reconnecting(self, apps, backoff, resync):
+        """Run the WebSocket, reconnecting whenever it drops, until the
+        client is closed.
+
+        Each reconnect waits for the backoff's next delay, whether the
+        WebSocket failed or was closed by Asterisk. The delays only start
+        over once a connection has received a message, so a server which
+        accepts and then closes connections is not retried in a tight loop.
+
+        :param apps: Applications to connect for.
+        :type  apps: list of str
+        :param backoff: Delays between attempts.
+        :type  backoff: ari.reconnect.Backoff
+        :param resync: Resynchronizer to run after each connect.
+        :type  resync: ari.reconnect.Resynchronizer
         """
-        # TypeChecker false positive on iter(callable, sentinel) -> iterator
-        # Fixed in plugin v3.0.1
-        # noinspection PyTypeChecker
-        for msg_str in iter(lambda: ws.recv(), None):
-            msg_json = json.loads(msg_str)
-            if not isinstance(msg_json, dict) or 'type' not in msg_json:
-                log.error("Invalid event: %s" % msg_str)
+        first = self.connections
+        while not self.closed.is_set():
+            try:
+                self.__run(apps, resync, backoff, self.connections > first)
+            except CONNECTION_ERRORS:
+                if self.response_cache:
+                    # Events may have been missed
+                    self.response_cache.invalidate()
+                if self.closed.is_set():
+                    break
+                delay = backoff.next_delay()
+                if delay is None:
+                    raise
+                log.warning("Event WebSocket failed; retrying in %.2fs",
+                            delay, exc_info=True)
+                self.closed.wait(delay)
                 continue
+            if self.response_cache:
+                # Events may have been missed
+                self.response_cache.invalidate()
+            if self.closed.is_set():
+                break
+            delay = backoff.next_delay()
+            if delay is None:
+                log.error("Event WebSocket closed; giving up")
+                break
+            log.warning("Event WebSocket closed; reconnecting in %.2fs",
+                        delay)
+            self.closed.wait(delay)
+
+    def process_message(self, msg_str):
+        """Decode a message received from the WebSocket, and send it to the
+        client's listeners.
+
+        Messages for event types that have no listeners are dropped without
+        being decoded, and counted in skipped_events.
+
+        :param msg_str: Message, as received from the WebSocket.
+        :type  msg_str: str
+        """
+        if self.dispatcher.local_listeners:
+            # Nested objects may have "type" fields too, so only skip the
+            # message if none of them could be the event's type
+            event_types = EVENT_TYPE_RE.findall(msg_str)
+            if event_types and not any(
+                    t in self.event_listeners or t in self.object_routes
+                    for t in event_types):
+                self.skipped_events += 1
+                return
+
+        msg_json = self.codec.loads(msg_str)
+        if not isinstance(msg_json, dict) or 'type' not in msg_json:
+            log.error("Invalid event: %s" % msg_str)
+            return
+
+        self.dispatch_event(msg_json)
+
+    def dispatch_event(self, event):
+        """Send a decoded event to the client's listeners, through the
+        client's dispatcher.
+
+        :param event: Event.
+        :type  event: dict
+        """
+        self.dispatcher.submit(event, self.__dispatch)
+
+    def __dispatch(self, event):
+        """Send an event to the client's listeners.
+
+        Listeners registered with on_event() and its variants receive every
+        event of their type. Listeners for specific objects are looked up in
+        the object_listeners index, so only the listeners for objects which
+        the event references are called.
 
-            listeners = list(self.event_listeners.get(msg_json['type'], []))
-            for listener in listeners:
+        :param event: Event.
+        :type  event: dict
+        """
+        self.promoted[id(event)] = {}
+        try:
+            calls = [(callback, (event,) + tuple(args or ()), kwargs or {})
+                     for (callback, args, kwargs)
+                     in list(self.event_listeners.get(event['type'], []))]
+            # noinspection PyBroadException
+            try:
+                calls.extend(self.__object_calls(event))
+            except Exception as e:
+                self.exception_handler(e)
+
+            for callback, args, kwargs in calls:
                 # noinspection PyBroadException
                 try:
-                    callback, args, kwargs = listener
-                    args = args or ()
-                    kwargs = kwargs or {}
-                    callback(msg_json, *args, **kwargs)
+                    self.call_listener(callback, args, kwargs)
                 except Exception as e:
                     self.exception_handler(e)
+        finally:
+            del self.promoted[id(event)]
+
+    def call_listener(self, callback, args, kwargs):
+        """Invoke a single event listener.
+
+        :param callback: Listener callback.
+        :param args: Arguments to pass to callback.
+        :param kwargs: Keyword arguments to pass to callback.
+        :return: Whatever the callback returns.
+        """
+        return callback(*args, **kwargs)
+
+    def invoke(self, oper, params, fresh=False):
+        """Invoke a Swagger operation, promoting the HTTP response to a first
+        class object.
+
+        All operations of repositories and domain objects go through this
+        method.
+
+        :param oper: Swagger operation.
+        :type  oper: swaggerpy.client.Operation
+        :param params: Operation parameters.
+        :type  params: dict
+        :param fresh: If True, always make a new request, bypassing the
+                      response cache and request coalescing.
+        :return: First class object mapped from HTTP response.
+        """
+        if fresh:
+            return oper.promotion(oper(**params))
+        if self.response_cache:
+            return self.response_cache.call(
+                oper, params, functools.partial(self.__request, oper, params))
+        return self.__request(oper, params)
+
+    def __request(self, oper, params):
+        """Make the HTTP request for an operation, and promote its response.
+
+        :param oper: Swagger operation.
+        :type  oper: swaggerpy.client.Operation
+        :param params: Operation parameters.
+        :type  params: dict
+        :return: First class object mapped from HTTP response.
+        """
+        if self.coalescer and oper.json['httpMethod'] == 'GET':
+            key = self.coalescer.request_key(oper, params)
+            if key is not None:
+                return self.coalescer.call(
+                    key, lambda: oper.promotion(oper(**params)))
+        return oper.promotion(oper(**params))
+
+    def submit_operation(self, method, kwargs):
+        """Invoke an operation on the client's worker threads.
+
+        This is how the futures forms of operations are invoked. Since the
+        request is made on another thread, a listener may wait for the
+        result without blocking other requests.
+
+        :param method: Repository or domain object method for the operation.
+        :param kwargs: Operation parameters.
+        :return: Future for the first class object mapped from HTTP response.
+        :rtype:  concurrent.futures.Future
+        """
+        return self.executor.submit(method, **kwargs)
+
+    def build_object(self, factory_fn, obj_json):
+        """Create a domain object from its JSON.
+
+        All domain objects for responses and events are created through this
+        method. With the identity map enabled, an object which is still
+        referenced is reused, and its JSON replaced by obj_json.
 
-    def run(self, apps):
+        :param factory_fn: Domain class.
+        :param obj_json: JSON representation of the object.
+        :type  obj_json: dict
+        :return: Domain object.
+        """
+        if self.identity_map is None:
+            return factory_fn(self, obj_json)
+
+        key = (factory_fn, factory_fn.id_generator.id_as_str(obj_json))
+        with self.identity_lock:
+            obj = self.identity_map.get(key)
+            if obj is None:
+                obj = factory_fn(self, obj_json)
+                self.identity_map[key] = obj
+            else:
+                obj.json = obj_json
+        return obj
+
+    def __object_calls(self, event):
+        """Find the calls to make for listeners of the objects referenced by
+        an event.
+
+        :param event: Event.
+        :type  event: dict
+        :return: List of (callback, args, kwargs) tuples.
+        """
+        event_type = event['type']
+        routes = self.object_routes.get(event_type, {})
+        calls = []
+        for model_id, (id_generator, obj_fields) in routes.items():
+            obj_ids = []
+            for obj_field in obj_fields:
+                if event.get(obj_field):
+                    obj_id = id_generator.id_as_str(event[obj_field])
+                    if obj_id not in obj_ids:
+                        obj_ids.append(obj_id)
+            for obj_id in obj_ids:
+                for (callback, args, kwargs, factory_fn) in list(
+                        self.object_listeners.get(
+                            (event_type, model_id, obj_id), [])):
+                    obj = self.__extract_objects(event, factory_fn,
+                                                 obj_fields)
+                    calls.append(
+                        (callback, (obj, event) + tuple(args), kwargs))
+        return calls
+
+    def __extract_objects(self, event, factory_fn, obj_fields):
+        """Extract objects of a given type from an event.
+
+        While the event is being dispatched, each field is promoted at most
+        once, and the objects are shared by all of the event's listeners.
+
+        :param event: Event
+        :param factory_fn: Function for creating objects from JSON.
+        :param obj_fields: Fields of the event which hold the objects.
+        :return: The object, or a dict of field name to object if the event
+                 model has several fields of the object's type.
+        """
+        promoted = self.promoted.get(id(event), {})
+        # Extract the fields which are of the expected type
+        obj = {}
+        for obj_field in obj_fields:
+            if event.get(obj_field):
+                key = (factory_fn, obj_field)
+                if key not in promoted:
+                    promoted[key] = self.build_object(
+                        factory_fn, event[obj_field])
+                obj[obj_field] = promoted[key]
+        # If there's only one field in the schema, just pass that along
+        if len(obj_fields) == 1:
+            if obj:
+                obj = obj.values()[0]
+            else:
+                obj = None
+        return obj
+
+    def run(self, apps, dispatcher=None, reconnect=False, resync=True):
         """Connect to the WebSocket and begin processing messages.
 
         This method will block until all messages have been received from the
         WebSocket, or until this client has been closed.
 
+        With reconnect, the WebSocket is instead reconnected whenever it
+        closes or fails, after a jittered delay, until this client has been
+        closed. Listeners stay registered throughout. Unless resync is False,
+        the channels and bridges are listed after each reconnect, and
+        listeners are sent the created and destroyed events they missed (see
+        ari.reconnect.Resynchronizer).
+
+        By default, listeners are called on the calling thread. A dispatcher
+        (such as ari.dispatch.ThreadPoolDispatcher) may be given to call them
+        elsewhere; it is stopped, finishing any queued events, before this
+        method returns.
+
         :param apps: Application (or list of applications) to connect for
         :type  apps: str or list of str
+        :param dispatcher: Optional strategy for calling the listeners.
+        :type  dispatcher: ari.dispatch.Dispatcher
+        :param reconnect: True, or an ari.reconnect.Backoff, to reconnect the
+                          WebSocket until this client is closed.
+        :param resync: If True, catch listeners up after reconnecting.
         """
-        if isinstance(apps, list):
-            apps = ','.join(apps)
-        ws = self.swagger.events.eventWebsocket(app=apps)
-        self.websockets.add(ws)
+        if not isinstance(apps, list):
+            apps = apps.split(',')
+        previous_dispatcher = self.dispatcher
+        if dispatcher:
+            self.dispatcher = dispatcher
+        self.dispatcher.start()
+        resynchronizer = None
         try:
-            self.__run(ws)
+            if not reconnect:
+                self.__run(apps)
+                return
+            if reconnect is True:
+                reconnect = Backoff()
+            if resync:
+                resynchronizer = Resynchronizer(self)
+                resynchronizer.start()
+            self.__run_reconnecting(apps, reconnect, resynchronizer)
         finally:
-            ws.close()
-            self.websockets.remove(ws)
+            if resynchronizer:
+                resynchronizer.stop()
+            self.dispatcher.stop()
+            self.dispatcher = previous_dispatcher
+
+    def connected(self, apps):
+        """Prepare the applications once the event WebSocket is open, and
+        before its events are dispatched: start managing their subscriptions,
+        and call the connect listeners.
+
+        :param apps: Applications connected for.
+        :type  apps: list of str
+        """
+        if self.subscriptions:
+            self.subscriptions.start(apps)
+        with self.listener_lock:
+            callbacks = list(self.connect_listeners.get('connect', ()))
+        for (connect_cb, args, kwargs) in callbacks:
+            connect_cb(apps, *args, **kwargs)
+
+    def on_connect(self, connect_cb, *args, **kwargs):
+        """Register callback for each time the event WebSocket is opened,
+        including reconnects.
+
+        Applications can only change their subscriptions while they are
+        connected, so this is where to make them.
+
+        :param connect_cb: Callback function
+        :type  connect_cb: (list of str) -> None
+        :param args: Arguments to pass to connect_cb
+        :param kwargs: Keyword arguments to pass to connect_cb
+        """
+        callback_obj = (connect_cb, args, kwargs)
+        with self.listener_lock:
+            self.connect_listeners.setdefault('connect', []).append(
+                callback_obj)
+        return EventUnsubscriber(
+            self.listener_lock, self.connect_listeners, 'connect',
+            callback_obj)
 
     def on_event(self, event_type, event_cb, *args, **kwargs):
         """Register callback for events with given type.
@@ -129,25 +576,16 @@ class Client(object):
         :param args: Arguments to pass to event_cb
         :param kwargs: Keyword arguments to pass to event_cb
         """
-        listeners = self.event_listeners.setdefault(event_type, list())
-        for cb in listeners:
-            if event_cb == cb[0]:
-                listeners.remove(cb)
         callback_obj = (event_cb, args, kwargs)
-        listeners.append(callback_obj)
-        client = self
-
-        class EventUnsubscriber(object):
-            """Class to allow events to be unsubscribed.
-            """
-
-            def close(self):
-                """Unsubscribe the associated event callback.
-                """
-                if callback_obj in client.event_listeners[event_type]:
-                    client.event_listeners[event_type].remove(callback_obj)
-
-        return EventUnsubscriber()
+        with self.listener_lock:
+            listeners = self.event_listeners.setdefault(event_type, list())
+            for cb in list(listeners):
+                if event_cb == cb[0]:
+                    listeners.remove(cb)
+            listeners.append(callback_obj)
+        return EventUnsubscriber(
+            self.listener_lock, self.event_listeners, event_type,
+            callback_obj)
 
     def on_object_event(self, event_type, event_cb, factory_fn, model_id,
                         *args, **kwargs):
@@ -157,6 +595,9 @@ class Client(object):
         If multiple fields of the event have the type model_id, a dict is
         passed mapping the field name to the model object.
 
+        The model objects are created once per event, and shared by all of
+        the event's listeners.
+
         :param event_type: String name of the event to register for.
         :param event_cb: Callback function
         :type  event_cb: (Obj, dict) -> None or (dict[str, Obj], dict) ->
@@ -165,17 +606,7 @@ class Client(object):
         :param args: Arguments to pass to event_cb
         :param kwargs: Keyword arguments to pass to event_cb
         """
-        # Find the associated model from the Swagger declaration
-        event_model = self.event_models.get(event_type)
-        if not event_model:
-            raise ValueError("Cannot find event model '%s'" % event_type)
-
-        # Extract the fields that are of the expected type
-        obj_fields = [k for (k, v) in event_model['properties'].items()
-                      if v['type'] == model_id]
-        if not obj_fields:
-            raise ValueError("Event model '%s' has no fields of type %s"
-                             % (event_type, model_id))
+        obj_fields = self.__object_fields(event_type, model_id)
 
         def extract_objects(event, *args, **kwargs):
             """Extract objects of a given type from an event.
@@ -185,22 +616,101 @@ class Client(object):
             :param kwargs: Keyword arguments to pass to the event
                                       callback
             """
-            # Extract the fields which are of the expected type
-            obj = {obj_field: factory_fn(self, event[obj_field])
-                   for obj_field in obj_fields
-                   if event.get(obj_field)}
-            # If there's only one field in the schema, just pass that along
-            if len(obj_fields) == 1:
-                if obj:
-                    obj = obj.values()[0]
-                else:
-                    obj = None
-            event_cb(obj, event, *args, **kwargs)
+            obj = self.__extract_objects(event, factory_fn, obj_fields)
+            return event_cb(obj, event, *args, **kwargs)
 
         return self.on_event(event_type, extract_objects,
                              *args,
                              **kwargs)
 
+    def on_object_id_event(self, event_type, event_cb, factory_fn, model_id,
+                           obj_id, *args, **kwargs):
+        """Register callback for events with the given type, which reference
+        a specific object.
+
+        Unlike on_object_event(), the callback is only invoked for events
+        with a model_id field identifying obj_id. These listeners are indexed
+        by object id, so the cost of dispatching an event does not grow with
+        the number of objects that have listeners.
+
+        If the client manages subscriptions, the running applications are
+        subscribed to the object until its last listener is closed.
+
+        :param event_type: String name of the event to register for.
+        :param event_cb: Callback function
+        :type  event_cb: (Obj, dict) -> None or (dict[str, Obj], dict) ->
+        :param factory_fn: Class for creating Obj from JSON; its id_generator
+                           is used to identify the objects in events.
+        :param model_id: String id for Obj from Swagger models.
+        :param obj_id: Id of the object, as given by id_generator.id_as_str.
+        :param args: Arguments to pass to event_cb
+        :param kwargs: Keyword arguments to pass to event_cb
+        """
+        obj_fields = self.__object_fields(event_type, model_id)
+        key = (event_type, model_id, obj_id)
+        callback_obj = (event_cb, args, kwargs, factory_fn)
+        with self.listener_lock:
+            routes = self.object_routes.setdefault(event_type, {})
+            routes.setdefault(model_id,
+                              (factory_fn.id_generator, obj_fields))
+            route = (event_type, model_id)
+            self.route_counts[route] = self.route_counts.get(route, 0) + 1
+            self.object_listeners.setdefault(key, list()).append(callback_obj)
+        if self.subscriptions:
+            self.subscriptions.acquire(model_id, obj_id)
+        return EventUnsubscriber(
+            self.listener_lock, self.object_listeners, key, callback_obj,
+            functools.partial(self.__release_object_listener, event_type,
+                              model_id, obj_id))
+
+    def __release_object_listener(self, event_type, model_id, obj_id):
+        """Clean up after an object listener has been closed.
+
+        The event type's route for the model is removed with its last
+        listener, so that events of that type can be skipped again.
+
+        :param event_type: String name of the event.
+        :param model_id: String id for Obj from Swagger models.
+        :param obj_id: Id of the object.
+        """
+        with self.listener_lock:
+            route = (event_type, model_id)
+            self.route_counts[route] -= 1
+            if not self.route_counts[route]:
+                del self.route_counts[route]
+                routes = self.object_routes[event_type]
+                del routes[model_id]
+                if not routes:
+                    del self.object_routes[event_type]
+        if self.subscriptions:
+            self.subscriptions.release(model_id, obj_id)
+
+    def __object_fields(self, event_type, model_id):
+        """Find the fields of an event which are of the given model.
+
+        :param event_type: String name of the event.
+        :param model_id: String id for Obj from Swagger models.
+        :return: List of field names.
+        :raises ValueError: If there are no such fields.
+        """
+        obj_fields = self.object_fields.get((event_type, model_id))
+        if obj_fields:
+            return obj_fields
+
+        # Find the associated model from the Swagger declaration
+        event_model = self.event_models.get(event_type)
+        if not event_model:
+            raise ValueError("Cannot find event model '%s'" % event_type)
+
+        # Extract the fields that are of the expected type
+        obj_fields = [k for (k, v) in event_model['properties'].items()
+                      if v['type'] == model_id]
+        if not obj_fields:
+            raise ValueError("Event model '%s' has no fields of type %s"
+                             % (event_type, model_id))
+        self.object_fields[(event_type, model_id)] = obj_fields
+        return obj_fields
+
     def on_channel_event(self, event_type, fn, *args, **kwargs):
         """Register callback for Channel related events
 
@@ -297,3 +807,34 @@ class Client(object):
         return self.on_object_event(event_type, fn, Sound, 'Sound',
                                     *args, **kwargs)
 
+
+class EventUnsubscriber(object):
+    """Class to allow events to be unsubscribed.
+
+    :param lock: Lock guarding changes to listeners.
+    :param listeners: Dict of listener lists the callback was added to.
+    :param key: Key of the callback's list in listeners.
+    :param callback_obj: The registered (callback, args, kwargs) tuple.
+    :param on_close: Optional function to call once the callback has been
+                     removed.
+    """
+
+    def __init__(self, lock, listeners, key, callback_obj, on_close=None):
+        self.lock = lock
+        self.listeners = listeners
+        self.key = key
+        self.callback_obj = callback_obj
+        self.on_close = on_close
+
+    def close(self):
+        """Unsubscribe the associated event callback.
+        """
+        with self.lock:
+            callbacks = self.listeners.get(self.key, [])
+            if self.callback_obj not in callbacks:
+                return
+            callbacks.remove(self.callback_obj)
+            if not callbacks:
+                del self.listeners[self.key]
+        if self.on_close:
+            self.on_close()
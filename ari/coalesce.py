@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Coalescing of identical concurrent read requests.
+"""
+
+import threading
+
+from concurrent.futures import CancelledError, Future
+
+
+class RequestCoalescer(object):
+    """Shares one in-flight request among identical concurrent calls.
+
+    When a call is made while an identical one (same operation, same
+    parameters) is still waiting on its response, it waits for that
+    response instead of making its own request, and gets the same promoted
+    result. Once a response has arrived, the next call makes a new request;
+    nothing is cached.
+
+    Since the result is shared, callers should not modify it (for example, a
+    list returned by channels.list()).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Request key -> Future for the in-flight request
+        self.in_flight = {}
+        # Requests made, and calls which shared another call's request
+        self.requests = 0
+        self.saved = 0
+
+    def __repr__(self):
+        return "RequestCoalescer(%(requests)d requests, %(saved)d saved)" % \
+            self.stats()
+
+    @staticmethod
+    def request_key(oper, params):
+        """Gets the key identifying a request.
+
+        :param oper: Swagger operation.
+        :param params: Operation parameters.
+        :type  params: dict
+        :return: Hashable key, or None if the parameters are not hashable.
+        """
+        key = (oper, tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for (name, value) in params.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def call(self, key, fn):
+        """Call fn, unless an identical call is in flight; then wait for, and
+        return, its result instead.
+
+        :param key: Request key, from request_key().
+        :param fn: Function making the request, and promoting its response.
+        :return: Result of fn, or of the identical call.
+        :raises: Whatever fn raised.
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.saved += 1
+                return_shared = True
+            else:
+                future = self.in_flight[key] = Future()
+                self.requests += 1
+                return_shared = False
+        if return_shared:
+            try:
+                return future.result()
+            except CancelledError:
+                # The request was interrupted; make another
+                return self.call(key, fn)
+
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self.__finish(key)
+            # Not done if fn was interrupted by a BaseException, such as
+            # KeyboardInterrupt, which the waiting calls should not raise
+            future.cancel()
+
+    def stats(self):
+        """Gets coalescing statistics.
+
+        :return: Dict with the number of requests made, and of calls which
+                 shared an in-flight request instead of making their own.
+        :rtype:  dict
+        """
+        with self.lock:
+            return {'requests': self.requests, 'saved': self.saved}
+
+    def __finish(self, key):
+        """Stop sharing a request, so that later calls make their own.
+
+        :param key: Request key.
+        """
+        with self.lock:
+            del self.in_flight[key]
@@ -0,0 +1,44 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""JSON codecs for decoding events and responses.
+
+A codec is any object with json-compatible loads() and dumps() functions,
+such as the json, simplejson or ujson modules.
+"""
+
+import importlib
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+#: Codecs tried by load_codec('fastest'), in order of preference.
+FAST_CODECS = ('ujson', 'simplejson')
+
+
+def load_codec(codec=None):
+    """Gets a JSON codec.
+
+    :param codec: None for the stdlib json module; 'fastest' for the first
+                  installed codec from FAST_CODECS; the name of a codec
+                  module; or a codec object, which is returned as is. Codecs
+                  which are not installed fall back to the json module.
+    :return: Codec.
+    """
+    if codec is None:
+        return json
+    if not isinstance(codec, basestring):
+        if not (hasattr(codec, 'loads') and hasattr(codec, 'dumps')):
+            raise TypeError("%r is not a JSON codec" % (codec,))
+        return codec
+
+    names = FAST_CODECS if codec == 'fastest' else (codec,)
+    for name in names:
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            pass
+    log.warning("JSON codec %s not installed; using json" % codec)
+    return json
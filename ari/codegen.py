@@ -0,0 +1,523 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Generates static ARI client modules from the api-docs.
+
+A generated module has a Repository subclass for each resource, and a
+subclass of each domain class, with explicit methods for their operations.
+Clients built from it with GeneratedClient skip parsing the api-docs at
+startup, and calls skip the __getattr__ dispatch; responses are promoted and
+events are dispatched exactly as they are for ari.client.Client.
+
+::
+
+    $ ari-codegen /path/to/rest-api ari_asterisk12.py
+
+The generated module has its own connect() function::
+
+    import ari_asterisk12
+    client = ari_asterisk12.connect('http://localhost:8088/', 'hey',
+                                    'peekaboo')
+"""
+
+import io
+import keyword
+import logging
+import os
+import pprint
+import re
+import sys
+import textwrap
+import urlparse
+
+import ari.model
+import ari.spec
+
+from ari.client import Client
+
+log = logging.getLogger(__name__)
+
+#: Domain classes which generated modules subclass.
+DOMAIN_CLASSES = (
+    ari.model.Bridge,
+    ari.model.Channel,
+    ari.model.DeviceState,
+    ari.model.Endpoint,
+    ari.model.LiveRecording,
+    ari.model.Mailbox,
+    ari.model.Playback,
+    ari.model.Sound,
+    ari.model.StoredRecording,
+)
+
+#: Operation fields kept in generated modules.
+OPERATION_FIELDS = ('nickname', 'httpMethod', 'responseClass', 'is_websocket')
+
+#: Parameter fields kept in generated modules.
+PARAMETER_FIELDS = ('name', 'paramType', 'required')
+
+
+class StaticOperation(object):
+    """Operation of a generated module, standing in for
+    swaggerpy.client.Operation.
+
+    :param base_path: URL of the ARI API (i.e., http://localhost:8088/ari).
+    :param path: Path of the operation, relative to base_path.
+    :param operation_json: Operation from the generated module.
+    :param http_client: HTTP client interface.
+    """
+
+    def __init__(self, base_path, path, operation_json, http_client):
+        self.json = operation_json
+        self.http_client = http_client
+        self.uri = base_path + path
+        # Precompute the URL template, i.e. /channels/%(channelId)s
+        self.template = re.sub(r'\{(\w+)\}', r'%(\1)s',
+                               self.uri.replace('%', '%%'))
+        if self.json['is_websocket']:
+            self.template = re.sub('^http', 'ws', self.template)
+        self.path_params = [p['name'] for p in self.json['parameters']
+                            if p['paramType'] == 'path']
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.json['nickname'])
+
+    def __call__(self, **kwargs):
+        """Invoke ARI operation.
+
+        :param kwargs: ARI operation arguments.
+        :return: Implementation specific response or WebSocket connection
+        """
+        params = {}
+        for (name, value) in kwargs.items():
+            if value is None:
+                continue
+            if isinstance(value, list):
+                value = ",".join(value)
+            params[name] = value
+        try:
+            uri = self.template % {
+                name: str(params.pop(name)) for name in self.path_params}
+        except KeyError as e:
+            raise TypeError("Missing required parameter '%s' for '%s'" %
+                            (e.args[0], self.json['nickname']))
+
+        method = self.json['httpMethod']
+        log.info("%s %s(%r)", method, uri, params)
+        if self.json['is_websocket']:
+            return self.http_client.ws_connect(uri, params=params)
+        return self.http_client.request(method, uri, params=params)
+
+
+class StaticResource(object):
+    """Resource of a generated module, standing in for
+    swaggerpy.client.Resource.
+
+    :param name: Resource name.
+    :param operations: Dict of nickname to StaticOperation.
+    """
+
+    def __init__(self, name, operations):
+        self.name = name
+        self.operations = operations
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.name)
+
+    def __getattr__(self, item):
+        """Promote operations to be object fields.
+
+        :param item: Name of the attribute to get.
+        """
+        oper = self.operations.get(item)
+        if not oper:
+            raise AttributeError("Resource '%s' has no operation '%s'" %
+                                 (self.name, item))
+        return oper
+
+
+class StaticApi(object):
+    """API of a generated module, standing in for
+    swaggerpy.client.SwaggerClient.
+
+    :param module: Generated module.
+    :param base_url: Base URL for accessing Asterisk.
+    :param http_client: HTTP client interface.
+    """
+
+    def __init__(self, module, base_url, http_client):
+        self.http_client = http_client
+        base_path = urlparse.urljoin(base_url, 'ari')
+        self.resources = {
+            name: StaticResource(name, {
+                nickname: StaticOperation(base_path, path, oper, http_client)
+                for (nickname, (path, oper)) in operations.items()})
+            for (name, operations) in module.OPERATIONS.items()}
+        # Only the event models are needed from the api-docs
+        self.api_docs = {'apis': [{
+            'name': 'events',
+            'api_declaration': {'models': module.EVENT_MODELS}}]}
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, sorted(self.resources))
+
+    def __getattr__(self, item):
+        """Promote resource objects to be client fields.
+
+        :param item: Name of the attribute to get.
+        :return: Resource object.
+        """
+        resource = self.resources.get(item)
+        if not resource:
+            raise AttributeError("API has no resource '%s'" % item)
+        return resource
+
+    def get_resource(self, name):
+        """Gets a resource by name.
+
+        :param name: Name of the resource to get
+        :rtype: StaticResource
+        :return: Resource, or None if not found.
+        """
+        return self.resources.get(name)
+
+    def close(self):
+        """Close the HTTP client.
+        """
+        self.http_client.close()
+
+
+class GeneratedClient(Client):
+    """ARI client built from a module generated by ari-codegen.
+
+    Responses and events are promoted to the module's domain classes.
+
+    :param module: Generated module.
+    :param base_url: Base URL for accessing Asterisk.
+    :param http_client: HTTP client interface.
+    :param kwargs: Additional arguments for ari.client.Client.
+    """
+
+    def __init__(self, module, base_url, http_client, **kwargs):
+        self.module = module
+        self.repository_classes = module.REPOSITORIES
+        self.class_map = {
+            model_id: module.MODELS.get(model_id, factory)
+            for (model_id, factory) in ari.model.CLASS_MAP.items()}
+        super(GeneratedClient, self).__init__(base_url, http_client,
+                                              **kwargs)
+
+    def load_api(self, base_url, http_client, cache_dir, spec):
+        """Build the API from the generated module.
+
+        :param base_url: Base URL for accessing Asterisk.
+        :param http_client: HTTP client interface.
+        :param cache_dir: Ignored.
+        :param spec: Ignored.
+        :return: Static API.
+        :rtype:  StaticApi
+        """
+        return StaticApi(self.module, base_url, http_client)
+
+    def on_object_event(self, event_type, event_cb, factory_fn, model_id,
+                        *args, **kwargs):
+        factory_fn = self.module.MODELS.get(model_id, factory_fn)
+        return super(GeneratedClient, self).on_object_event(
+            event_type, event_cb, factory_fn, model_id, *args, **kwargs)
+
+    def on_object_id_event(self, event_type, event_cb, factory_fn, model_id,
+                           obj_id, *args, **kwargs):
+        factory_fn = self.module.MODELS.get(model_id, factory_fn)
+        return super(GeneratedClient, self).on_object_id_event(
+            event_type, event_cb, factory_fn, model_id, obj_id, *args,
+            **kwargs)
+
+
+class AnyJson(dict):
+    """Stands in for an object's JSON when finding its id parameters.
+    """
+
+    def __missing__(self, key):
+        return ''
+
+
+def identifier(name):
+    """Make a Python identifier from a Swagger name.
+
+    :param name: Operation or parameter name.
+    :return: Identifier.
+    """
+    name = re.sub(r'\W', '_', name)
+    if keyword.iskeyword(name) or name[0].isdigit():
+        name += '_'
+    return name
+
+
+def id_params(domain_class):
+    """Gets the names of the parameters identifying a domain object.
+
+    :param domain_class: Domain class.
+    :return: Parameter names.
+    """
+    return set(domain_class.id_generator.get_params(AnyJson()).keys())
+
+
+def docstring(text, params, indent):
+    """Format a method docstring.
+
+    :param text: Summary of the operation.
+    :param params: List of (identifier, description) tuples.
+    :param indent: Indentation of the docstring.
+    :return: List of lines.
+    """
+    width = 79 - len(indent)
+    text = (text or '').replace('\\', '\\\\').replace('"""', '\\"\\"\\"')
+    lines = textwrap.wrap(text, width - 3) or ['']
+    lines[0] = '"""' + lines[0]
+    if params:
+        lines.append('')
+    for (name, description) in params:
+        description = (description or '').replace('\\', '\\\\')
+        lines.extend(textwrap.wrap(
+            ':param %s: %s' % (name, description), width,
+            subsequent_indent='    '))
+    lines.append('"""')
+    return [indent + line if line else '' for line in lines]
+
+
+def method_source(oper, skip_params, params_expr, context_expr):
+    """Generate the source of a method for an operation.
+
+    :param oper: Swagger operation.
+    :param skip_params: Names of parameters which are filled in by params_expr.
+    :param params_expr: Expression for the initial parameter dict.
+    :param context_expr: Expression for an object with the client and the
+                         resource's operations.
+    :return: List of lines.
+    """
+    params = [p for p in oper.get('parameters', [])
+              if p['name'] not in skip_params]
+    required = [p for p in params if p.get('required')]
+    optional = [p for p in params if not p.get('required')]
+    args = ['self'] + [identifier(p['name']) for p in required] + \
+        ['%s=None' % identifier(p['name']) for p in optional]
+
+    indent = ' ' * 8
+    head = '    def %s(' % identifier(oper['nickname'])
+    signature = textwrap.wrap(', '.join(args) + '):', 79 - len(head),
+                              break_long_words=False)
+    lines = [head + signature[0]]
+    lines.extend(' ' * len(head) + line for line in signature[1:])
+    lines.extend(docstring(oper.get('summary'), [
+        (identifier(p['name']), p.get('description')) for p in params],
+        indent))
+    lines.append(indent + 'params = %s' % params_expr)
+    for p in required:
+        lines.append(indent + 'params[%r] = %s' % (
+            str(p['name']), identifier(p['name'])))
+    for p in optional:
+        lines.append(indent + 'if %s is not None:' % identifier(p['name']))
+        lines.append(indent + '    params[%r] = %s' % (
+            str(p['name']), identifier(p['name'])))
+    if context_expr != 'self':
+        lines.append(indent + 'context = %s' % context_expr)
+        context_expr = 'context'
+    lines.append(indent + 'return %s.client.invoke(' % context_expr)
+    lines.append(indent + '    %s.operations[%r], params)' %
+                 (context_expr, str(oper['nickname'])))
+    return lines
+
+
+def param_names(oper):
+    """Gets the parameter names of an operation.
+
+    :param oper: Swagger operation.
+    :return: Set of names.
+    """
+    return set(p['name'] for p in oper.get('parameters', []))
+
+
+def is_free(oper, base_class, attributes):
+    """Checks that a method for an operation would not hide an attribute.
+
+    :param oper: Swagger operation.
+    :param base_class: Base class of the generated class.
+    :param attributes: Names of the base class's instance attributes.
+    :return: True if the method can be generated.
+    """
+    nickname = identifier(oper['nickname'])
+    return not hasattr(base_class, nickname) and nickname not in attributes
+
+
+def class_name(resource_name):
+    """Gets the name of the generated Repository subclass for a resource.
+
+    :param resource_name: Resource name, i.e. deviceStates.
+    :return: Class name, i.e. DeviceStatesRepository.
+    """
+    return identifier(resource_name[0].upper() + resource_name[1:] +
+                      'Repository')
+
+
+def generate(api_docs, source=''):
+    """Generate a static client module.
+
+    :param api_docs: Unprocessed resource listing, with API declarations.
+    :param source: Where the api-docs came from, for the module docstring.
+    :return: Module source.
+    :rtype:  unicode
+    """
+    operations = {}
+    resources = {}
+    models = {}
+    event_models = {}
+    for api in api_docs['apis']:
+        name = os.path.splitext(os.path.basename(api['path']))[0]
+        decl = api['api_declaration']
+        if name == 'events':
+            # Only the property types are needed to route events
+            event_models = {
+                model_id: {'properties': {
+                    prop: {'type': v.get('type')}
+                    for (prop, v) in model.get('properties', {}).items()}}
+                for (model_id, model) in decl.get('models', {}).items()}
+        else:
+            models.update(decl.get('models', {}))
+        resources[name] = []
+        operations[name] = {}
+        for decl_api in decl['apis']:
+            for oper in decl_api['operations']:
+                oper['is_websocket'] = oper.get('upgrade') == 'websocket'
+                resources[name].append(oper)
+                operations[name][str(oper['nickname'])] = (
+                    str(decl_api['path']), dict(
+                        [(f, oper.get(f)) for f in OPERATION_FIELDS],
+                        parameters=[
+                            {f: p.get(f, False) for f in PARAMETER_FIELDS}
+                            for p in oper.get('parameters', [])]))
+
+    lines = [
+        '# -*- coding: utf-8 -*-',
+        '',
+        '"""ARI client for api-docs version %s.' %
+        api_docs.get('apiVersion'),
+        '',
+        'Generated by ari-codegen from %s; do not edit.' % (source or
+                                                            'api-docs'),
+        '"""',
+        '',
+        'import sys',
+        '',
+        'import ari',
+        'import ari.codegen',
+        'import ari.model',
+        '',
+        'API_VERSION = %r' % str(api_docs.get('apiVersion')),
+        '',
+        'EVENT_MODELS = %s' % pprint.pformat(event_models),
+        '',
+        '#: resource -> nickname -> (path, operation)',
+        'OPERATIONS = %s' % pprint.pformat(operations),
+        ]
+
+    for (name, opers) in sorted(resources.items()):
+        lines.extend(['', '', 'class %s(ari.model.Repository):' %
+                      class_name(name)])
+        methods = [oper for oper in opers
+                   if is_free(oper, ari.model.Repository,
+                              ('client', 'name', 'api', 'operations',
+                               'futures'))]
+        if not methods:
+            lines.append('    pass')
+        for oper in methods:
+            lines.extend(method_source(oper, (), '{}', 'self'))
+            lines.append('')
+        if methods:
+            lines.pop()
+
+    domain_classes = []
+    for domain_class in DOMAIN_CLASSES:
+        model_id = domain_class.model_id
+        name = domain_class.resource_name
+        if name not in resources:
+            continue
+        domain_classes.append(model_id)
+        obj_params = id_params(domain_class)
+        lines.extend(['', '',
+                      'class %s(ari.model.%s):' % (model_id, model_id)])
+        lines.append('    __slots__ = ()')
+        # Only operations which take the object's id become its methods
+        methods = [oper for oper in resources[name]
+                   if obj_params <= param_names(oper) and
+                   is_free(oper, ari.model.BaseObject,
+                           ari.model.BaseObject.__slots__)]
+        method_names = set(identifier(oper['nickname']) for oper in methods)
+        fields = sorted(
+            prop for prop in models.get(model_id, {}).get('properties', {})
+            if identifier(prop) == prop and prop not in method_names and
+            not hasattr(ari.model.BaseObject, prop) and
+            prop not in ari.model.BaseObject.__slots__)
+        lines.extend('    %s = ari.model.JsonField(%r)' % (prop, str(prop))
+                     for prop in fields)
+        for oper in methods:
+            lines.append('')
+            lines.extend(method_source(
+                oper, obj_params, 'self.id_generator.get_params(self.json)',
+                'self.context'))
+
+    lines.extend(['', ''])
+    lines.append('REPOSITORIES = {')
+    lines.extend('    %r: %s,' % (str(name), class_name(name))
+                 for name in sorted(resources))
+    lines.append('}')
+    lines.append('')
+    lines.append('MODELS = {')
+    lines.extend('    %r: %s,' % (model_id, model_id)
+                 for model_id in domain_classes)
+    lines.append('}')
+    lines.extend([
+        '',
+        '',
+        'def connect(base_url, username, password, **kwargs):',
+        '    """Helper method for easily connecting to ARI.',
+        '',
+        '    :param base_url: Base URL for Asterisk HTTP server',
+        '                     (http://localhost:8088/)',
+        '    :param username: ARI username',
+        '    :param password: ARI password.',
+        '    :param kwargs: Client options (see ari.client.Client), and HTTP',
+        '                   options, such as pool_maxsize or timeout (see',
+        '                   ari.http.PooledHttpClient).',
+        '    :return: Generated client.',
+        '    :rtype:  ari.codegen.GeneratedClient',
+        '    """',
+        '    http_client = ari.build_http_client(',
+        '        base_url, username, password, '
+        '**ari.pop_http_options(kwargs))',
+        '    return ari.codegen.GeneratedClient(',
+        '        sys.modules[__name__], base_url, http_client, **kwargs)',
+        ''])
+    return u'\n'.join(unicode(line) for line in lines)
+
+
+def main(argv=None):
+    """Generate a static client module from an api-docs directory.
+
+    :param argv: Command line arguments.
+    :return: Exit code.
+    """
+    argv = argv or sys.argv
+    if len(argv) != 3:
+        sys.stderr.write("Usage: %s API_DOCS_DIR OUTPUT.py\n" %
+                         os.path.basename(argv[0]))
+        return 1
+    source = generate(ari.spec.load(argv[1]), os.path.basename(
+        os.path.abspath(argv[1])))
+    with io.open(argv[2], 'w', encoding='utf-8') as fp:
+        fp.write(source)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,647 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Strategies for dispatching events to a client's listeners.
+
+By default, listeners are called on the thread reading the WebSocket, one
+event at a time. A ThreadPoolDispatcher calls them from a pool of worker
+threads instead, so a slow listener for one call does not hold up events for
+every other call. A ProcessPoolDispatcher spreads events across worker
+processes, for listeners which are limited by the GIL.
+
+A QueuedDispatcher puts a bounded EventQueue in front of any of these, so the
+WebSocket keeps being read when the listeners fall behind, and overload is
+handled by the queue's overflow policy.
+"""
+
+import Queue
+import collections
+import itertools
+import logging
+import multiprocessing
+import threading
+
+log = logging.getLogger(__name__)
+
+
+def event_ids(event):
+    """Gets the ids of the channels and bridges that an event is about.
+
+    The bridge comes first, then the bridge merged into it (for
+    BridgeMerged), then the channel. Playback and recording events are about
+    their target, so they are ordered with the events of the channel or
+    bridge they are playing to or recording from.
+
+    :param event: Event.
+    :type  event: dict
+    :return: List of object ids; empty if the event is not about a channel
+             or bridge.
+    """
+    ids = []
+    for field in ('bridge', 'bridge_from', 'channel'):
+        obj = event.get(field)
+        if isinstance(obj, dict) and 'id' in obj:
+            ids.append(obj['id'])
+    if ids:
+        return ids
+    for field in ('playback', 'recording'):
+        obj = event.get(field)
+        if isinstance(obj, dict) and 'target_uri' in obj:
+            # target_uri is formatted as 'channel:id' or 'bridge:id'
+            target = obj['target_uri'].partition(':')[2]
+            if target:
+                return [target]
+    return []
+
+
+def event_key(event):
+    """Gets the id of the channel or bridge that an event is mainly about.
+
+    :param event: Event.
+    :type  event: dict
+    :return: Object id, or None if the event is not about a channel or bridge.
+    """
+    ids = event_ids(event)
+    if ids:
+        return ids[0]
+    return None
+
+
+#: Events which EventQueue never drops or conflates.
+CRITICAL_EVENTS = frozenset([
+    'ApplicationReplaced',
+    'BridgeCreated',
+    'BridgeDestroyed',
+    'BridgeMerged',
+    'ChannelCreated',
+    'ChannelDestroyed',
+    'ChannelDtmfReceived',
+    'ChannelEnteredBridge',
+    'ChannelHangupRequest',
+    'ChannelLeftBridge',
+    'ChannelUserevent',
+    'PlaybackFinished',
+    'PlaybackStarted',
+    'RecordingFailed',
+    'RecordingFinished',
+    'RecordingStarted',
+    'StasisEnd',
+    'StasisStart',
+])
+
+
+#: Events which carry a snapshot of an object's state, so a newer one for
+#: the same object (and, for ChannelVarset, the same variable) supersedes
+#: an older one. Only these are conflated by EventQueue.
+CONFLATABLE_EVENTS = frozenset([
+    'ChannelCallerId',
+    'ChannelConnectedLine',
+    'ChannelDialplan',
+    'ChannelStateChange',
+    'ChannelVarset',
+])
+
+
+class ShardRouter(object):
+    """Chooses which of several shards should handle each event, so that the
+    events about a channel or bridge are handled one at a time, in order.
+
+    Each object starts on the shard its id hashes to. An event about several
+    objects (such as ChannelEnteredBridge, or BridgeMerged) moves them all to
+    the shard of the first (see event_ids), so that a channel's events stay
+    ordered with those of the bridges it joins. Before a moved object's
+    event is handled, the events already submitted to its old shard must
+    have been handled; route() returns those shards.
+
+    Routing is not thread safe; events are submitted by one thread.
+
+    :param count: Number of shards.
+    """
+
+    #: Events after which an object is gone, and need not be remembered.
+    DESTROYED = frozenset(['BridgeDestroyed', 'ChannelDestroyed'])
+
+    def __init__(self, count):
+        self.count = count
+        self.round_robin = itertools.cycle(range(count))
+        # Object id -> shard, for objects moved off their hash's shard
+        self.moved = {}
+
+    def __repr__(self):
+        return "ShardRouter(%d shards, %d moved)" % (self.count,
+                                                     len(self.moved))
+
+    def shard(self, obj_id):
+        """Gets the shard handling an object's events.
+
+        :param obj_id: Channel or bridge id.
+        :return: Shard number.
+        :rtype:  int
+        """
+        shard = self.moved.get(obj_id)
+        if shard is None:
+            shard = hash(obj_id) % self.count
+        return shard
+
+    def route(self, event):
+        """Choose the shard to handle an event.
+
+        :param event: Event.
+        :type  event: dict
+        :return: Shard number, and the other shards whose submitted events
+                 must be handled first.
+        :rtype:  (int, list of int)
+        """
+        ids = event_ids(event)
+        if not ids:
+            return next(self.round_robin), []
+        shard = self.shard(ids[0])
+        waits = set()
+        for obj_id in ids[1:]:
+            old = self.shard(obj_id)
+            if old != shard:
+                waits.add(old)
+                self.moved[obj_id] = shard
+        if event.get('type') in self.DESTROYED:
+            self.moved.pop(ids[0], None)
+        return shard, sorted(waits)
+
+
+class Dispatcher(object):
+    """Interface for running a client's listeners for decoded events.
+    """
+
+    #: Whether the listeners run are the submitting client's own, so events
+    #: it has no listeners for may be skipped.
+    local_listeners = True
+
+    def start(self):
+        """Prepare to accept events.
+        """
+        raise NotImplementedError("Not implemented")
+
+    def submit(self, event, dispatch_fn):
+        """Arrange for dispatch_fn(event) to be called.
+
+        :param event: Event.
+        :type  event: dict
+        :param dispatch_fn: Function which runs the listeners for an event.
+        """
+        raise NotImplementedError("Not implemented")
+
+    def stop(self):
+        """Finish dispatching the submitted events, and release resources.
+        """
+        raise NotImplementedError("Not implemented")
+
+
+# noinspection PyDocstring
+class InlineDispatcher(Dispatcher):
+    """Dispatcher which runs the listeners on the submitting thread.
+    """
+
+    def start(self):
+        pass
+
+    def submit(self, event, dispatch_fn):
+        dispatch_fn(event)
+
+    def stop(self):
+        pass
+
+
+# noinspection PyDocstring
+class ThreadPoolDispatcher(Dispatcher):
+    """Dispatcher which runs the listeners on a pool of worker threads.
+
+    Events are assigned to workers by a ShardRouter, so events for the same
+    channel or bridge are handled serially, in the order they were received,
+    while events for different calls are handled in parallel. A channel's
+    events are also ordered with those of the bridges it is in. Events which
+    are not about a channel or bridge are spread across the workers.
+
+    :param workers: Number of worker threads.
+    :param queue_size: Maximum number of events queued per worker, after
+                       which submit() blocks; 0 for no limit.
+    """
+
+    def __init__(self, workers=4, queue_size=0):
+        self.queues = [Queue.Queue(queue_size) for _ in range(workers)]
+        self.threads = []
+        self.router = ShardRouter(workers)
+        # Events submitted to, and handled by, each worker
+        self.queued = [0] * workers
+        self.handled = [0] * workers
+        self.progress = threading.Condition()
+        self.submitted = 0
+        self.max_depth = 0
+
+    def __repr__(self):
+        return "ThreadPoolDispatcher(%d)" % len(self.queues)
+
+    def start(self):
+        self.threads = [
+            threading.Thread(target=self.__work, args=(n,),
+                             name='ari-dispatch-%d' % n)
+            for n in range(len(self.queues))]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, event, dispatch_fn):
+        (shard, waits) = self.router.route(event)
+        queue = self.queues[shard]
+        for other in waits:
+            # Barrier: wait for the other worker to catch up
+            queue.put((None, (other, self.queued[other])))
+        queue.put((event, dispatch_fn))
+        self.queued[shard] += 1
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, queue.qsize())
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def depths(self):
+        """Gets the number of events waiting for each worker.
+
+        :return: List of queue depths, one per worker.
+        :rtype:  list of int
+        """
+        return [queue.qsize() for queue in self.queues]
+
+    def stats(self):
+        """Gets the dispatcher's queue metrics.
+
+        :return: Dict with the current 'depth' of all queues, the deepest
+                 single queue seen ('max_depth'), and the number of events
+                 'submitted'.
+        :rtype:  dict
+        """
+        return {
+            'depth': sum(self.depths()),
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+        }
+
+    def __work(self, shard):
+        """Worker thread; dispatches events until stopped.
+
+        :param shard: The worker's number.
+        """
+        for item in iter(self.queues[shard].get, None):
+            event, dispatch_fn = item
+            if event is None:
+                (other, count) = dispatch_fn
+                with self.progress:
+                    while self.handled[other] < count:
+                        self.progress.wait()
+                continue
+            # noinspection PyBroadException
+            try:
+                dispatch_fn(event)
+            except Exception:
+                log.exception("Error dispatching event")
+            with self.progress:
+                self.handled[shard] += 1
+                self.progress.notify_all()
+
+
+# noinspection PyDocstring
+class ProcessPoolDispatcher(Dispatcher):
+    """Dispatcher which shards events across worker processes.
+
+    The process calling Client.run() only reads and decodes the WebSocket.
+    Each worker process builds its own client with client_factory, registers
+    its listeners with setup_fn, and then dispatches the events it is sent.
+    Listeners registered on the reading client are not called.
+
+    As with ThreadPoolDispatcher, events for the same channel or bridge are
+    handled by one worker at a time, in the order they were received.
+
+    :param client_factory: Function creating a Client in a worker process.
+    :type  client_factory: () -> ari.client.Client
+    :param setup_fn: Function registering listeners on a worker's client.
+    :type  setup_fn: (ari.client.Client) -> None
+    :param workers: Number of worker processes.
+    :param queue_size: Maximum number of events queued per worker, after
+                       which submit() blocks; 0 for no limit.
+    """
+
+    local_listeners = False
+
+    def __init__(self, client_factory, setup_fn, workers=None, queue_size=0):
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.client_factory = client_factory
+        self.setup_fn = setup_fn
+        self.queues = [multiprocessing.Queue(queue_size)
+                       for _ in range(workers)]
+        self.processes = []
+        self.router = ShardRouter(workers)
+        self.submitted = [0] * workers
+        # Events handled by each worker, shared with the workers
+        self.handled = multiprocessing.Array('l', workers)
+        self.progress = multiprocessing.Condition()
+
+    def __repr__(self):
+        return "ProcessPoolDispatcher(%d)" % len(self.queues)
+
+    def start(self):
+        self.processes = [
+            multiprocessing.Process(target=self.__work, args=(n,),
+                                    name='ari-worker-%d' % n)
+            for n in range(len(self.queues))]
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+
+    def submit(self, event, dispatch_fn):
+        (shard, waits) = self.router.route(event)
+        for other in waits:
+            # Barrier: wait for the other worker to catch up
+            self.queues[shard].put((other, self.submitted[other]))
+        self.queues[shard].put(event)
+        self.submitted[shard] += 1
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def stats(self):
+        """Gets the dispatcher's queue metrics.
+
+        :return: Dict with the number of events 'submitted' to each worker.
+        :rtype:  dict
+        """
+        return {'submitted': list(self.submitted)}
+
+    def __work(self, shard):
+        """Worker process; dispatches events until stopped.
+
+        :param shard: The worker's number.
+        """
+        client = self.client_factory()
+        self.setup_fn(client)
+        try:
+            for item in iter(self.queues[shard].get, None):
+                if isinstance(item, tuple):
+                    (other, count) = item
+                    with self.progress:
+                        while self.handled[other] < count:
+                            self.progress.wait()
+                    continue
+                try:
+                    client.dispatch_event(item)
+                finally:
+                    with self.progress:
+                        self.handled[shard] += 1
+                        self.progress.notify_all()
+        finally:
+            client.close()
+
+
+class EventQueue(object):
+    """Bounded queue of events, with a policy for when it is full.
+
+    Overflow policies:
+     * 'block' - put() waits for space in the queue.
+     * 'drop' - the oldest queued event which is not critical is dropped to
+       make room. If every queued event is critical, a non-critical event
+       being put is dropped instead, and a critical one waits for space.
+     * 'conflate' - when the queue is full, a state snapshot event (see
+       CONFLATABLE_EVENTS) supersedes the queued event of the same type, for
+       the same object (and, for ChannelVarset, the same variable): that
+       event is removed, and the new one queued at the back, so events
+       stay in order. When there is nothing to supersede, the queue
+       overflows as with 'drop'.
+
+    :param maxsize: Maximum number of queued events.
+    :param overflow: Overflow policy; 'block', 'drop' or 'conflate'.
+    :param critical: Event types which are never dropped or conflated.
+    """
+
+    OVERFLOW_POLICIES = ('block', 'drop', 'conflate')
+
+    def __init__(self, maxsize, overflow='block', critical=CRITICAL_EVENTS):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy '%s'" % overflow)
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.critical = critical
+        self.cond = threading.Condition()
+        # Queued [event, payload, conflation key] entries
+        self.entries = collections.deque()
+        # Conflation key -> queued entry
+        self.index = {}
+        self.closed = False
+        self.max_depth = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.blocked = 0
+
+    def __repr__(self):
+        return "EventQueue(%d, %s)" % (self.maxsize, self.overflow)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, event, payload=None):
+        """Add an event to the queue, applying the overflow policy if full.
+
+        :param event: Event.
+        :type  event: dict
+        :param payload: Extra data to return from get() with the event.
+        """
+        with self.cond:
+            key = None
+            if self.overflow == 'conflate':
+                key = self.conflation_key(event)
+                if len(self.entries) >= self.maxsize and key is not None and \
+                        self.__remove(self.index.get(key)):
+                    self.conflated += 1
+
+            waited = False
+            while len(self.entries) >= self.maxsize and not self.closed:
+                if self.overflow != 'block':
+                    if self.__drop_oldest():
+                        break
+                    if event.get('type') not in self.critical:
+                        self.dropped += 1
+                        return
+                if not waited:
+                    self.blocked += 1
+                    waited = True
+                self.cond.wait()
+
+            entry = [event, payload, key]
+            self.entries.append(entry)
+            if key is not None:
+                self.index[key] = entry
+            self.max_depth = max(self.max_depth, len(self.entries))
+            self.cond.notify_all()
+
+    def get(self):
+        """Remove the oldest event from the queue, waiting for one if the
+        queue is empty.
+
+        :return: (event, payload) tuple, or None if the queue has been closed
+                 and drained.
+        """
+        with self.cond:
+            while not self.entries and not self.closed:
+                self.cond.wait()
+            if not self.entries:
+                return None
+            entry = self.entries.popleft()
+            event, payload, key = entry
+            if key is not None and self.index.get(key) is entry:
+                del self.index[key]
+            self.cond.notify_all()
+            return event, payload
+
+    def close(self):
+        """Close the queue. Events already queued may still be taken with
+        get(); anything blocked in put() stops waiting for space.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def conflation_key(self, event):
+        """Gets the key identifying events which may replace each other.
+
+        :param event: Event.
+        :return: Key, or None if the event must not be conflated.
+        """
+        event_type = event.get('type')
+        if event_type in self.critical or \
+                event_type not in CONFLATABLE_EVENTS:
+            return None
+        obj_id = event_key(event)
+        if obj_id is None:
+            return None
+        return event.get('type'), obj_id, event.get('variable')
+
+    def stats(self):
+        """Gets the queue's metrics.
+
+        :return: Dict with the current 'depth', the 'max_depth' seen, and the
+                 number of events 'dropped', 'conflated', or which 'blocked'
+                 the reader.
+        :rtype:  dict
+        """
+        with self.cond:
+            return {
+                'depth': len(self.entries),
+                'max_depth': self.max_depth,
+                'dropped': self.dropped,
+                'conflated': self.conflated,
+                'blocked': self.blocked,
+            }
+
+    def __drop_oldest(self):
+        """Drop the oldest queued event which is not critical.
+
+        :return: True if an event was dropped.
+        """
+        for entry in self.entries:
+            if entry[0].get('type') not in self.critical:
+                self.__remove(entry)
+                self.dropped += 1
+                return True
+        return False
+
+    def __remove(self, entry):
+        """Remove a queued entry.
+
+        :param entry: Entry, or None.
+        :return: True if the entry was removed.
+        """
+        if entry is None:
+            return False
+        for (n, queued) in enumerate(self.entries):
+            if queued is entry:
+                del self.entries[n]
+                key = entry[2]
+                if key is not None and self.index.get(key) is entry:
+                    del self.index[key]
+                return True
+        return False
+
+
+# noinspection PyDocstring
+class QueuedDispatcher(Dispatcher):
+    """Dispatcher which decouples reading the WebSocket from dispatching.
+
+    Submitted events are put on an EventQueue, and a separate thread takes
+    them off and passes them to another dispatcher. When the listeners fall
+    behind, the queue's overflow policy decides whether the reader waits, or
+    events are dropped or conflated, rather than letting the WebSocket back
+    up until Asterisk drops the connection.
+
+    :param maxsize: Maximum number of queued events.
+    :param overflow: Overflow policy; see EventQueue.
+    :param dispatcher: Dispatcher to pass events to; runs the listeners on
+                       the queue's thread by default.
+    :param critical: Event types which are never dropped or conflated.
+    """
+
+    def __init__(self, maxsize=1000, overflow='block', dispatcher=None,
+                 critical=CRITICAL_EVENTS):
+        self.queue = EventQueue(maxsize, overflow, critical)
+        self.dispatcher = dispatcher or InlineDispatcher()
+        self.thread = None
+
+    def __repr__(self):
+        return "QueuedDispatcher(%r, %r)" % (self.queue, self.dispatcher)
+
+    @property
+    def local_listeners(self):
+        return self.dispatcher.local_listeners
+
+    def start(self):
+        self.queue = EventQueue(self.queue.maxsize, self.queue.overflow,
+                                self.queue.critical)
+        self.dispatcher.start()
+        self.thread = threading.Thread(target=self.__work,
+                                       name='ari-event-queue')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, event, dispatch_fn):
+        self.queue.put(event, dispatch_fn)
+
+    def stop(self):
+        self.queue.close()
+        self.thread.join()
+        self.dispatcher.stop()
+
+    def stats(self):
+        """Gets the queue's metrics; see EventQueue.stats().
+
+        :return: Dict of metrics.
+        :rtype:  dict
+        """
+        return self.queue.stats()
+
+    def __work(self):
+        """Queue thread; passes events on to the dispatcher until stopped.
+        """
+        for item in iter(self.queue.get, None):
+            event, dispatch_fn = item
+            # noinspection PyBroadException
+            try:
+                self.dispatcher.submit(event, dispatch_fn)
+            except Exception:
+                log.exception("Error dispatching event")
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""HTTP transport for the ARI client.
+"""
+
+import contextlib
+import requests
+import requests.adapters
+import swaggerpy.http_client
+import threading
+
+#: Options accepted by PooledHttpClient, which ari.connect() passes along.
+HTTP_OPTIONS = ('pool_connections', 'pool_maxsize', 'pool_block',
+                'max_retries', 'timeout', 'keep_alive')
+
+
+class PooledHttpClient(swaggerpy.http_client.SynchronousHttpClient):
+    """Synchronous HTTP client with a tunable connection pool.
+
+    The pool belongs to a single requests session, which may be shared by any
+    number of threads. The defaults match those of requests.
+
+    :param pool_connections: Number of hosts to keep connection pools for.
+    :param pool_maxsize: Maximum number of connections kept open per host.
+    :param pool_block: If True, requests wait for a free connection when
+                       pool_maxsize connections are in use, instead of
+                       opening (and then discarding) extra ones.
+    :param max_retries: Number of retries for requests which fail to
+                        connect, or a urllib3.util.retry.Retry for finer
+                        control. Requests which reached Asterisk are not
+                        retried unless the Retry says so.
+    :param timeout: Seconds to wait for a connection or response, or a
+                    (connect, read) tuple. None waits forever.
+    :param keep_alive: If False, connections are closed after each request.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 max_retries=0, timeout=None, keep_alive=True):
+        super(PooledHttpClient, self).__init__()
+        self.timeout = timeout
+        self.adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            max_retries=max_retries, pool_block=pool_block)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        # Per-thread flag for streaming response bodies
+        self.local = threading.local()
+
+    def __repr__(self):
+        return "PooledHttpClient(%(requests)d requests, " \
+               "%(connections)d connections)" % self.stats()
+
+    def request(self, method, url, params=None, data=None):
+        """Requests based implementation.
+
+        :return: Requests response
+        :rtype:  requests.Response
+        """
+        req = requests.Request(
+            method=method, url=url, params=params, data=data)
+        self.apply_authentication(req)
+        return self.session.send(self.session.prepare_request(req),
+                                 timeout=self.timeout,
+                                 stream=getattr(self.local, 'stream', False))
+
+    @contextlib.contextmanager
+    def streaming(self):
+        """Stream the bodies of the responses to requests made on this thread
+        within the block.
+
+        The body is then read as it is consumed (i.e. by iter_content), and
+        the connection is only returned to the pool when the response is
+        closed.
+        """
+        self.local.stream = True
+        try:
+            yield
+        finally:
+            self.local.stream = False
+
+    def stats(self):
+        """Gets connection reuse statistics, over all hosts.
+
+        :return: Dict with the number of requests made, connections opened,
+                 and requests which reused an open connection.
+        :rtype:  dict
+        """
+        pools = self.adapter.poolmanager.pools
+        requests_made = connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool:
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+        return {
+            'requests': requests_made,
+            'connections': connections,
+            'reused': max(requests_made - connections, 0),
+        }
@@ -0,0 +1,241 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Local mirror of the channels, bridges and endpoints in Asterisk.
+"""
+
+import logging
+import threading
+
+from concurrent.futures import Future
+
+log = logging.getLogger(__name__)
+
+
+class StateMirror(object):
+    """In-memory copy of the channels, bridges and endpoints in Asterisk.
+
+    The mirror is seeded from the list operations, then kept up to date from
+    events, so reading it costs a dict lookup instead of an HTTP round trip.
+    Asterisk only sends events for objects an application is subscribed to;
+    subscribe() subscribes an application to all of them, each time the
+    client connects.
+
+    Events may be missed (for example, while the WebSocket is reconnecting),
+    so the mirror can also be reconciled against the list operations,
+    optionally on a timer.
+
+    With an AsyncClient, reconcile() waits for the list operations, so it
+    should not be called from the client's event loop.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client or ari.async_client.AsyncClient
+    :param reconcile_interval: If given, seconds between reconciliations
+                               while the mirror is running.
+    """
+
+    #: Events which update the channel they carry.
+    CHANNEL_UPDATES = ('ChannelCreated', 'ChannelStateChange',
+                       'ChannelEnteredBridge', 'ChannelLeftBridge')
+    #: Events which update the bridge they carry.
+    BRIDGE_UPDATES = ('BridgeCreated', 'ChannelEnteredBridge',
+                      'ChannelLeftBridge')
+    #: Events which update the endpoint they carry.
+    ENDPOINT_UPDATES = ('EndpointStateChange',)
+
+    def __init__(self, client, reconcile_interval=None):
+        self.client = client
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        # Object id -> domain object. Replaced as a whole on reconcile(), so
+        # readers may hold on to them.
+        self.channels = {}
+        self.bridges = {}
+        self.endpoints = {}
+        # Names of the dicts -> ids of the objects updated by events since
+        # the running reconciliation started listing, or None
+        self.touched = None
+        self.reconcile_lock = threading.Lock()
+        # Applications to subscribe to everything
+        self.apps = set()
+        # Number of reconciliations, and of objects they added or removed
+        # after seeding the mirror
+        self.reconciles = 0
+        self.corrections = 0
+        self.unsubscribers = []
+        self.stopped = threading.Event()
+        self.timer = None
+
+    def __repr__(self):
+        return "StateMirror(%d channels, %d bridges, %d endpoints)" % (
+            len(self.channels), len(self.bridges), len(self.endpoints))
+
+    def subscribe(self, app):
+        """Subscribe an application to all channels, bridges and endpoints,
+        whenever the client connects for it.
+
+        Asterisk only accepts subscriptions for a connected application, so
+        this may be called before Client.run(); the subscription is made
+        once the mirror is started and the client connects. If the client is
+        already running, the application is subscribed straight away.
+
+        :param app: Application name.
+        """
+        self.apps.add(app)
+        if self.client.websockets:
+            self.__subscribe(app)
+
+    def __on_connect(self, apps):
+        """Subscribe the connected applications.
+
+        :param apps: Applications the client connected for.
+        """
+        for app in apps:
+            if app in self.apps:
+                self.__subscribe(app)
+
+    def __subscribe(self, app):
+        """Subscribe an application to all channels, bridges and endpoints.
+
+        :param app: Application name.
+        """
+        result = self.client.applications.subscribe(
+            applicationName=app,
+            eventSource=['channel:', 'bridge:', 'endpoint:'])
+        if isinstance(result, Future):
+            result.result()
+
+    def start(self):
+        """Register for events, and seed the mirror from Asterisk.
+        """
+        self.stopped.clear()
+        listeners = [
+            (self.CHANNEL_UPDATES, self.__on_channel),
+            (('ChannelDestroyed',), self.__on_channel_destroyed),
+            (self.BRIDGE_UPDATES, self.__on_bridge),
+            (('BridgeDestroyed',), self.__on_bridge_destroyed),
+            (self.ENDPOINT_UPDATES, self.__on_endpoint),
+        ]
+        for (event_types, fn) in listeners:
+            for event_type in event_types:
+                self.unsubscribers.append(
+                    self.client.on_event(event_type, fn))
+        self.unsubscribers.append(self.client.on_connect(self.__on_connect))
+        self.reconcile()
+
+        if self.reconcile_interval:
+            self.timer = threading.Thread(target=self.__reconcile_loop)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def stop(self):
+        """Stop updating the mirror.
+        """
+        self.stopped.set()
+        for unsubscriber in self.unsubscribers:
+            unsubscriber.close()
+        self.unsubscribers = []
+        if self.timer:
+            self.timer.join()
+            self.timer = None
+
+    def reconcile(self):
+        """Replace the mirror's contents with the objects listed by Asterisk.
+
+        Objects updated by events while the lists were being fetched are kept
+        as the events left them, since the lists may predate the events.
+        """
+        names = ('channels', 'bridges', 'endpoints')
+        with self.reconcile_lock:
+            with self.lock:
+                self.touched = {name: set() for name in names}
+            try:
+                listed = [(name, self.__list(name)) for name in names]
+            except Exception:
+                with self.lock:
+                    self.touched = None
+                raise
+            with self.lock:
+                for (name, objs) in listed:
+                    old = getattr(self, name)
+                    new = {obj.id: obj for obj in objs}
+                    for obj_id in self.touched[name]:
+                        new.pop(obj_id, None)
+                        if obj_id in old:
+                            new[obj_id] = old[obj_id]
+                    if self.reconciles:
+                        self.corrections += len(set(new) ^ set(old))
+                    setattr(self, name, new)
+                self.touched = None
+                self.reconciles += 1
+
+    def __list(self, name):
+        """List the objects of a resource, waiting for an AsyncClient's
+        response.
+
+        :param name: Resource name.
+        :return: List of domain objects.
+        """
+        result = getattr(self.client, name).list()
+        if isinstance(result, Future):
+            result = result.result()
+        return result
+
+    def __reconcile_loop(self):
+        """Reconcile every reconcile_interval seconds, until stopped.
+        """
+        while not self.stopped.wait(self.reconcile_interval):
+            # noinspection PyBroadException
+            try:
+                self.reconcile()
+            except Exception:
+                log.exception("Failed to reconcile state mirror")
+
+    def __update(self, attr, model_id, obj_json):
+        """Add or refresh an object from an event.
+
+        :param attr: Name of the mirror's dict for objects of the model.
+        :param model_id: Swagger model id of the object.
+        :param obj_json: JSON representation of the object.
+        """
+        obj = self.client.build_object(self.client.class_map[model_id],
+                                       obj_json)
+        with self.lock:
+            getattr(self, attr)[obj.id] = obj
+            if self.touched is not None:
+                self.touched[attr].add(obj.id)
+
+    def __remove(self, attr, model_id, obj_json):
+        """Remove an object.
+
+        :param attr: Name of the mirror's dict for objects of the model.
+        :param model_id: Swagger model id of the object.
+        :param obj_json: JSON representation of the object.
+        """
+        factory_fn = self.client.class_map[model_id]
+        obj_id = factory_fn.id_generator.id_as_str(obj_json)
+        with self.lock:
+            getattr(self, attr).pop(obj_id, None)
+            if self.touched is not None:
+                self.touched[attr].add(obj_id)
+
+    # noinspection PyDocstring
+    def __on_channel(self, event):
+        self.__update('channels', 'Channel', event['channel'])
+
+    # noinspection PyDocstring
+    def __on_channel_destroyed(self, event):
+        self.__remove('channels', 'Channel', event['channel'])
+
+    # noinspection PyDocstring
+    def __on_bridge(self, event):
+        self.__update('bridges', 'Bridge', event['bridge'])
+
+    # noinspection PyDocstring
+    def __on_bridge_destroyed(self, event):
+        self.__remove('bridges', 'Bridge', event['bridge'])
+
+    # noinspection PyDocstring
+    def __on_endpoint(self, event):
+        self.__update('endpoints', 'Endpoint', event['endpoint'])
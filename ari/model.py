@@ -17,10 +17,14 @@ The first-class objects also have 'on_event' methods, which can subscribe to
 Stasis events relating to that object.
 """
 
+import os
 import re
 import requests
 import logging
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from ari.stream import CHUNK_SIZE, download, iter_objects
+
 log = logging.getLogger(__name__)
 
 
@@ -43,23 +47,295 @@ class Repository(object):
         self.client = client
         self.name = name
         self.api = resource
+        self.operations = resource.operations
+        self.futures = FutureOperations(self)
+        # Bind the operations once, so calling one is a plain function call
+        for (nickname, oper) in resource.operations.items():
+            # Leave attributes and explicit methods (as generated by
+            # ari.codegen) alone
+            if not hasattr(self, nickname):
+                setattr(self, nickname, self.__bind(oper))
 
     def __repr__(self):
         return "Repository(%s)" % self.name
 
     def __getattr__(self, item):
-        """Maps resource operations to methods on this object.
+        """Only called for names which are not operations of the resource.
 
         :param item: Item name.
         """
-        oper = getattr(self.api, item, None)
-        if not (hasattr(oper, '__call__') and hasattr(oper, 'json')):
+        raise AttributeError(
+            "'%r' object has no attribute '%s'" % (self, item))
+
+    def iterate(self, nickname, chunk_size=CHUNK_SIZE, **kwargs):
+        """Invoke an operation returning a list, promoting its elements one at
+        a time as the response is read.
+
+        Unlike calling the operation, the list is never held in memory, so
+        this suits very long lists (i.e. channels.iterate('list')). The
+        response cache and request coalescing are bypassed.
+
+        :param nickname: Operation nickname, i.e. 'list'.
+        :param chunk_size: Bytes of the response to read at a time.
+        :param kwargs: Operation parameters.
+        :return: Generator of the promoted elements.
+        :raises AttributeError: If there is no such operation.
+        :raises ValueError: If the operation does not return a list.
+        """
+        oper = self.__get_operation(nickname)
+        if not oper.json['responseClass'].startswith('List['):
+            raise ValueError("%s does not return a list" % nickname)
+        return iter_objects(self.client, oper, kwargs, chunk_size)
+
+    def download(self, nickname, dest, chunk_size=CHUNK_SIZE, **kwargs):
+        """Invoke an operation, writing its response body to dest as it is
+        read, without holding it in memory.
+
+        For example, recordings.download('getStoredFile', 'hello.wav',
+        recordingName='hello').
+
+        :param nickname: Operation nickname.
+        :param dest: File name, file descriptor, or object with a write
+                     method.
+        :param chunk_size: Bytes to read and write at a time.
+        :param kwargs: Operation parameters.
+        :return: Number of bytes written.
+        :raises AttributeError: If there is no such operation.
+        """
+        return download(self.client, self.__get_operation(nickname), kwargs,
+                        dest, chunk_size)
+
+    def bulk(self, nickname, ids, concurrency=10, ignore_missing=False,
+             **kwargs):
+        """Invoke an operation for many objects, in parallel.
+
+        Responses are promoted just as they are for single calls. The calls
+        are made from a thread pool, and this method blocks until all of them
+        have finished.
+
+        :param nickname: Operation nickname, i.e. 'hangup'.
+        :param ids: Ids of the objects, or domain objects.
+        :param concurrency: Maximum number of calls in flight.
+        :param ignore_missing: If True, objects which no longer exist (404 Not
+                               Found) are recorded in missing, instead of
+                               errors.
+        :param kwargs: Parameters passed to every call.
+        :return: Results of the calls.
+        :rtype:  BulkResult
+        :raises AttributeError: If there is no such operation.
+        :raises ValueError: If the operation does not take a single id.
+        """
+
+        def call(oper, params, obj_id):
+            """Invoke the operation for a single object.
+
+            :param oper: Swagger operation.
+            :param params: Operation parameters, including the id.
+            :param obj_id: Id of the object, or domain object.
+            :return: Result of the call.
+            """
+            result = self.client.invoke(oper, params)
+            if isinstance(result, Future):
+                result = result.result()
+            return result
+
+        return self.__bulk(nickname, ids, concurrency, ignore_missing, kwargs,
+                           call)
+
+    def bulk_download(self, nickname, ids, directory, concurrency=10,
+                      ignore_missing=False, chunk_size=CHUNK_SIZE, **kwargs):
+        """Download the response bodies of an operation for many objects, in
+        parallel, to files in a directory.
+
+        Each file is named after the object's id. For domain objects with a
+        format (such as StoredRecording), the format is used as the file's
+        extension, so that recordings.bulk_download('getStoredFile',
+        recordings.listStored(), 'archive') writes archive/hello.wav.
+
+        :param nickname: Operation nickname, i.e. 'getStoredFile'.
+        :param ids: Ids of the objects, or domain objects.
+        :param directory: Directory to write the files to.
+        :param concurrency: Maximum number of downloads in flight.
+        :param ignore_missing: If True, objects which no longer exist (404 Not
+                               Found) are recorded in missing, instead of
+                               errors.
+        :param chunk_size: Bytes to read and write at a time.
+        :param kwargs: Parameters passed to every call.
+        :return: Number of bytes written for each object.
+        :rtype:  BulkResult
+        :raises AttributeError: If there is no such operation.
+        :raises ValueError: If the operation does not take a single id.
+        """
+
+        def call(oper, params, obj_id):
+            """Download the file for a single object.
+
+            :param oper: Swagger operation.
+            :param params: Operation parameters, including the id.
+            :param obj_id: Id of the object, or domain object.
+            :return: Number of bytes written.
+            """
+            filename = getattr(obj_id, 'id', obj_id)
+            if isinstance(obj_id, BaseObject) and obj_id.json.get('format'):
+                filename = '%s.%s' % (filename, obj_id.json['format'])
+            return download(self.client, oper, params,
+                            os.path.join(directory, filename), chunk_size)
+
+        return self.__bulk(nickname, ids, concurrency, ignore_missing, kwargs,
+                           call)
+
+    def __bulk(self, nickname, ids, concurrency, ignore_missing, kwargs, fn):
+        """Call fn for many objects, in parallel.
+
+        :param nickname: Operation nickname.
+        :param ids: Ids of the objects, or domain objects.
+        :param concurrency: Maximum number of calls in flight.
+        :param ignore_missing: See bulk().
+        :param kwargs: Parameters passed to every call.
+        :param fn: Function called with the operation, its parameters, and
+                   the id or domain object.
+        :rtype: BulkResult
+        """
+        oper = self.__get_operation(nickname)
+        id_params = [p['name'] for p in oper.json.get('parameters', [])
+                     if p['paramType'] == 'path']
+        if len(id_params) != 1:
+            raise ValueError("%s takes %d ids" % (nickname, len(id_params)))
+
+        def call(obj_id):
+            """Call fn for a single object.
+
+            :param obj_id: Id of the object, or domain object.
+            :return: Result of fn.
+            """
+            params = dict(kwargs)
+            if isinstance(obj_id, BaseObject):
+                params.update(obj_id.id_generator.get_params(obj_id.json))
+            else:
+                params[id_params[0]] = obj_id
+            return fn(oper, params, obj_id)
+
+        bulk_result = BulkResult()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            futures = [(getattr(obj_id, 'id', obj_id),
+                        executor.submit(call, obj_id))
+                       for obj_id in ids]
+            for (obj_id, future) in futures:
+                bulk_result.add(obj_id, future, ignore_missing)
+        finally:
+            executor.shutdown()
+        return bulk_result
+
+    def __get_operation(self, nickname):
+        """Gets one of the repository's operations.
+
+        :param nickname: Operation nickname.
+        :return: Swagger operation.
+        :raises AttributeError: If there is no such operation.
+        """
+        oper = self.operations.get(nickname)
+        if oper is None:
+            raise AttributeError(
+                "'%r' object has no attribute '%s'" % (self, nickname))
+        return oper
+
+    def __bind(self, oper):
+        """Wrap an operation, promoting the received HTTP response to a first
+        class object.
+
+        :param oper: Swagger operation.
+        :type  oper: swaggerpy.client.Operation
+        :return: Function invoking the operation.
+        """
+        client = self.client
+        return lambda **kwargs: client.invoke(oper, kwargs)
+
+
+class FutureOperations(object):
+    """Non-blocking forms of the operations of a repository or domain object.
+
+    Each operation returns a concurrent.futures.Future for the promoted
+    response, so several requests can be in flight at once::
+
+        answered = channel.futures.answer()
+        moh = channel.futures.startMoh()
+        answered.result()
+        moh.result()
+
+    :param target: Repository or domain object.
+    """
+
+    __slots__ = ('target',)
+
+    def __init__(self, target):
+        self.target = target
+
+    def __repr__(self):
+        return "FutureOperations(%r)" % (self.target,)
+
+    def __getattr__(self, item):
+        """Gets the non-blocking form of an operation.
+
+        :param item: Operation nickname.
+        :raises AttributeError: If item is not one of the target's Swagger
+                                operations.
+        """
+        if item == 'target':
+            raise AttributeError(item)
+        if isinstance(self.target, BaseObject):
+            operations = self.target.context.operations
+        else:
+            operations = self.target.operations
+        if item not in operations:
             raise AttributeError(
-                "'%r' object has no attribute '%s'" % (self, item))
+                "'%r' object has no operation '%s'" % (self.target, item))
+        method = getattr(self.target, item)
+        client = self.target.client
+        return lambda **kwargs: client.submit_operation(method, kwargs)
 
-        # The returned function wraps the underlying operation, promoting the
-        # received HTTP response to a first class object.
-        return lambda **kwargs: promote(self.client, oper(**kwargs), oper.json)
+
+class BulkResult(object):
+    """Results of Repository.bulk().
+
+    Each dict maps object ids to the outcome of the call for that object.
+    """
+
+    def __init__(self):
+        #: Id -> promoted response
+        self.results = {}
+        #: Id -> exception raised by the call
+        self.errors = {}
+        #: Ids of objects which no longer exist, when ignoring them
+        self.missing = []
+
+    def __repr__(self):
+        return "BulkResult(%d results, %d errors, %d missing)" % (
+            len(self.results), len(self.errors), len(self.missing))
+
+    @property
+    def ok(self):
+        """True if no call failed.
+        """
+        return not self.errors
+
+    def add(self, obj_id, future, ignore_missing):
+        """Record the outcome of a call.
+
+        :param obj_id: Id of the object.
+        :param future: Future for the call.
+        :type  future: concurrent.futures.Future
+        :param ignore_missing: If True, 404 Not Found is recorded in missing.
+        """
+        error = future.exception()
+        if error is None:
+            self.results[obj_id] = future.result()
+        elif ignore_missing and isinstance(error, requests.HTTPError) and \
+                error.response is not None and \
+                error.response.status_code == requests.codes.not_found:
+            self.missing.append(obj_id)
+        else:
+            self.errors[obj_id] = error
 
 
 class ObjectIdGenerator(object):
@@ -107,54 +383,157 @@ class DefaultObjectIdGenerator(ObjectIdGenerator):
         return obj_json[self.id_field]
 
 
-class BaseObject(object):
-    """Base class for ARI domain objects.
+class ObjectContext(object):
+    """State shared by all of a client's domain objects of one class.
 
     :param client:  ARI client.
     :type  client:  client.Client
     :param resource:    Associated Swagger resource.
     :type  resource:    swaggerpy.client.Resource
-    :param as_json: JSON representation of this object instance.
-    :type  as_json: dict
-    :param event_reg:
+    :param event_reg: Function registering event callbacks for the class, or
+                      None if its objects have no events.
     """
 
-    id_generator = ObjectIdGenerator()
+    __slots__ = ('client', 'api', 'operations', 'event_reg')
 
-    def __init__(self, client, resource, as_json, event_reg):
+    def __init__(self, client, resource, event_reg):
         self.client = client
         self.api = resource
+        self.operations = resource.operations if resource else {}
+        self.event_reg = event_reg
+
+    def __repr__(self):
+        return "ObjectContext(%r)" % self.api
+
+
+class JsonField(object):
+    """Attribute exposing a field of a domain object's JSON.
+
+    The field is read from the JSON when the attribute is accessed, so the
+    attribute follows changes to the object's JSON.
+
+    :param name: Name of the field.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "JsonField(%s)" % self.name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.json[self.name]
+        except KeyError:
+            raise AttributeError(
+                "'%r' object has no attribute '%s'" % (obj, self.name))
+
+
+class BaseObject(object):
+    """Base class for ARI domain objects.
+
+    Domain objects are created for every response and event, so they are
+    slotted, and keep the client, resource and event registration function in
+    a context shared by all of the client's objects of the same class.
+
+    Operations of the class's resource, and fields of the object's JSON, are
+    available as attributes. Both are added to the class the first time they
+    are looked up, so later accesses on any instance do not come through
+    __getattr__.
+
+    :param client:  ARI client.
+    :type  client:  client.Client
+    :param as_json: JSON representation of this object instance.
+    :type  as_json: dict
+    """
+
+    __slots__ = ('context', 'json', 'id', '__weakref__')
+
+    id_generator = ObjectIdGenerator()
+    #: Id of the Swagger model the class represents, which subclasses of a
+    #: domain class inherit.
+    model_id = None
+    #: Name of the Swagger resource with the class's operations.
+    resource_name = None
+    #: Name of the client method which registers event callbacks for the
+    #: class, if its objects have events.
+    event_reg_name = None
+
+    def __init__(self, client, as_json):
+        try:
+            self.context = client.object_contexts[self.__class__]
+        except KeyError:
+            self.context = client.object_contexts.setdefault(
+                self.__class__, self.build_context(client))
         self.json = as_json
         self.id = self.id_generator.id_as_str(as_json)
-        self.event_reg = event_reg
+
+    @classmethod
+    def build_context(cls, client):
+        """Build the context shared by a client's objects of this class.
+
+        :param client:  ARI client.
+        :type  client:  client.Client
+        :rtype: ObjectContext
+        """
+        event_reg = None
+        if cls.event_reg_name:
+            event_reg = getattr(client, cls.event_reg_name)
+        return ObjectContext(
+            client, client.swagger.get_resource(cls.resource_name), event_reg)
+
+    @property
+    def client(self):
+        """ARI client.
+
+        :rtype: client.Client
+        """
+        return self.context.client
+
+    @property
+    def api(self):
+        """Associated Swagger resource.
+
+        :rtype: swaggerpy.client.Resource
+        """
+        return self.context.api
+
+    @property
+    def event_reg(self):
+        """Function registering event callbacks for this object's class.
+        """
+        return self.context.event_reg
+
+    @property
+    def futures(self):
+        """Non-blocking forms of this object's operations.
+
+        :rtype: FutureOperations
+        """
+        return FutureOperations(self)
 
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, self.id)
 
     def __getattr__(self, item):
         """Promote resource operations related to a single resource to methods
-        on this class.
+        on this class, and fields of the JSON to attributes.
 
         :param item:
         """
-        oper = getattr(self.api, item, None)
-        if not (hasattr(oper, '__call__') and hasattr(oper, 'json')):
+        # Slots which have not been set yet
+        if item in BaseObject.__slots__:
+            raise AttributeError(item)
+        if item in self.context.operations:
+            setattr(self.__class__, item, operation_method(item))
+        elif item in self.json:
+            setattr(self.__class__, item, JsonField(item))
+        else:
             raise AttributeError(
                 "'%r' object has no attribute '%r'" % (self, item))
-
-        def enrich_operation(**kwargs):
-            """Enriches an operation by specifying parameters specifying this
-            object's id (i.e., channelId=self.id), and promotes HTTP response
-            to a first-class object.
-
-            :param kwargs: Operation parameters
-            :return: First class object mapped from HTTP response.
-            """
-            # Add id to param list
-            kwargs.update(self.id_generator.get_params(self.json))
-            return promote(self.client, oper(**kwargs), oper.json)
-
-        return enrich_operation
+        return getattr(self, item)
 
     def on_event(self, event_type, fn, *args, **kwargs):
         """Register event callbacks for this specific domain object.
@@ -167,24 +546,44 @@ class BaseObject(object):
         :param kwargs: Keyword arguments to pass to fn
         """
 
-        def fn_filter(objects, event, *args, **kwargs):
-            """Filter received events for this object.
-
-            :param objects: Objects found in this event.
-            :param event: Event.
-            """
-            if isinstance(objects, dict):
-                if self.id in [c.id for c in objects.values()]:
-                    fn(objects, event, *args, **kwargs)
-            else:
-                if self.id == objects.id:
-                    fn(objects, event, *args, **kwargs)
-
-        if not self.event_reg:
+        if not self.context.event_reg:
             msg = "Event callback registration called on object with no events"
             raise RuntimeError(msg)
 
-        return self.event_reg(event_type, fn_filter, *args, **kwargs)
+        return self.context.client.on_object_id_event(
+            event_type, fn, self.__class__, self.model_id, self.id,
+            *args, **kwargs)
+
+
+def operation_method(nickname):
+    """Build a domain object method for a resource operation.
+
+    The method looks the operation up in the object's context, so one method
+    serves every client.
+
+    :param nickname: Operation nickname.
+    :return: Method.
+    """
+
+    def enrich_operation(self, **kwargs):
+        """Enriches an operation by specifying parameters specifying this
+        object's id (i.e., channelId=self.id), and promotes HTTP response
+        to a first-class object.
+
+        :param kwargs: Operation parameters
+        :return: First class object mapped from HTTP response.
+        """
+        context = self.context
+        oper = context.operations.get(nickname)
+        if oper is None:
+            raise AttributeError(
+                "'%r' object has no attribute '%r'" % (self, nickname))
+        # Add id to param list
+        kwargs.update(self.id_generator.get_params(self.json))
+        return context.client.invoke(oper, kwargs)
+
+    enrich_operation.__name__ = str(nickname)
+    return enrich_operation
 
 
 class Channel(BaseObject):
@@ -195,12 +594,11 @@ class Channel(BaseObject):
     :param channel_json: Instance data
     """
 
+    __slots__ = ()
     id_generator = DefaultObjectIdGenerator('channelId')
-
-    def __init__(self, client, channel_json):
-        super(Channel, self).__init__(
-            client, client.swagger.channels, channel_json,
-            client.on_channel_event)
+    resource_name = 'channels'
+    model_id = 'Channel'
+    event_reg_name = 'on_channel_event'
 
 
 class Bridge(BaseObject):
@@ -211,12 +609,11 @@ class Bridge(BaseObject):
     :param bridge_json: Instance data
     """
 
+    __slots__ = ()
     id_generator = DefaultObjectIdGenerator('bridgeId')
-
-    def __init__(self, client, bridge_json):
-        super(Bridge, self).__init__(
-            client, client.swagger.bridges, bridge_json,
-            client.on_bridge_event)
+    resource_name = 'bridges'
+    model_id = 'Bridge'
+    event_reg_name = 'on_bridge_event'
 
 
 class Playback(BaseObject):
@@ -226,12 +623,12 @@ class Playback(BaseObject):
     :type  client:  client.Client
     :param playback_json: Instance data
     """
-    id_generator = DefaultObjectIdGenerator('playbackId')
 
-    def __init__(self, client, playback_json):
-        super(Playback, self).__init__(
-            client, client.swagger.playbacks, playback_json,
-            client.on_playback_event)
+    __slots__ = ()
+    id_generator = DefaultObjectIdGenerator('playbackId')
+    resource_name = 'playbacks'
+    model_id = 'Playback'
+    event_reg_name = 'on_playback_event'
 
 
 class LiveRecording(BaseObject):
@@ -241,12 +638,12 @@ class LiveRecording(BaseObject):
     :type  client: client.Client
     :param recording_json: Instance data
     """
-    id_generator = DefaultObjectIdGenerator('recordingName', id_field='name')
 
-    def __init__(self, client, recording_json):
-        super(LiveRecording, self).__init__(
-            client, client.swagger.recordings, recording_json,
-            client.on_live_recording_event)
+    __slots__ = ()
+    id_generator = DefaultObjectIdGenerator('recordingName', id_field='name')
+    resource_name = 'recordings'
+    model_id = 'LiveRecording'
+    event_reg_name = 'on_live_recording_event'
 
 
 class StoredRecording(BaseObject):
@@ -256,12 +653,30 @@ class StoredRecording(BaseObject):
     :type  client: client.Client
     :param recording_json: Instance data
     """
-    id_generator = DefaultObjectIdGenerator('recordingName', id_field='name')
 
-    def __init__(self, client, recording_json):
-        super(StoredRecording, self).__init__(
-            client, client.swagger.recordings, recording_json,
-            client.on_stored_recording_event)
+    __slots__ = ()
+    id_generator = DefaultObjectIdGenerator('recordingName', id_field='name')
+    resource_name = 'recordings'
+    model_id = 'StoredRecording'
+    event_reg_name = 'on_stored_recording_event'
+
+    def download(self, dest, chunk_size=CHUNK_SIZE):
+        """Write the recording's file to dest as it is read, without holding
+        it in memory.
+
+        :param dest: File name, file descriptor, or object with a write
+                     method.
+        :param chunk_size: Bytes to read and write at a time.
+        :return: Number of bytes written.
+        :raises AttributeError: If Asterisk does not serve recording files.
+        """
+        oper = self.context.operations.get('getStoredFile')
+        if oper is None:
+            raise AttributeError(
+                "'%r' object has no attribute 'getStoredFile'" % self)
+        return download(self.client, oper,
+                        self.id_generator.get_params(self.json), dest,
+                        chunk_size)
 
 
 # noinspection PyDocstring
@@ -286,12 +701,12 @@ class Endpoint(BaseObject):
     :type  client:  client.Client
     :param endpoint_json: Instance data
     """
-    id_generator = EndpointIdGenerator()
 
-    def __init__(self, client, endpoint_json):
-        super(Endpoint, self).__init__(
-            client, client.swagger.endpoints, endpoint_json,
-            client.on_endpoint_event)
+    __slots__ = ()
+    id_generator = EndpointIdGenerator()
+    resource_name = 'endpoints'
+    model_id = 'Endpoint'
+    event_reg_name = 'on_endpoint_event'
 
 
 class DeviceState(BaseObject):
@@ -299,14 +714,14 @@ class DeviceState(BaseObject):
 
     :param client:  ARI client.
     :type  client:  client.Client
-    :param endpoint_json: Instance data
+    :param device_state_json: Instance data
     """
-    id_generator = DefaultObjectIdGenerator('deviceName', id_field='name')
 
-    def __init__(self, client, device_state_json):
-        super(DeviceState, self).__init__(
-            client, client.swagger.deviceStates, device_state_json,
-            client.on_device_state_event)
+    __slots__ = ()
+    id_generator = DefaultObjectIdGenerator('deviceName', id_field='name')
+    resource_name = 'deviceStates'
+    model_id = 'DeviceState'
+    event_reg_name = 'on_device_state_event'
 
 
 class Sound(BaseObject):
@@ -317,11 +732,11 @@ class Sound(BaseObject):
     :param sound_json: Instance data
     """
 
+    __slots__ = ()
     id_generator = DefaultObjectIdGenerator('soundId')
-
-    def __init__(self, client, sound_json):
-        super(Sound, self).__init__(
-            client, client.swagger.sounds, sound_json, client.on_sound_event)
+    resource_name = 'sounds'
+    model_id = 'Sound'
+    event_reg_name = 'on_sound_event'
 
 
 class Mailbox(BaseObject):
@@ -332,17 +747,19 @@ class Mailbox(BaseObject):
     :param mailbox_json: Instance data
     """
 
+    __slots__ = ()
     id_generator = DefaultObjectIdGenerator('mailboxName', id_field='name')
-
-    def __init__(self, client, mailbox_json):
-        super(Mailbox, self).__init__(
-            client, client.swagger.mailboxes, mailbox_json, None)
+    resource_name = 'mailboxes'
+    model_id = 'Mailbox'
 
 
 def promote(client, resp, operation_json):
     """Promote a response from the request's HTTP response to a first class
      object.
 
+    Operations invoked through the client use the promotion plan compiled
+    for them when the client was built; this compiles one on every call.
+
     :param client:  ARI client.
     :type  client:  client.Client
     :param resp:    HTTP resonse.
@@ -351,24 +768,55 @@ def promote(client, resp, operation_json):
     :type  operation_json: dict
     :return:
     """
-    resp.raise_for_status()
+    return promotion_plan(client, operation_json)(resp)
+
 
+def promotion_plan(client, operation_json):
+    """Compile how the responses of an operation are promoted to first class
+    objects.
+
+    The response class, whether it is a list, and its domain class are
+    worked out once, so that promoting a response is a direct call.
+
+    :param client:  ARI client.
+    :type  client:  client.Client
+    :param operation_json: JSON model from Swagger API.
+    :type  operation_json: dict
+    :return: Function promoting a requests.Response for the operation.
+    """
     response_class = operation_json['responseClass']
     is_list = False
     m = re.match('''List\[(.*)\]''', response_class)
     if m:
         response_class = m.group(1)
         is_list = True
-    factory = CLASS_MAP.get(response_class)
+    factory = client.class_map.get(response_class)
+    loads = client.codec.loads
+    build_object = client.build_object
+
+    if factory and is_list:
+        # noinspection PyDocstring
+        def promote_list(resp):
+            resp.raise_for_status()
+            return [build_object(factory, obj)
+                    for obj in loads(resp.content)]
+        return promote_list
+
     if factory:
-        resp_json = resp.json()
-        if is_list:
-            return [factory(client, obj) for obj in resp_json]
-        return factory(client, resp_json)
-    if resp.status_code == requests.codes.no_content:
-        return None
-    log.info("No mapping for %s; returning JSON" % response_class)
-    return resp.json()
+        # noinspection PyDocstring
+        def promote_object(resp):
+            resp.raise_for_status()
+            return build_object(factory, loads(resp.content))
+        return promote_object
+
+    # noinspection PyDocstring
+    def promote_json(resp):
+        resp.raise_for_status()
+        if resp.status_code == requests.codes.no_content:
+            return None
+        log.info("No mapping for %s; returning JSON" % response_class)
+        return loads(resp.content)
+    return promote_json
 
 
 CLASS_MAP = {
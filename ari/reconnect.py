@@ -0,0 +1,230 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Reconnecting to the event WebSocket, and catching up on missed events.
+"""
+
+import logging
+import random
+import threading
+import websocket
+
+log = logging.getLogger(__name__)
+
+#: Errors which mean the connection to Asterisk failed, and should be retried.
+#: Socket errors and requests' errors are IOErrors.
+CONNECTION_ERRORS = (IOError, websocket.WebSocketException)
+
+
+def iter_messages(ws):
+    """Receive messages from a WebSocket until Asterisk closes it.
+
+    websocket-client returns an empty string from recv() for a close frame.
+
+    :param ws: WebSocket.
+    :return: Generator of message strings.
+    """
+    while True:
+        msg_str = ws.recv()
+        if not msg_str:
+            return
+        yield msg_str
+
+
+class Backoff(object):
+    """Exponential backoff with jitter, for reconnect attempts.
+
+    Each delay is drawn from [(1 - jitter) * base, base], where base doubles
+    (by multiplier) from initial up to maximum, so that many clients which
+    lost Asterisk at once do not reconnect in lockstep.
+
+    :param initial: Base delay before the first retry, in seconds.
+    :param maximum: Largest base delay, in seconds.
+    :param multiplier: Growth of the base delay after each failure.
+    :param jitter: Fraction of the base delay which is randomized.
+    :param retries: Number of consecutive attempts which failed or received
+                    nothing after which to give up, or None to retry forever.
+    """
+
+    def __init__(self, initial=0.1, maximum=30.0, multiplier=2.0, jitter=0.5,
+                 retries=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retries = retries
+        self.failures = 0
+
+    def __repr__(self):
+        return "Backoff(%d failures)" % self.failures
+
+    def reset(self):
+        """Start over after a successful attempt (one which received a
+        message).
+        """
+        self.failures = 0
+
+    def next_delay(self):
+        """Record a failed attempt.
+
+        :return: Seconds to wait before the next attempt, or None to give up.
+        """
+        if self.retries is not None and self.failures >= self.retries:
+            return None
+        base = min(self.initial * self.multiplier ** self.failures,
+                   self.maximum)
+        self.failures += 1
+        return base * (1 - self.jitter * random.random())
+
+
+class Resynchronizer(object):
+    """Catches listeners up on channels and bridges created or destroyed
+    while the WebSocket was down.
+
+    Only the channels and bridges the applications are subscribed to are
+    tracked, since those are the ones they are sent events for. The ones
+    known to exist are tracked from events. After a reconnect, Asterisk
+    lists the channels and bridges, and the applications' subscriptions.
+    A ChannelCreated or BridgeCreated event is dispatched for each
+    subscribed object which is not known, and a ChannelDestroyed or
+    BridgeDestroyed event for each known object which is no longer listed.
+    Synthesized events have a 'synthesized' field set to True; a destroyed
+    object's event carries the last JSON seen for it.
+
+    A Stasis application learns of its channels from StasisStart rather
+    than ChannelCreated, so those channels are known too. A channel which
+    left the application (StasisEnd) is no longer reported on, until it is
+    seen again.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    """
+
+    #: Resource, event field, created event, destroyed event, and the
+    #: Application field listing the subscribed objects.
+    TRACKED = (
+        ('channels', 'channel', 'ChannelCreated', 'ChannelDestroyed',
+         'channel_ids'),
+        ('bridges', 'bridge', 'BridgeCreated', 'BridgeDestroyed',
+         'bridge_ids'),
+    )
+    #: Event, resource and event field for objects entering the application.
+    ENTERED = (('StasisStart', 'channels', 'channel'),)
+    #: Event, resource and event field for objects leaving the application.
+    LEFT = (('StasisEnd', 'channels', 'channel'),)
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        # Resource -> object id -> last JSON seen
+        self.known = {}
+        # Resource -> ids of existing objects which left the application
+        self.left = {}
+        # Number of events dispatched by resync()
+        self.synthesized = 0
+        self.seeded = False
+        self.unsubscribers = []
+
+    def __repr__(self):
+        return "Resynchronizer(%s)" % ', '.join(
+            '%d %s' % (len(objs), name)
+            for (name, objs) in sorted(self.known.items()))
+
+    def start(self):
+        """Track channels and bridges from events.
+        """
+        for (name, field, created, destroyed, _) in self.TRACKED:
+            self.known[name] = {}
+            self.left[name] = set()
+            self.unsubscribers.append(self.client.on_event(
+                created, self.__on_created, name, field))
+            self.unsubscribers.append(self.client.on_event(
+                destroyed, self.__on_destroyed, name, field))
+        for (event_type, name, field) in self.ENTERED:
+            self.unsubscribers.append(self.client.on_event(
+                event_type, self.__on_created, name, field))
+        for (event_type, name, field) in self.LEFT:
+            self.unsubscribers.append(self.client.on_event(
+                event_type, self.__on_left, name, field))
+
+    def stop(self):
+        """Stop tracking.
+        """
+        for unsubscriber in self.unsubscribers:
+            unsubscriber.close()
+        self.unsubscribers = []
+
+    def resync(self, apps):
+        """List the channels and bridges, dispatching events for the ones
+        created or destroyed since they were last known.
+
+        The first call only records what exists.
+
+        :param apps: Applications being run.
+        :type  apps: list of str
+        """
+        applications = [self.__invoke('applications', 'get',
+                                      applicationName=app)
+                        for app in apps]
+        for (name, field, created, destroyed, ids) in self.TRACKED:
+            listed = {obj.id: obj.json
+                      for obj in self.__invoke(name, 'list')}
+            subscribed = set(listed) & set(
+                obj_id for application in applications
+                for obj_id in application.get(ids, ()))
+            with self.lock:
+                known = self.known[name]
+                left = self.left[name] & set(listed)
+                new = subscribed - set(known) - left
+                events = [{'type': created, field: listed[obj_id]}
+                          for obj_id in new]
+                events.extend(
+                    {'type': destroyed, field: known[obj_id]}
+                    for obj_id in set(known) - set(listed))
+                self.known[name] = {
+                    obj_id: listed[obj_id]
+                    for obj_id in (set(known) & set(listed)) | new}
+                self.left[name] = left
+            if not self.seeded:
+                continue
+            for event in events:
+                event['synthesized'] = True
+                self.synthesized += 1
+                log.info("Resync: %s %s", event['type'],
+                         event[field].get('id'))
+                self.client.dispatch_event(event)
+        self.seeded = True
+
+    def __invoke(self, name, nickname, **params):
+        """Invoke an operation with a new request, since cached or shared
+        responses could predate the reconnect.
+
+        :param name: Resource name.
+        :param nickname: Operation nickname.
+        :param params: Operation parameters.
+        :return: Promoted response.
+        """
+        oper = getattr(self.client, name).operations[nickname]
+        return self.client.invoke(oper, params, fresh=True)
+
+    # noinspection PyDocstring
+    def __on_created(self, event, name, field):
+        if not event.get('synthesized'):
+            obj_json = event[field]
+            with self.lock:
+                self.known[name][obj_json['id']] = obj_json
+                self.left[name].discard(obj_json['id'])
+
+    # noinspection PyDocstring
+    def __on_left(self, event, name, field):
+        obj_id = event[field]['id']
+        with self.lock:
+            self.known[name].pop(obj_id, None)
+            self.left[name].add(obj_id)
+
+    # noinspection PyDocstring
+    def __on_destroyed(self, event, name, field):
+        if not event.get('synthesized'):
+            with self.lock:
+                self.known[name].pop(event[field]['id'], None)
@@ -0,0 +1,236 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Loading and caching of the ARI Swagger api-docs.
+"""
+
+import copy
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pprint
+import sys
+import tempfile
+import types
+import urlparse
+import swaggerpy
+
+log = logging.getLogger(__name__)
+
+
+def load_declarations(http_client, resource_listing):
+    """Load all of the API declarations referenced by a resource listing.
+
+    The resource listing is modified in place, in the same way that
+    swaggerpy.Loader.load_resource_listing() does. No processors are applied,
+    so the result may be handed to swaggerpy.client.SwaggerClient.
+
+    :param http_client: HTTP client interface.
+    :type  http_client: swaggerpy.http_client.HttpClient
+    :param resource_listing: Parsed resources.json.
+    :type  resource_listing: dict
+    :return: resource_listing
+    """
+    loader = swaggerpy.Loader(http_client)
+    base_url = resource_listing.get('basePath')
+    for api in resource_listing.get('apis'):
+        loader.load_api_declaration(base_url, api)
+    return resource_listing
+
+
+def load_dir(path):
+    """Load the api-docs from a local directory.
+
+    The directory is laid out like Asterisk's rest-api directory (or
+    sample-api/): a resources.json, and one .json file per API declaration.
+
+    :param path: Directory containing resources.json.
+    :return: Unprocessed resource listing, with API declarations.
+    :rtype:  dict
+    """
+    with open(os.path.join(path, 'resources.json')) as fp:
+        resource_listing = json.load(fp)
+    for api in resource_listing.get('apis'):
+        filename = os.path.basename(api['path'].replace('{format}', 'json'))
+        api['url'] = os.path.join(path, filename)
+        with open(api['url']) as fp:
+            api['api_declaration'] = json.load(fp)
+    return resource_listing
+
+
+def load_module(module):
+    """Load the api-docs from a module written by write_module().
+
+    :param module: Module, or the name of a module.
+    :type  module: module or str
+    :return: Unprocessed resource listing, with API declarations.
+    :rtype:  dict
+    """
+    if isinstance(module, basestring):
+        module = importlib.import_module(module)
+    # The Swagger processors modify the api-docs in place
+    return copy.deepcopy(module.API_DOCS)
+
+
+def write_module(api_docs, filename):
+    """Write api-docs out as a Python module, for use with load_module().
+
+    :param api_docs: Unprocessed resource listing, with API declarations.
+    :param filename: Name of the .py file to write.
+    """
+    with open(filename, 'w') as fp:
+        fp.write('"""ARI api-docs, version %s.\n\nGenerated by ari.spec; '
+                 'do not edit.\n"""\n\n' % api_docs.get('apiVersion'))
+        fp.write('API_DOCS = %s\n' % pprint.pformat(api_docs))
+
+
+def load(spec, base_url=None):
+    """Load the api-docs from a local spec, without any HTTP requests.
+
+    :param spec: Already loaded api-docs, a module written by write_module()
+                 (or its name), or a directory containing resources.json.
+    :type  spec: dict or module or str
+    :param base_url: If given, the basePath of the api-docs is rewritten to
+                     point at this Asterisk server.
+    :return: Unprocessed resource listing, with API declarations.
+    :rtype:  dict
+    """
+    if isinstance(spec, dict):
+        api_docs = copy.deepcopy(spec)
+    elif isinstance(spec, types.ModuleType):
+        api_docs = load_module(spec)
+    elif os.path.isdir(spec):
+        api_docs = load_dir(spec)
+    else:
+        api_docs = load_module(spec)
+
+    if base_url:
+        base_path = urlparse.urljoin(base_url, 'ari')
+        api_docs['basePath'] = base_path
+        for api in api_docs['apis']:
+            api['api_declaration']['basePath'] = base_path
+    return api_docs
+
+
+class SpecCache(object):
+    """On-disk cache of the api-docs for an Asterisk server.
+
+    The cached api-docs are keyed by the ETag of resources.json, if the server
+    provides one, otherwise by the apiVersion of the resource listing. Loading
+    the api-docs through the cache costs a single request for resources.json;
+    the API declarations are only downloaded when that key changes.
+
+    :param cache_dir: Directory to store cached api-docs in.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def __repr__(self):
+        return "SpecCache(%s)" % self.cache_dir
+
+    def path_for(self, url):
+        """Gets the cache file name for a resources.json URL.
+
+        :param url: URL of resources.json.
+        :return: Path of the cache file.
+        """
+        return os.path.join(self.cache_dir,
+                            hashlib.sha1(url).hexdigest() + '.json')
+
+    def load(self, http_client, url):
+        """Load the api-docs for url, from the cache if it's still valid.
+
+        :param http_client: HTTP client interface.
+        :type  http_client: swaggerpy.http_client.HttpClient
+        :param url: URL of resources.json.
+        :return: Unprocessed resource listing, with API declarations.
+        :rtype:  dict
+        """
+        resp = http_client.request('GET', url)
+        resp.raise_for_status()
+        resource_listing = resp.json()
+        key = resp.headers.get('ETag') or resource_listing.get('apiVersion')
+
+        cached = self.read(url)
+        if cached and key and cached['key'] == key and \
+                api_paths(cached['api_docs']) == api_paths(resource_listing):
+            log.debug("Using cached api-docs for %s" % url)
+            return cached['api_docs']
+
+        log.debug("Loading api-docs for %s" % url)
+        resource_listing['url'] = url
+        load_declarations(http_client, resource_listing)
+        if key:
+            self.write(url, key, resource_listing)
+        return resource_listing
+
+    def read(self, url):
+        """Read the cache entry for url.
+
+        :param url: URL of resources.json.
+        :return: Cache entry, or None if not cached or unreadable.
+        :rtype:  dict
+        """
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return None
+        # noinspection PyBroadException
+        try:
+            with open(path) as fp:
+                entry = json.load(fp)
+            if entry.get('url') == url:
+                return entry
+        except Exception:
+            log.warning("Ignoring unreadable api-docs cache %s" % path)
+        return None
+
+    def write(self, url, key, api_docs):
+        """Write the cache entry for url.
+
+        The entry is written to a temporary file and renamed into place, so
+        concurrently starting clients never see a partial entry.
+
+        :param url: URL of resources.json.
+        :param key: ETag or apiVersion the api-docs were loaded for.
+        :param api_docs: Unprocessed resource listing, with API declarations.
+        """
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'url': url, 'key': key, 'api_docs': api_docs}, fp)
+            os.rename(tmp_path, self.path_for(url))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+
+def api_paths(resource_listing):
+    """Gets the API declaration paths from a resource listing.
+
+    :param resource_listing: Resource listing.
+    :return: List of paths.
+    """
+    return [api['path'] for api in resource_listing.get('apis', [])]
+
+
+def main(argv):
+    """Precompile an api-docs directory into a Python module.
+
+    :param argv: Command line arguments.
+    :return: Exit code.
+    """
+    if len(argv) != 3:
+        sys.stderr.write("Usage: %s API_DOCS_DIR OUTPUT.py\n" % argv[0])
+        return 1
+    write_module(load_dir(argv[1]), argv[2])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
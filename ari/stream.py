@@ -0,0 +1,184 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Streaming of response bodies: incremental decoding of list responses, and
+downloads.
+"""
+
+import codecs
+import contextlib
+import errno
+import json
+import os
+import re
+
+#: Bytes read from the response body at a time.
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(chunks):
+    """Decode the elements of a JSON array as its text arrives.
+
+    Only the text of the element being decoded is held, so the memory used
+    does not grow with the length of the array. Elements are decoded with
+    the stdlib json module, whatever the client's codec.
+
+    :param chunks: Iterable of UTF-8 encoded chunks of the array's text.
+    :return: Generator of the decoded elements.
+    :raises ValueError: If the text is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buf = u''
+    pos = 0
+    # What may come next: '[', an element or ']', or ',' or ']'
+    expect = '['
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            pos = WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            char = buf[pos]
+            if expect == '[':
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                pos += 1
+                expect = 'element'
+            elif char == ']' and expect != 'next':
+                return
+            elif expect == ',':
+                if char != ',':
+                    raise ValueError("Expected ',' at %r" % buf[pos:pos + 20])
+                pos += 1
+                expect = 'next'
+            else:
+                try:
+                    (element, end) = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # Wait for the rest of the element
+                    break
+                if end == len(buf):
+                    # A number could continue in the next chunk
+                    break
+                yield element
+                pos = end
+                expect = ','
+    raise ValueError("JSON array is truncated")
+
+
+def iter_objects(client, oper, params, chunk_size=CHUNK_SIZE):
+    """Invoke an operation returning a list, promoting its elements one at a
+    time as the response is read.
+
+    The response body is streamed if the client's HTTP client supports it
+    (see ari.http.PooledHttpClient.streaming); otherwise it is read in full,
+    but still promoted one element at a time.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    :param oper: Swagger operation returning List[...].
+    :param params: Operation parameters.
+    :type  params: dict
+    :param chunk_size: Bytes to read at a time.
+    :return: Generator of domain objects, or of JSON if the element type has
+             no domain class.
+    """
+    response_class = oper.json['responseClass'][len('List['):-1]
+    factory = client.class_map.get(response_class)
+    with contextlib.closing(open_stream(client, oper, params)) as resp:
+        for element in iter_json_array(resp.iter_content(chunk_size)):
+            if factory:
+                element = client.build_object(factory, element)
+            yield element
+
+
+def download(client, oper, params, dest, chunk_size=CHUNK_SIZE):
+    """Invoke an operation, writing its response body to dest as it is read.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    :param oper: Swagger operation.
+    :param params: Operation parameters.
+    :type  params: dict
+    :param dest: File name, file descriptor, or object with a write method.
+                 A file which is only partly written is removed.
+    :param chunk_size: Bytes to read and write at a time.
+    :return: Number of bytes written.
+    """
+    with contextlib.closing(open_stream(client, oper, params)) as resp:
+        chunks = resp.iter_content(chunk_size)
+        if isinstance(dest, int):
+            return write_chunks(chunks, lambda data: write_fd(dest, data))
+        if hasattr(dest, 'write'):
+            return write_chunks(chunks, dest.write)
+
+        directory = os.path.dirname(dest)
+        if directory:
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        fp = open(dest, 'wb')
+        try:
+            with fp:
+                return write_chunks(chunks, fp.write)
+        except Exception:
+            os.remove(dest)
+            raise
+
+
+def open_stream(client, oper, params):
+    """Invoke an operation, streaming the response body if the client's HTTP
+    client supports it (see ari.http.PooledHttpClient.streaming).
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    :param oper: Swagger operation.
+    :param params: Operation parameters.
+    :type  params: dict
+    :return: Successful response, which the caller must close.
+    :rtype:  requests.Response
+    :raises requests.HTTPError: If the request failed.
+    """
+    streaming = getattr(client.http_client, 'streaming', None)
+    if streaming:
+        with streaming():
+            resp = oper(**params)
+    else:
+        resp = oper(**params)
+    try:
+        resp.raise_for_status()
+    except Exception:
+        resp.close()
+        raise
+    return resp
+
+
+def write_chunks(chunks, write):
+    """Write chunks of data.
+
+    :param chunks: Iterable of byte strings.
+    :param write: Function writing a byte string.
+    :return: Number of bytes written.
+    """
+    size = 0
+    for chunk in chunks:
+        write(chunk)
+        size += len(chunk)
+    return size
+
+
+def write_fd(fd, data):
+    """Write all of data to a file descriptor.
+
+    :param fd: File descriptor.
+    :param data: Byte string.
+    """
+    while data:
+        data = data[os.write(fd, data):]
@@ -0,0 +1,189 @@
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+"""Management of an application's event source subscriptions.
+"""
+
+import logging
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+#: Swagger model ids which can be subscribed to, and their event source
+#: schemes.
+EVENT_SOURCES = {
+    'Bridge': 'bridge',
+    'Channel': 'channel',
+    'DeviceState': 'deviceState',
+    'Endpoint': 'endpoint',
+}
+
+
+class SubscriptionManager(object):
+    """Keeps an application's event source subscriptions in sync with the
+    object listeners registered on a client.
+
+    While an object has listeners (through BaseObject.on_event), the
+    applications the client is running are subscribed to it; when its last
+    listener is closed, they are unsubscribed again. Subscription changes
+    made before the client is running are applied when it starts.
+
+    The requests are made in order on a thread of the manager's own, so
+    registering or closing a listener never waits on Asterisk. Once the
+    manager is closed, no more requests are made.
+
+    :param client: ARI client.
+    :type  client: ari.client.Client
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        # Event source -> number of listeners
+        self.refcounts = {}
+        self.apps = []
+        # A single thread keeps the subscription changes in order. Requests
+        # are queued while holding the lock, so they are made in the order
+        # the refcounts changed.
+        self.executor = ThreadPoolExecutor(1)
+        self.closed = False
+
+    def __repr__(self):
+        return "SubscriptionManager(%s)" % ','.join(sorted(self.refcounts))
+
+    @staticmethod
+    def event_source(model_id, obj_id):
+        """Gets the event source URI for an object.
+
+        :param model_id: String id for the object's Swagger model.
+        :param obj_id: Id of the object.
+        :return: Event source, or None if model_id can't be subscribed to.
+        """
+        scheme = EVENT_SOURCES.get(model_id)
+        if scheme:
+            return '%s:%s' % (scheme, obj_id)
+        return None
+
+    def sources(self):
+        """Gets the event sources which should be subscribed to.
+
+        :return: Set of event sources.
+        """
+        with self.lock:
+            return set(self.refcounts)
+
+    def acquire(self, model_id, obj_id):
+        """Record a new listener for an object, subscribing to it if it is
+        the first.
+
+        :param model_id: String id for the object's Swagger model.
+        :param obj_id: Id of the object.
+        """
+        source = self.event_source(model_id, obj_id)
+        if not source:
+            return
+        with self.lock:
+            self.refcounts[source] = self.refcounts.get(source, 0) + 1
+            if self.refcounts[source] == 1:
+                for app in self.apps:
+                    self.__call('subscribe', app, source)
+
+    def release(self, model_id, obj_id):
+        """Record that a listener for an object was closed, unsubscribing
+        from it if it was the last.
+
+        :param model_id: String id for the object's Swagger model.
+        :param obj_id: Id of the object.
+        """
+        source = self.event_source(model_id, obj_id)
+        if not source:
+            return
+        with self.lock:
+            if source not in self.refcounts:
+                return
+            self.refcounts[source] -= 1
+            if self.refcounts[source] == 0:
+                del self.refcounts[source]
+                for app in self.apps:
+                    self.__call('unsubscribe', app, source)
+
+    def start(self, apps):
+        """Subscribe the applications being run to every object which has
+        listeners.
+
+        :param apps: Names of the applications.
+        :type  apps: list of str
+        """
+        with self.lock:
+            self.apps = list(apps)
+            for app in self.apps:
+                for source in sorted(self.refcounts):
+                    self.__call('subscribe', app, source)
+
+    def stop(self):
+        """Stop managing subscriptions for the applications, once the
+        changes already made have been sent. Asterisk drops their
+        subscriptions when the WebSocket closes.
+        """
+        with self.lock:
+            self.apps = []
+        self.flush()
+
+    def flush(self):
+        """Wait until the subscription changes made so far have been sent.
+        Returns immediately if the manager is closed.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            done = self.executor.submit(lambda: None)
+        done.result()
+
+    def close(self):
+        """Stop the manager's thread. Later subscription changes are only
+        counted.
+        """
+        with self.lock:
+            self.closed = True
+            self.executor.shutdown(wait=False)
+
+    def __call(self, operation, app, source):
+        """Queue a request to subscribe or unsubscribe an application. Must
+        be called with the lock held.
+
+        :param operation: 'subscribe' or 'unsubscribe'
+        :param app: Application name.
+        :param source: Event source.
+        """
+        if not self.closed:
+            self.executor.submit(self.__send, operation, app, source)
+
+    def __send(self, operation, app, source):
+        """Subscribe or unsubscribe an application, logging failures.
+
+        The object may already be gone, which is not an error worth raising
+        in the listener that registered or closed the subscription.
+
+        :param operation: 'subscribe' or 'unsubscribe'
+        :param app: Application name.
+        :param source: Event source.
+        """
+        def log_failure(e):
+            """Log a failed subscription change.
+
+            :param e: Exception.
+            """
+            log.warning("Failed to %s %s to %s: %s" %
+                        (operation, app, source, e))
+
+        # noinspection PyBroadException
+        try:
+            result = getattr(self.client.applications, operation)(
+                applicationName=app, eventSource=source)
+            if isinstance(result, Future):
+                result.result()
+        except Exception as e:
+            log_failure(e)
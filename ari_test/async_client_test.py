@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""AsyncClient testing.
+"""
+
+import ari
+import ari.model
+import httpretty
+import requests
+import unittest
+
+from concurrent.futures import Future
+from ari_test.utils import AriTestCase, SAMPLE_API
+from ari_test.websocket_test import WebSocketStubClient, raise_exceptions
+
+BASE_URL = "http://ari.py/ari"
+
+GET = httpretty.GET
+POST = httpretty.POST
+DELETE = httpretty.DELETE
+
+
+# noinspection PyDocstring
+class AsyncClientTest(AriTestCase):
+    def setUp(self):
+        super(AsyncClientTest, self).setUp()
+        self.actual = []
+
+    def record_event(self, event):
+        self.actual.append(event)
+
+    def test_operation_future(self):
+        self.serve(GET, 'channels', body='[{"id": "test-channel"}]')
+        self.serve(DELETE, 'channels', 'test-channel')
+        uut = connect(BASE_URL, [])
+        future = uut.channels.list()
+        self.assertTrue(isinstance(future, Future))
+        channels = future.result(timeout=5)
+        self.assertEqual(['test-channel'], [c.id for c in channels])
+        # Object operations return futures too
+        hangup = channels[0].hangup()
+        self.assertTrue(isinstance(hangup, Future))
+        self.assertEqual(None, hangup.result(timeout=5))
+        self.assertEqual('DELETE', httpretty.last_request().method)
+        self.assertEqual('/ari/channels/test-channel',
+                         httpretty.last_request().path)
+
+    def test_futures(self):
+        self.serve(GET, 'channels', body='[{"id": "test-channel"}]')
+        uut = connect(BASE_URL, [])
+        future = uut.channels.futures.list()
+        channels = future.result(timeout=5)
+        self.assertEqual(['test-channel'], [c.id for c in channels])
+
+    def test_managed_subscriptions(self):
+        self.serve(POST, 'applications', 'test', 'subscription',
+                   body='{"name": "test"}')
+        uut = connect(BASE_URL, ['{"type": "ev"}'], manage_subscriptions=True)
+        channel = ari.model.Channel(uut, {"id": "test-channel"})
+        channel.on_event('ChannelStateChange', lambda c, ev: None)
+        uut.run('test')
+
+        subscription_requests = [
+            (r.method, r.querystring['eventSource'])
+            for r in httpretty.HTTPretty.latest_requests
+            if r.path.startswith('/ari/applications')]
+        self.assertEqual([(POST, ['channel:test-channel'])],
+                         subscription_requests)
+
+    def test_operation_error(self):
+        self.serve(GET, 'channels', body='{"message": "Oops"}', status=500)
+        uut = connect(BASE_URL, [])
+        future = uut.channels.list()
+        self.assertTrue(
+            isinstance(future.exception(timeout=5), requests.HTTPError))
+
+    def test_plain_listener(self):
+        uut = connect(BASE_URL, ['{"type": "ev", "data": 1}'])
+        uut.on_event('ev', self.record_event)
+        uut.run('test')
+        self.assertEqual([{"type": "ev", "data": 1}], self.actual)
+
+    def test_coroutine(self):
+        self.serve(POST, 'channels', 'test-channel', 'answer')
+        self.serve(POST, 'channels', 'test-channel', 'play',
+                   body='{"id": "test-playback"}')
+        messages = [
+            '{"type": "StasisStart", "channel": {"id": "test-channel"}}'
+        ]
+        uut = connect(BASE_URL, messages)
+
+        def on_start(channel, event):
+            answered = yield channel.answer()
+            self.record_event(answered)
+            playback = yield channel.play(media='sound:hello-world')
+            self.record_event(playback.id)
+
+        uut.on_channel_event('StasisStart', on_start)
+        uut.run('test')
+        self.assertEqual([None, 'test-playback'], self.actual)
+
+    def test_yield_list(self):
+        self.serve(GET, 'channels', 'a', body='{"id": "a"}')
+        self.serve(GET, 'channels', 'b', body='{"id": "b"}')
+        uut = connect(BASE_URL, ['{"type": "ev"}'])
+
+        def on_ev(event):
+            channels = yield [uut.channels.get(channelId='a'),
+                              uut.channels.get(channelId='b')]
+            self.record_event([c.id for c in channels])
+
+        uut.on_event('ev', on_ev)
+        uut.run('test')
+        self.assertEqual([['a', 'b']], self.actual)
+
+    def test_interleaved(self):
+        messages = [
+            '{"type": "first"}',
+            '{"type": "second"}'
+        ]
+        uut = connect(BASE_URL, messages)
+        gate = Future()
+
+        def on_first(event):
+            self.record_event('first waiting')
+            result = yield gate
+            self.record_event('first got %s' % result)
+
+        def on_second(event):
+            self.record_event('second')
+            gate.set_result('gate')
+
+        uut.on_event('first', on_first)
+        uut.on_event('second', on_second)
+        uut.run('test')
+        self.assertEqual(['first waiting', 'second', 'first got gate'],
+                         self.actual)
+
+    def test_coroutine_exception(self):
+        self.serve(DELETE, 'channels', 'test-channel', status=404,
+                   body='{"message": "Channel not found"}')
+        messages = [
+            '{"type": "StasisStart", "channel": {"id": "test-channel"}}'
+        ]
+        uut = connect(BASE_URL, messages)
+        uut.exception_handler = self.record_event
+
+        def on_start(channel, event):
+            try:
+                yield channel.hangup()
+            except requests.HTTPError as e:
+                self.record_event(e.response.status_code)
+            yield 'not a future'
+
+        uut.on_channel_event('StasisStart', on_start)
+        uut.run('test')
+        self.assertEqual(404, self.actual[0])
+        self.assertTrue(isinstance(self.actual[1], TypeError))
+        self.assertEqual(set(), uut.tasks)
+
+
+def connect(base_url, messages, **kwargs):
+    """Connect an AsyncClient, with a WebSocket client test double.
+
+    :param base_url: Base URL for REST calls.
+    :param messages: Message strings to return from the WebSocket.
+    :param kwargs: Additional arguments for ari.AsyncClient.
+    :return: AsyncClient with stubbed WebSocket.
+    """
+    http_client = WebSocketStubClient(messages)
+    client = ari.AsyncClient(base_url, http_client, spec=SAMPLE_API,
+                             **kwargs)
+    client.exception_handler = raise_exceptions
+    return client
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,19 @@
 #!/usr/bin/env python
 
 import ari
+import ari.model
 import httpretty
 import json
 import requests
+import threading
+import time
 import unittest
+import weakref
 import urllib
 
-from ari_test.utils import AriTestCase
+from ari.coalesce import RequestCoalescer
+from concurrent.futures import Future
+from ari_test.utils import AriTestCase, SAMPLE_API
 
 
 GET = httpretty.GET
@@ -19,6 +25,7 @@ DELETE = httpretty.DELETE
 # noinspection PyDocstring
 class ClientTest(AriTestCase):
     def test_docs(self):
+        self.serve_api()
         fp = urllib.urlopen("http://ari.py/ari/api-docs/resources.json")
         try:
             actual = json.load(fp)
@@ -50,6 +57,228 @@ class ClientTest(AriTestCase):
         playback = channel.play(media='sound:test-sound')
         playback.stop()
 
+    def test_bound_operations(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        self.serve(POST, 'channels', 'test-channel', 'answer')
+
+        # Repository operations are bound when the client is built
+        self.assertTrue('get' in vars(self.uut.channels))
+        channel = self.uut.channels.get(channelId='test-channel')
+        channel.answer()
+        # Domain object methods are added to the class on first use
+        self.assertTrue('answer' in vars(ari.model.Channel))
+        self.assertEqual('/ari/channels/test-channel/answer',
+                         httpretty.last_request().path)
+
+    def test_compact_objects(self):
+        self.serve(GET, 'channels',
+                   body='[{"id": "c1", "state": "Up"}, {"id": "c2"}]')
+
+        (c1, c2) = self.uut.channels.list()
+        self.assertFalse(hasattr(c1, '__dict__'))
+        self.assertTrue(c1.context is c2.context)
+        self.assertTrue(c1.client is self.uut)
+        self.assertEqual('Up', c1.state)
+        self.assertEqual('Up', weakref.ref(c1)().state)
+        try:
+            c2.state
+            self.fail("c2 has no state")
+        except AttributeError:
+            pass
+
+    def test_bulk(self):
+        self.serve(GET, 'channels', body='[{"id": "c1"}, {"id": "c2"}]')
+        for channel_id in ('c1', 'c2'):
+            self.serve(DELETE, 'channels', channel_id)
+        self.serve(DELETE, 'channels', 'gone', status=404)
+        self.serve(DELETE, 'channels', 'broken', status=500)
+
+        channels = self.uut.channels.list()
+        actual = self.uut.channels.bulk(
+            'hangup', channels + ['gone', 'broken'], concurrency=3,
+            ignore_missing=True, reason='normal')
+        self.assertEqual({'c1': None, 'c2': None}, actual.results)
+        self.assertEqual(['gone'], actual.missing)
+        self.assertEqual(['broken'], actual.errors.keys())
+        self.assertFalse(actual.ok)
+        hangups = [r for r in httpretty.HTTPretty.latest_requests
+                   if r.method == DELETE]
+        self.assertEqual(4, len(hangups))
+        self.assertTrue(all(r.querystring == {'reason': ['normal']}
+                            for r in hangups))
+
+    def test_bulk_without_id(self):
+        try:
+            self.uut.channels.bulk('list', ['c1'])
+            self.fail("list does not take an id")
+        except ValueError:
+            pass
+
+    def test_futures(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        self.serve(POST, 'channels', 'test-channel', 'answer')
+        self.serve(POST, 'channels', 'test-channel', 'mute')
+
+        get = self.uut.channels.futures.get(channelId='test-channel')
+        self.assertTrue(isinstance(get, Future))
+        channel = get.result(timeout=5)
+        self.assertEqual('test-channel', channel.id)
+        futures = [channel.futures.answer(), channel.futures.mute()]
+        self.assertEqual([None, None], [f.result(timeout=5) for f in futures])
+        paths = set(r.path for r in httpretty.HTTPretty.latest_requests)
+        self.assertTrue('/ari/channels/test-channel/answer' in paths)
+        self.assertTrue('/ari/channels/test-channel/mute' in paths)
+
+    def test_bad_future_method(self):
+        try:
+            self.uut.channels.futures.i_am_not_a_method()
+            self.fail("How did it find that method?")
+        except AttributeError:
+            pass
+
+    def test_future_non_operations(self):
+        channel = ari.model.Channel(self.uut, {"id": "test-channel"})
+        for (target, item) in ((self.uut.channels, 'bulk'),
+                               (self.uut.channels, 'iterate'),
+                               (channel, 'on_event'), (channel, 'json')):
+            try:
+                getattr(target.futures, item)
+                self.fail("%s is not an operation" % item)
+            except AttributeError:
+                pass
+
+    def test_coalesce_reads(self):
+        uut = ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                          coalesce_reads=True)
+        received = threading.Event()
+        release = threading.Event()
+        served = []
+
+        def on_get(request, uri, headers):
+            served.append(uri)
+            received.set()
+            release.wait(5)
+            return 200, headers, '{"id": "test-channel"}'
+
+        self.serve(GET, 'channels', 'test-channel', body=on_get)
+        first = uut.channels.futures.get(channelId='test-channel')
+        received.wait(5)
+        second = uut.channels.futures.get(channelId='test-channel')
+        deadline = time.time() + 5
+        while uut.coalescer.stats()['saved'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+
+        self.assertTrue(first.result(5) is second.result(5))
+        self.assertEqual(1, len(served))
+        self.assertEqual({'requests': 1, 'saved': 1}, uut.coalescer.stats())
+        # Nothing is cached once the response has arrived
+        uut.channels.get(channelId='test-channel')
+        self.assertEqual(2, len(served))
+
+    def test_coalesce_interrupted(self):
+        uut = RequestCoalescer()
+        started = threading.Event()
+        results = []
+
+        def interrupted():
+            started.set()
+            # Wait for the second call to share the request
+            deadline = time.time() + 5
+            while uut.stats()['saved'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            raise KeyboardInterrupt()
+
+        def leader():
+            try:
+                uut.call('key', interrupted)
+            except KeyboardInterrupt:
+                results.append('interrupted')
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        started.wait(5)
+        # The waiting call makes its own request, rather than hanging
+        results.append(uut.call('key', lambda: 'retried'))
+        thread.join(5)
+        self.assertEqual(['interrupted', 'retried'], results)
+        self.assertEqual({}, uut.in_flight)
+
+    def test_response_cache(self):
+        uut = ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                          cache_ttls={'sounds.list': 60}, cache_size=1)
+        self.serve(GET, 'sounds', body='[{"id": "hello-world"}]')
+        self.serve(GET, 'channels', body='[]')
+
+        first = uut.sounds.list()
+        self.assertTrue(first is uut.sounds.list())
+        uut.channels.list()
+        uut.channels.list()
+        self.assertEqual(3, len(httpretty.HTTPretty.latest_requests))
+        # The least recently used response is evicted
+        uut.sounds.list(lang='en')
+        uut.sounds.list()
+        self.assertEqual(5, len(httpretty.HTTPretty.latest_requests))
+        self.assertEqual({'entries': 1, 'hits': 1, 'misses': 3,
+                          'evictions': 2, 'invalidations': 0},
+                         uut.response_cache.stats())
+
+    def test_response_cache_expiry(self):
+        uut = ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                          cache_ttls={'recordings.listStored': 0.05})
+        self.serve(GET, 'recordings', 'stored', body='[{"name": "r1"}]')
+        self.serve(DELETE, 'recordings', 'stored', 'r1')
+
+        uut.recordings.listStored()
+        time.sleep(0.1)
+        uut.recordings.listStored()
+        self.assertEqual(2, len(httpretty.HTTPretty.latest_requests))
+        # Changing a recording drops the cached list
+        uut.recordings.deleteStored(recordingName='r1')
+        self.assertEqual(1, uut.response_cache.stats()['invalidations'])
+
+    def test_response_cache_invalidated_in_flight(self):
+        uut = ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                          cache_ttls={'recordings.listStored': 60})
+
+        def on_list(request, uri, headers):
+            # The recording is deleted while its list is in flight
+            uut.response_cache.invalidate('recordings')
+            return 200, headers, '[{"name": "r1"}]'
+
+        self.serve(GET, 'recordings', 'stored', body=on_list)
+        uut.recordings.listStored()
+        self.assertEqual(0, uut.response_cache.stats()['entries'])
+        uut.recordings.listStored()
+        self.assertEqual(2, len(httpretty.HTTPretty.latest_requests))
+
+    def test_response_cache_bad_operation(self):
+        for ttls in ({'sounds.nope': 1}, {'channels.hangup': 1}):
+            try:
+                ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                            cache_ttls=ttls)
+                self.fail("Should not cache %s" % ttls)
+            except ValueError:
+                pass
+
+    def test_promotion_plans(self):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = '[{"id": "c1"}]'
+        list_json = self.uut.channels.operations['list'].json
+        # Compiled per operation, and the same as promote()
+        plan = self.uut.channels.operations['list'].promotion
+        for channels in (plan(resp),
+                         ari.model.promote(self.uut, resp, list_json)):
+            self.assertEqual(['c1'], [c.id for c in channels])
+            self.assertEqual(ari.model.Channel, type(channels[0]))
+
+        resp.status_code = 204
+        answer = self.uut.channels.operations['answer'].promotion
+        self.assertEqual(None, answer(resp))
+
     def test_bad_resource(self):
         try:
             self.uut.i_am_not_a_resource.list()
@@ -146,7 +375,8 @@ class ClientTest(AriTestCase):
 
     def setUp(self):
         super(ClientTest, self).setUp()
-        self.uut = ari.connect('http://ari.py/', 'test', 'test')
+        self.uut = ari.connect('http://ari.py/', 'test', 'test',
+                               spec=SAMPLE_API)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""JSON codec testing.
+"""
+
+import ari
+import httpretty
+import json
+import unittest
+
+from ari.codec import load_codec
+from ari_test.utils import AriTestCase, SAMPLE_API
+from ari_test.websocket_test import WebSocketStubClient
+
+BASE_URL = "http://ari.py/ari"
+
+GET = httpretty.GET
+
+
+class RecordingCodec(object):
+    """Codec which records what it decodes.
+    """
+
+    def __init__(self):
+        self.decoded = []
+
+    def loads(self, s):
+        """Decode, and record s.
+
+        :param s: JSON string.
+        """
+        self.decoded.append(s)
+        return json.loads(s)
+
+    def dumps(self, obj):
+        """Encode obj.
+
+        :param obj: Object to encode.
+        """
+        return json.dumps(obj)
+
+
+# noinspection PyDocstring
+class CodecTest(AriTestCase):
+    def test_default(self):
+        self.assertTrue(load_codec() is json)
+
+    def test_by_name(self):
+        self.assertTrue(load_codec('json') is json)
+
+    def test_fallback(self):
+        self.assertTrue(load_codec('i_am_not_a_codec') is json)
+
+    def test_fastest(self):
+        codec = load_codec('fastest')
+        self.assertEqual({'a': [1]}, codec.loads(codec.dumps({'a': [1]})))
+
+    def test_bad_codec(self):
+        try:
+            load_codec(object())
+            self.fail("Should have rejected codec")
+        except TypeError:
+            pass
+
+    def test_client_codec(self):
+        self.serve(GET, 'channels', body='[{"id": "test-channel"}]')
+        codec = RecordingCodec()
+        messages = ['{"type": "StasisStart", "channel": {"id": "c1"}}']
+        uut = ari.Client(BASE_URL, WebSocketStubClient(messages),
+                         spec=SAMPLE_API, codec=codec)
+        actual = []
+        uut.on_channel_event('StasisStart', lambda c, e: actual.append(c.id))
+
+        self.assertEqual('test-channel', uut.channels.list()[0].id)
+        uut.run('test')
+        self.assertEqual(['c1'], actual)
+        self.assertEqual(['[{"id": "test-channel"}]'] + messages,
+                         codec.decoded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""Generated client testing.
+"""
+
+import httpretty
+import imp
+import os
+import shutil
+import tempfile
+import unittest
+import ari.codegen
+
+from ari_test.utils import AriTestCase
+from ari_test.websocket_test import raise_exceptions, WebSocketStubClient
+
+BASE_URL = "http://ari.py/ari"
+
+GET = httpretty.GET
+POST = httpretty.POST
+DELETE = httpretty.DELETE
+
+
+def generate():
+    """Generate a client module from sample-api.
+
+    :return: Generated module.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'ari_sample_client.py')
+        assert ari.codegen.main(['ari-codegen', 'sample-api', filename]) == 0
+        return imp.load_source('ari_sample_client', filename)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+#: Client module generated from sample-api, shared by the tests.
+GENERATED = generate()
+
+
+# noinspection PyDocstring
+class CodegenTest(AriTestCase):
+    def setUp(self):
+        super(CodegenTest, self).setUp()
+        httpretty.httpretty.latest_requests = []
+        self.uut = GENERATED.connect('http://ari.py/', 'test', 'test')
+
+    def test_no_api_docs(self):
+        self.assertEqual([], httpretty.httpretty.latest_requests)
+        self.assertEqual(GENERATED.ChannelsRepository,
+                         type(self.uut.channels))
+
+    def test_http_options(self):
+        uut = GENERATED.connect('http://ari.py/', 'test', 'test',
+                                pool_maxsize=4, timeout=5, identity_map=True)
+        self.assertEqual(5, uut.http_client.timeout)
+        self.assertTrue(uut.identity_map is not None)
+
+    def test_play(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        self.serve(POST, 'channels', 'test-channel', 'play',
+                   body='{"id": "test-playback"}')
+        self.serve(DELETE, 'playbacks', 'test-playback')
+
+        channel = self.uut.channels.get('test-channel')
+        self.assertEqual(GENERATED.Channel, type(channel))
+        playback = channel.play(media='sound:test-sound', lang=None)
+        self.assertEqual({'media': ['sound:test-sound']},
+                         httpretty.last_request().querystring)
+        self.assertEqual(GENERATED.Playback, type(playback))
+        playback.stop()
+        self.assertEqual('/ari/playbacks/test-playback',
+                         httpretty.last_request().path)
+
+    def test_list(self):
+        self.serve(GET, 'channels', body='[{"id": "c1"}, {"id": "c2"}]')
+        actual = self.uut.channels.list()
+        self.assertEqual(['c1', 'c2'], [c.id for c in actual])
+        self.assertEqual(GENERATED.Channel, type(actual[0]))
+
+    def test_endpoint(self):
+        self.serve(GET, 'endpoints', 'SIP', '1000',
+                   body='{"technology": "SIP", "resource": "1000"}')
+        endpoint = self.uut.endpoints.get(tech='SIP', resource='1000')
+        self.assertEqual('SIP/1000', endpoint.id)
+        endpoint.get()
+        self.assertEqual('/ari/endpoints/SIP/1000',
+                         httpretty.last_request().path)
+
+    def test_json_response(self):
+        self.serve(GET, 'asterisk', 'info', body='{"system": {}}')
+        self.assertEqual({'system': {}}, self.uut.asterisk.getInfo())
+
+    def test_missing_param(self):
+        try:
+            self.uut.channels.play(channelId='test-channel')
+            self.fail("Should have required media")
+        except TypeError:
+            pass
+
+    def test_events(self):
+        messages = [
+            '{"type": "StasisStart", "channel": {"id": "c1"}}',
+            '{"type": "ChannelVarset", "channel": {"id": "c1"}}',
+        ]
+        uut = ari.codegen.GeneratedClient(GENERATED, BASE_URL,
+                                          WebSocketStubClient(messages))
+        uut.exception_handler = raise_exceptions
+        actual = []
+
+        def on_start(channel, event):
+            self.assertEqual(GENERATED.Channel, type(channel))
+            channel.on_event('ChannelVarset',
+                             lambda c, ev: actual.append((c, ev['type'])))
+
+        uut.on_channel_event('StasisStart', on_start)
+        uut.run('test')
+        self.assertEqual(1, len(actual))
+        self.assertEqual(GENERATED.Channel, type(actual[0][0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+
+"""Event dispatcher testing.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+
+from ari.dispatch import event_ids, event_key, EventQueue, \
+    ProcessPoolDispatcher, QueuedDispatcher, ShardRouter, \
+    ThreadPoolDispatcher
+from ari_test.utils import AriTestCase
+from ari_test.websocket_test import connect
+
+BASE_URL = "http://ari.py/ari"
+
+
+# noinspection PyDocstring
+class EventKeyTest(unittest.TestCase):
+    def test_channel(self):
+        self.assertEqual('c1', event_key(
+            {'type': 'ChannelStateChange', 'channel': {'id': 'c1'}}))
+
+    def test_bridge_membership(self):
+        self.assertEqual('b1', event_key(
+            {'type': 'ChannelEnteredBridge', 'channel': {'id': 'c1'},
+             'bridge': {'id': 'b1'}}))
+
+    def test_bridge(self):
+        self.assertEqual('b1', event_key(
+            {'type': 'BridgeDestroyed', 'bridge': {'id': 'b1'}}))
+
+    def test_bridge_merged(self):
+        self.assertEqual(['b1', 'b2'], event_ids(
+            {'type': 'BridgeMerged', 'bridge': {'id': 'b1'},
+             'bridge_from': {'id': 'b2'}}))
+
+    def test_playback(self):
+        self.assertEqual('c1', event_key(
+            {'type': 'PlaybackStarted',
+             'playback': {'id': 'p1', 'target_uri': 'channel:c1'}}))
+
+    def test_none(self):
+        self.assertEqual(None, event_key(
+            {'type': 'EndpointStateChange',
+             'endpoint': {'technology': 'SIP', 'resource': '1000'}}))
+
+
+def apart(count):
+    """Find a channel and a bridge id which hash to different shards.
+
+    :param count: Number of shards.
+    :return: Channel id, bridge id.
+    """
+    bridge_id = 'b1'
+    channel_id = [c for c in ('channel-%d' % i for i in range(100))
+                  if hash(c) % count != hash(bridge_id) % count][0]
+    return channel_id, bridge_id
+
+
+# noinspection PyDocstring
+class ShardRouterTest(unittest.TestCase):
+    def test_join(self):
+        (c1, b1) = apart(4)
+        uut = ShardRouter(4)
+        channel_shard = uut.route(channel_event('StasisStart', c1))[0]
+        bridge_shard = uut.route(
+            {'type': 'BridgeCreated', 'bridge': {'id': b1}})[0]
+        # The channel joins the bridge's shard, once its events are handled
+        self.assertEqual((bridge_shard, [channel_shard]), uut.route(
+            channel_event('ChannelEnteredBridge', c1, bridge={'id': b1})))
+        self.assertEqual((bridge_shard, []), uut.route(
+            channel_event('ChannelHangupRequest', c1)))
+        self.assertEqual((bridge_shard, []), uut.route(
+            channel_event('ChannelLeftBridge', c1, bridge={'id': b1})))
+        self.assertEqual((bridge_shard, []), uut.route(
+            channel_event('ChannelDestroyed', c1)))
+        self.assertEqual({}, uut.moved)
+
+    def test_no_ids(self):
+        uut = ShardRouter(2)
+        self.assertEqual([(0, []), (1, []), (0, [])],
+                         [uut.route({'type': 'ev'}) for _ in range(3)])
+
+
+# noinspection PyDocstring
+class ThreadPoolDispatcherTest(AriTestCase):
+    def setUp(self):
+        super(ThreadPoolDispatcherTest, self).setUp()
+        self.actual = []
+        self.lock = threading.Lock()
+
+    def record_event(self, event):
+        with self.lock:
+            self.actual.append((event['channel']['id'], event['seq']))
+
+    @staticmethod
+    def messages(ids, count):
+        return [json.dumps({'type': 'ev', 'channel': {'id': i}, 'seq': n})
+                for n in range(count) for i in ids]
+
+    def test_ordering(self):
+        ids = ['channel-%d' % i for i in range(10)]
+        uut = connect(BASE_URL, self.messages(ids, 20))
+        uut.on_event('ev', self.record_event)
+        dispatcher = ThreadPoolDispatcher(workers=4)
+        uut.run('test', dispatcher=dispatcher)
+
+        self.assertEqual(200, len(self.actual))
+        for channel_id in ids:
+            seqs = [seq for (i, seq) in self.actual if i == channel_id]
+            self.assertEqual(range(20), seqs)
+        stats = dispatcher.stats()
+        self.assertEqual(0, stats['depth'])
+        self.assertEqual(200, stats['submitted'])
+        self.assertTrue(stats['max_depth'] >= 1)
+
+    def test_bridge_ordering(self):
+        messages = []
+        for n in range(10):
+            for event_type in ('ChannelEnteredBridge', 'ChannelLeftBridge'):
+                messages.append(json.dumps(
+                    {'type': event_type, 'channel': {'id': 'channel-%d' % n},
+                     'bridge': {'id': 'b1'}}))
+        messages.append(json.dumps(
+            {'type': 'BridgeDestroyed', 'bridge': {'id': 'b1'}}))
+        uut = connect(BASE_URL, messages)
+
+        def on_bridge_event(event):
+            if event['type'] == 'ChannelEnteredBridge':
+                time.sleep(0.005)
+            with self.lock:
+                self.actual.append(
+                    (event['type'], event.get('channel', {}).get('id')))
+
+        for event_type in ('ChannelEnteredBridge', 'ChannelLeftBridge',
+                           'BridgeDestroyed'):
+            uut.on_event(event_type, on_bridge_event)
+        uut.run('test', dispatcher=ThreadPoolDispatcher(workers=4))
+
+        expected = [(json.loads(m)['type'],
+                     json.loads(m).get('channel', {}).get('id'))
+                    for m in messages]
+        self.assertEqual(expected, self.actual)
+
+    def test_channel_in_bridge_ordering(self):
+        (c1, b1) = apart(4)
+        bridge = {'id': b1}
+        events = [
+            channel_event('StasisStart', c1),
+            {'type': 'BridgeCreated', 'bridge': bridge},
+            channel_event('ChannelEnteredBridge', c1, bridge=bridge),
+            channel_event('ChannelVarset', c1),
+            channel_event('ChannelHangupRequest', c1),
+            channel_event('ChannelLeftBridge', c1, bridge=bridge),
+            channel_event('StasisEnd', c1),
+            channel_event('ChannelDestroyed', c1),
+            {'type': 'BridgeDestroyed', 'bridge': bridge},
+        ]
+        uut = connect(BASE_URL, [json.dumps(e) for e in events])
+
+        def on_event(event):
+            if event['type'] in ('StasisStart', 'BridgeCreated',
+                                 'ChannelHangupRequest'):
+                # Let later events overtake, if they could
+                time.sleep(0.02)
+            with self.lock:
+                self.actual.append(event['type'])
+
+        for event_type in set(e['type'] for e in events):
+            uut.on_event(event_type, on_event)
+        uut.run('test', dispatcher=ThreadPoolDispatcher(workers=4))
+
+        for obj_id in (c1, b1):
+            expected = [e['type'] for e in events if obj_id in event_ids(e)]
+            self.assertEqual(expected,
+                             [t for t in self.actual if t in expected])
+
+    def test_parallel(self):
+        # Find two channels which are assigned to different workers
+        ids = ['channel-%d' % i for i in range(10)]
+        slow = ids[0]
+        fast = [i for i in ids if hash(i) % 2 != hash(slow) % 2][0]
+        uut = connect(BASE_URL, self.messages([slow, fast], 1))
+        released = threading.Event()
+
+        def on_ev(event):
+            if event['channel']['id'] == slow:
+                # Would deadlock if events were dispatched serially
+                self.assertTrue(released.wait(5))
+            else:
+                released.set()
+            self.record_event(event)
+
+        uut.on_event('ev', on_ev)
+        uut.run('test', dispatcher=ThreadPoolDispatcher(workers=2))
+        self.assertEqual([(fast, 0), (slow, 0)], self.actual)
+        self.assertEqual('InlineDispatcher',
+                         uut.dispatcher.__class__.__name__)
+
+
+# noinspection PyDocstring
+class ProcessPoolDispatcherTest(AriTestCase):
+    def test_sharding(self):
+        ids = ['channel-%d' % i for i in range(10)]
+        messages = ThreadPoolDispatcherTest.messages(ids, 10)
+        messages.append('{"type": "ev_without_channel"}')
+        results = multiprocessing.Queue()
+
+        def setup(client):
+            def on_ev(event):
+                results.put((os.getpid(), event['channel']['id'],
+                             event['seq']))
+
+            client.on_event('ev', on_ev)
+            client.on_event('ev_without_channel',
+                            lambda event: results.put('no channel'))
+
+        uut = connect(BASE_URL, messages)
+        uut.on_event('ev', lambda event: self.fail("Called in reader"))
+        dispatcher = ProcessPoolDispatcher(
+            lambda: connect(BASE_URL, []), setup, workers=3)
+        uut.run('test', dispatcher=dispatcher)
+
+        actual = [results.get(timeout=5) for _ in messages]
+        self.assertTrue('no channel' in actual)
+        actual.remove('no channel')
+        pids = set()
+        for channel_id in ids:
+            handled = [(pid, seq) for (pid, i, seq) in actual
+                       if i == channel_id]
+            # Each channel is handled by a single worker, in order
+            self.assertEqual(1, len(set(pid for (pid, seq) in handled)))
+            self.assertEqual(range(10), [seq for (pid, seq) in handled])
+            pids.add(handled[0][0])
+        self.assertFalse(os.getpid() in pids)
+        self.assertEqual(101, sum(dispatcher.stats()['submitted']))
+
+
+def channel_event(event_type, channel_id, **kwargs):
+    event = {'type': event_type, 'channel': {'id': channel_id}}
+    event.update(kwargs)
+    return event
+
+
+# noinspection PyDocstring
+class EventQueueTest(unittest.TestCase):
+    def drain(self, uut):
+        uut.close()
+        return [item[0] for item in iter(uut.get, None)]
+
+    def test_bad_policy(self):
+        try:
+            EventQueue(10, 'explode')
+            self.fail("Should have rejected policy")
+        except ValueError:
+            pass
+
+    def test_block(self):
+        uut = EventQueue(1, 'block')
+        uut.put(channel_event('ChannelVarset', 'c1'))
+        second = channel_event('ChannelVarset', 'c2')
+        putter = threading.Thread(target=uut.put, args=(second,))
+        putter.start()
+        deadline = time.time() + 5
+        while uut.stats()['blocked'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(1, uut.stats()['blocked'])
+        first = uut.get()[0]
+        putter.join(5)
+        self.assertEqual('c1', first['channel']['id'])
+        self.assertEqual([second], self.drain(uut))
+
+    def test_drop_oldest_non_critical(self):
+        uut = EventQueue(3, 'drop')
+        start = channel_event('StasisStart', 'c1')
+        varset = channel_event('ChannelVarset', 'c1')
+        dialplan = channel_event('ChannelDialplan', 'c1')
+        end = channel_event('StasisEnd', 'c1')
+        for event in (start, varset, dialplan, end):
+            uut.put(event)
+        self.assertEqual([start, dialplan, end], self.drain(uut))
+        self.assertEqual(1, uut.stats()['dropped'])
+
+    def test_drop_incoming(self):
+        uut = EventQueue(2, 'drop')
+        start = channel_event('StasisStart', 'c1')
+        dtmf = channel_event('ChannelDtmfReceived', 'c1')
+        uut.put(start)
+        uut.put(dtmf)
+        uut.put(channel_event('ChannelVarset', 'c1'))
+        self.assertEqual([start, dtmf], self.drain(uut))
+        self.assertEqual(1, uut.stats()['dropped'])
+
+    def test_conflate(self):
+        uut = EventQueue(4, 'conflate')
+        events = [
+            channel_event('ChannelStateChange', 'c1', seq=1),
+            channel_event('ChannelStateChange', 'c2', seq=2),
+            channel_event('ChannelVarset', 'c1', variable='A', seq=3),
+            channel_event('ChannelUserevent', 'c1', eventname='A', seq=4),
+            channel_event('ChannelStateChange', 'c1', seq=5),
+            channel_event('ChannelVarset', 'c1', variable='A', seq=6),
+            channel_event('ChannelUserevent', 'c1', eventname='B', seq=7),
+        ]
+        for event in events:
+            uut.put(event)
+        actual = [event['seq'] for event in self.drain(uut)]
+        # Superseded snapshots are removed; the rest stay in order
+        self.assertEqual([4, 5, 6, 7], actual)
+        self.assertEqual(2, uut.stats()['conflated'])
+        self.assertEqual(1, uut.stats()['dropped'])
+
+    def test_conflate_not_full(self):
+        uut = EventQueue(10, 'conflate')
+        for seq in range(3):
+            uut.put(channel_event('ChannelStateChange', 'c1', seq=seq))
+        self.assertEqual([0, 1, 2], [e['seq'] for e in self.drain(uut)])
+        self.assertEqual(0, uut.stats()['conflated'])
+
+    def test_conflate_after_get(self):
+        uut = EventQueue(1, 'conflate')
+        uut.put(channel_event('ChannelStateChange', 'c1', seq=1))
+        self.assertEqual(1, uut.get()[0]['seq'])
+        uut.put(channel_event('ChannelStateChange', 'c1', seq=2))
+        uut.put(channel_event('ChannelStateChange', 'c1', seq=3))
+        self.assertEqual([3], [e['seq'] for e in self.drain(uut)])
+
+
+# noinspection PyDocstring
+class QueuedDispatcherTest(AriTestCase):
+    def test_run(self):
+        ids = ['channel-%d' % i for i in range(5)]
+        uut = connect(BASE_URL, ThreadPoolDispatcherTest.messages(ids, 20))
+        actual = []
+        uut.on_event('ev', lambda event: actual.append(
+            (event['channel']['id'], event['seq'])))
+        dispatcher = QueuedDispatcher(
+            maxsize=10, overflow='block',
+            dispatcher=ThreadPoolDispatcher(workers=2))
+        uut.run('test', dispatcher=dispatcher)
+
+        self.assertEqual(100, len(actual))
+        for channel_id in ids:
+            self.assertEqual(range(20), [seq for (i, seq) in actual
+                                         if i == channel_id])
+        stats = dispatcher.stats()
+        self.assertEqual(0, stats['depth'])
+        self.assertEqual(0, stats['dropped'])
+        self.assertTrue(stats['max_depth'] <= 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""HTTP transport testing.
+"""
+
+import httpretty
+import threading
+import unittest
+import ari
+
+from ari_test.utils import AriTestCase, SAMPLE_API
+
+GET = httpretty.GET
+
+
+# noinspection PyDocstring
+class PooledHttpClientTest(AriTestCase):
+    def connect(self, **kwargs):
+        return ari.connect('http://ari.py/', 'test', 'test', spec=SAMPLE_API,
+                           **kwargs)
+
+    def test_options(self):
+        uut = self.connect(pool_maxsize=4, max_retries=2, timeout=5,
+                           keep_alive=False)
+        http_client = uut.http_client
+        self.assertEqual(5, http_client.timeout)
+        self.assertEqual(4, http_client.adapter._pool_maxsize)
+        self.assertEqual(2, http_client.adapter.max_retries.total)
+        self.assertEqual('close', http_client.session.headers['Connection'])
+
+    def test_stats(self):
+        self.serve(GET, 'channels', body='[]')
+        uut = self.connect(pool_maxsize=2, pool_block=True)
+
+        def list_channels():
+            for _ in range(5):
+                uut.channels.list()
+
+        threads = [threading.Thread(target=list_channels) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = uut.http_client.stats()
+        self.assertEqual(20, stats['requests'])
+        self.assertTrue(1 <= stats['connections'] <= 2)
+        self.assertEqual(20 - stats['connections'], stats['reused'])
+
+    def test_streaming(self):
+        self.serve(GET, 'channels', body='[]')
+        http_client = self.connect().http_client
+        url = self.build_url('channels')
+        with http_client.streaming():
+            resp = http_client.request(GET, url)
+        self.assertFalse(resp._content_consumed)
+        self.assertEqual('[]', resp.content)
+        resp = http_client.request(GET, url)
+        self.assertTrue(resp._content_consumed)
+
+
+if __name__ == '__main__':
+    unittest.main()
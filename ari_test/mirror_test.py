@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""State mirror testing.
+"""
+
+import ari
+import httpretty
+import json
+import time
+import unittest
+
+from ari.mirror import StateMirror
+from ari.reconnect import Backoff
+from ari_test.utils import AriTestCase, SAMPLE_API
+from ari_test.async_client_test import connect as connect_async
+from ari_test.websocket_test import connect, WebSocketStubClient
+
+BASE_URL = "http://ari.py/ari"
+
+GET = httpretty.GET
+
+
+def event(event_type, **kwargs):
+    kwargs['type'] = event_type
+    return json.dumps(kwargs)
+
+
+# noinspection PyDocstring
+class StateMirrorTest(AriTestCase):
+    def setUp(self):
+        super(StateMirrorTest, self).setUp()
+        self.serve_lists('[{"id": "c1", "state": "Ring"}]')
+
+    def serve_lists(self, channels):
+        self.serve(GET, 'channels', body=channels)
+        self.serve(GET, 'bridges', body='[{"id": "b1", "channels": []}]')
+        self.serve(GET, 'endpoints',
+                   body='[{"technology": "SIP", "resource": "1000",'
+                        ' "state": "online"}]')
+
+    def test_seed(self):
+        uut = StateMirror(connect(BASE_URL, []))
+        uut.start()
+        uut.stop()
+        self.assertEqual(['c1'], uut.channels.keys())
+        self.assertEqual('Ring', uut.channels['c1'].json['state'])
+        self.assertEqual(['b1'], uut.bridges.keys())
+        self.assertEqual(['SIP/1000'], uut.endpoints.keys())
+
+    def test_events(self):
+        messages = [
+            event('ChannelStateChange', channel={'id': 'c1', 'state': 'Up'}),
+            event('ChannelCreated', channel={'id': 'c2', 'state': 'Down'}),
+            event('BridgeCreated', bridge={'id': 'b2', 'channels': []}),
+            event('ChannelEnteredBridge', channel={'id': 'c2'},
+                  bridge={'id': 'b2', 'channels': ['c2']}),
+            event('ChannelDestroyed', channel={'id': 'c1'}),
+            event('BridgeDestroyed', bridge={'id': 'b1'}),
+            event('EndpointStateChange', endpoint={
+                'technology': 'SIP', 'resource': '1000',
+                'state': 'offline'}),
+        ]
+        client = connect(BASE_URL, messages)
+        uut = StateMirror(client)
+        uut.start()
+        client.run('test')
+        uut.stop()
+
+        self.assertEqual(['c2'], uut.channels.keys())
+        self.assertEqual(['b2'], uut.bridges.keys())
+        self.assertEqual(['c2'], uut.bridges['b2'].json['channels'])
+        self.assertEqual('offline',
+                         uut.endpoints['SIP/1000'].json['state'])
+        self.assertEqual({}, client.event_listeners)
+
+    def test_subscribe(self):
+        self.serve(httpretty.POST, 'applications', 'test', 'subscription',
+                   body='{"name": "test"}')
+        http_client = WebSocketStubClient([])
+        http_client.connections = [[], ['{"type": "Done"}']]
+        client = ari.Client(BASE_URL, http_client, spec=SAMPLE_API)
+        client.on_event('Done', lambda ev: client.close())
+        uut = StateMirror(client)
+        uut.subscribe('test')
+        uut.start()
+        # Not until the application is connected
+        self.assertEqual(GET, httpretty.last_request().method)
+        client.run('test', reconnect=Backoff(initial=0.01), resync=False)
+        uut.stop()
+
+        subscription_requests = [
+            r.querystring['eventSource']
+            for r in httpretty.HTTPretty.latest_requests
+            if r.path.startswith('/ari/applications')]
+        # Subscribed again after reconnecting
+        self.assertEqual([['channel:,bridge:,endpoint:']] * 2,
+                         subscription_requests)
+
+    def test_reconcile(self):
+        uut = StateMirror(connect(BASE_URL, []))
+        uut.start()
+        uut.stop()
+        # c1 hung up, and the event was missed
+        httpretty.reset()
+        self.serve_lists('[]')
+        uut.reconcile()
+        self.assertEqual({}, uut.channels)
+        self.assertEqual(['b1'], uut.bridges.keys())
+        self.assertEqual(1, uut.corrections)
+
+    def test_reconcile_during_events(self):
+        client = connect(BASE_URL, [])
+        uut = StateMirror(client)
+        uut.start()
+        uut.stop()
+
+        def list_channels(request, uri, headers):
+            # c1 hangs up, and c2 is created, while the list is in flight
+            client.dispatch_event(
+                {'type': 'ChannelDestroyed', 'channel': {'id': 'c1'}})
+            client.dispatch_event(
+                {'type': 'ChannelCreated', 'channel': {'id': 'c2'}})
+            return 200, headers, '[{"id": "c1"}]'
+
+        uut.start()
+        httpretty.reset()
+        self.serve_lists(list_channels)
+        uut.reconcile()
+        uut.stop()
+        self.assertEqual(['c2'], uut.channels.keys())
+        self.assertEqual(0, uut.corrections)
+
+    def test_reconcile_async(self):
+        uut = StateMirror(connect_async(BASE_URL, []))
+        uut.start()
+        uut.stop()
+        self.assertEqual(['c1'], uut.channels.keys())
+        self.assertEqual(['b1'], uut.bridges.keys())
+
+    def test_reconcile_interval(self):
+        uut = StateMirror(connect(BASE_URL, []), reconcile_interval=0.01)
+        uut.start()
+        deadline = time.time() + 5
+        while uut.reconciles < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        uut.stop()
+        self.assertTrue(uut.reconciles >= 3)
+        self.assertEqual(0, uut.corrections)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""api-docs loading and caching tests.
+"""
+
+import ari
+import httpretty
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import ari.spec
+
+from ari_test.utils import AriTestCase
+
+GET = httpretty.GET
+
+
+# noinspection PyDocstring
+class SpecCacheTest(AriTestCase):
+    def setUp(self):
+        super(SpecCacheTest, self).setUp()
+        self.serve_api()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(SpecCacheTest, self).tearDown()
+        shutil.rmtree(self.cache_dir)
+
+    def connect(self):
+        httpretty.httpretty.latest_requests = []
+        return ari.connect('http://ari.py/', 'test', 'test',
+                           cache_dir=self.cache_dir)
+
+    def serve_listing(self, version='0.0.0-test', **kwargs):
+        # httpretty rotates through repeated registrations of a URL, so
+        # start over instead of registering resources.json a second time
+        httpretty.reset()
+        for filename in os.listdir('sample-api'):
+            if filename.endswith('.json'):
+                with open(os.path.join('sample-api', filename)) as fp:
+                    body = fp.read()
+                if filename == 'resources.json':
+                    body = body.replace('0.0.0-test', version)
+                    self.serve(GET, 'api-docs', filename, body=body, **kwargs)
+                else:
+                    self.serve(GET, 'api-docs', filename, body=body)
+
+    def api_doc_requests(self):
+        return [r.path for r in httpretty.httpretty.latest_requests
+                if '/api-docs/' in r.path]
+
+    def test_cold_cache(self):
+        uut = self.connect()
+        self.assertTrue(len(self.api_doc_requests()) > 1)
+        self.assertTrue('channels' in uut.repositories)
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+    def test_warm_cache(self):
+        self.connect()
+        uut = self.connect()
+        self.assertEqual(['/ari/api-docs/resources.json'],
+                         self.api_doc_requests())
+        self.assertTrue('channels' in uut.repositories)
+        self.assertTrue('StasisStart' in uut.event_models)
+
+        self.serve(GET, 'channels', body='[{"id": "test-channel"}]')
+        self.assertEqual('test-channel', uut.channels.list()[0].id)
+
+    def test_version_change(self):
+        self.connect()
+        self.serve_listing(version='0.0.1-test')
+        self.connect()
+        self.assertTrue(len(self.api_doc_requests()) > 1)
+
+    def test_etag(self):
+        self.serve_listing(adding_headers={'ETag': '"1"'})
+        self.connect()
+        self.connect()
+        self.assertEqual(1, len(self.api_doc_requests()))
+
+        self.serve_listing(adding_headers={'ETag': '"2"'})
+        self.connect()
+        self.assertTrue(len(self.api_doc_requests()) > 1)
+
+    def test_corrupt_cache(self):
+        self.connect()
+        for filename in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, filename), 'w') as fp:
+                fp.write('{"not json')
+        uut = self.connect()
+        self.assertTrue(len(self.api_doc_requests()) > 1)
+        self.assertTrue('channels' in uut.repositories)
+
+
+# noinspection PyDocstring
+class OfflineSpecTest(AriTestCase):
+    def setUp(self):
+        super(OfflineSpecTest, self).setUp()
+        httpretty.httpretty.latest_requests = []
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(OfflineSpecTest, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def check_client(self, uut):
+        self.assertEqual([], httpretty.httpretty.latest_requests)
+        self.assertTrue('StasisStart' in uut.event_models)
+        self.serve(GET, 'channels', body='[{"id": "test-channel"}]')
+        self.assertEqual('test-channel', uut.channels.list()[0].id)
+
+    def test_dir(self):
+        self.check_client(
+            ari.connect('http://ari.py/', 'test', 'test', spec='sample-api'))
+
+    def test_module(self):
+        filename = os.path.join(self.tmp_dir, 'ari_sample_spec.py')
+        self.assertEqual(0, ari.spec.main(['ari.spec', 'sample-api',
+                                           filename]))
+        sys.path.insert(0, self.tmp_dir)
+        try:
+            uut = ari.connect('http://ari.py/', 'test', 'test',
+                              spec='ari_sample_spec')
+        finally:
+            sys.path.remove(self.tmp_dir)
+            sys.modules.pop('ari_sample_spec', None)
+        self.check_client(uut)
+
+    def test_base_url(self):
+        api_docs = ari.spec.load('sample-api', 'http://localhost:8088/')
+        self.assertEqual('http://localhost:8088/ari', api_docs['basePath'])
+        for api in api_docs['apis']:
+            self.assertEqual('http://localhost:8088/ari',
+                             api['api_declaration']['basePath'])
+
+    def test_spec_not_modified(self):
+        api_docs = ari.spec.load_dir('sample-api')
+        expected = ari.spec.load_dir('sample-api')
+        ari.connect('http://ari.py/', 'test', 'test', spec=api_docs)
+        self.assertEqual(expected, api_docs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""Streaming response testing.
+"""
+
+import ari
+import ari.model
+import httpretty
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ari.stream import iter_json_array
+from ari_test.utils import AriTestCase
+
+GET = httpretty.GET
+POST = httpretty.POST
+
+
+def chunked(text, size):
+    """Split text into UTF-8 encoded chunks.
+
+    :param text: Unicode text.
+    :param size: Bytes per chunk.
+    :return: List of chunks.
+    """
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+# noinspection PyDocstring
+class IterJsonArrayTest(unittest.TestCase):
+    def test_chunk_sizes(self):
+        expected = [{"id": "c1", "name": u"caf\u00e9"}, 12345, "a,]",
+                    [1, [2]], None, {}]
+        text = u' [ %s ] ' % u' ,\n'.join(json.dumps(e) for e in expected)
+        for size in (1, 2, 3, 7, 1024):
+            self.assertEqual(expected,
+                             list(iter_json_array(chunked(text, size))))
+
+    def test_empty(self):
+        self.assertEqual([], list(iter_json_array(chunked(u'[ ]', 1))))
+
+    def test_not_array(self):
+        for text in (u'{"id": "c1"}', u'[1 2]', u'[1, 2', u''):
+            try:
+                list(iter_json_array(chunked(text, 1)))
+                self.fail("Should not decode %r" % text)
+            except ValueError:
+                pass
+
+
+# noinspection PyDocstring
+class IterateTest(AriTestCase):
+    def test_iterate(self):
+        self.serve(GET, 'channels',
+                   body=json.dumps([{"id": "c%d" % i} for i in range(100)]))
+        actual = self.uut.channels.iterate('list', chunk_size=16)
+        first = next(actual)
+        self.assertEqual(ari.model.Channel, type(first))
+        self.assertEqual(['c%d' % i for i in range(100)],
+                         [first.id] + [c.id for c in actual])
+
+    def test_iterate_json(self):
+        self.serve(GET, 'sounds', body='[{"id": "hello-world"}]')
+        # Sounds have no domain class
+        self.assertEqual([{"id": "hello-world"}],
+                         list(self.uut.sounds.iterate('list')))
+
+    def test_iterate_error(self):
+        self.serve(GET, 'channels', body='{"message": "Oops"}', status=500)
+        try:
+            list(self.uut.channels.iterate('list'))
+            self.fail("Should have raised")
+        except Exception as e:
+            self.assertEqual(500, e.response.status_code)
+
+    def test_iterate_not_list(self):
+        try:
+            self.uut.channels.iterate('get', channelId='c1')
+            self.fail("get does not return a list")
+        except ValueError:
+            pass
+
+
+#: Contents of a recording's file.
+AUDIO = ''.join(chr(i % 256) for i in range(100000))
+
+
+# noinspection PyDocstring
+class DownloadTest(AriTestCase):
+    def setUp(self):
+        super(DownloadTest, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(DownloadTest, self).tearDown()
+        shutil.rmtree(self.tmp_dir)
+
+    def serve_recording(self, name, **kwargs):
+        self.serve(GET, 'recordings', 'stored', name, 'file', **kwargs)
+
+    def test_download_sink(self):
+        self.serve(GET, 'recordings', 'stored', 'r1',
+                   body='{"name": "r1", "format": "wav"}')
+        self.serve_recording('r1', body=AUDIO)
+        recording = self.uut.recordings.getStored(recordingName='r1')
+        sink = io.BytesIO()
+        self.assertEqual(len(AUDIO), recording.download(sink, chunk_size=7))
+        self.assertEqual(AUDIO, sink.getvalue())
+
+    def test_download_fd(self):
+        self.serve_recording('r1', body=AUDIO)
+        filename = os.path.join(self.tmp_dir, 'r1.wav')
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT)
+        try:
+            self.uut.recordings.download('getStoredFile', fd,
+                                         recordingName='r1')
+        finally:
+            os.close(fd)
+        with open(filename, 'rb') as fp:
+            self.assertEqual(AUDIO, fp.read())
+
+    def test_bulk_download(self):
+        self.serve(GET, 'recordings', 'stored',
+                   body='[{"name": "r1", "format": "wav"},'
+                        ' {"name": "calls/r2", "format": "gsm"}]')
+        self.serve_recording('r1', body=AUDIO)
+        self.serve_recording('calls/r2', body=AUDIO[:10])
+        self.serve_recording('gone', status=404)
+
+        recordings = self.uut.recordings.listStored()
+        actual = self.uut.recordings.bulk_download(
+            'getStoredFile', recordings + ['gone'], self.tmp_dir,
+            concurrency=2, ignore_missing=True)
+        self.assertEqual({'r1': len(AUDIO), 'calls/r2': 10}, actual.results)
+        self.assertEqual(['gone'], actual.missing)
+        with open(os.path.join(self.tmp_dir, 'calls', 'r2.gsm'), 'rb') as fp:
+            self.assertEqual(AUDIO[:10], fp.read())
+        # Nothing is written for failed requests
+        self.assertEqual(['calls', 'r1.wav'], sorted(os.listdir(self.tmp_dir)))
+
+
+if __name__ == '__main__':
+    unittest.main()
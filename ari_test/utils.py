@@ -5,11 +5,18 @@ import os
 import unittest
 import urlparse
 import ari
+import ari.spec
 import requests
 
+#: api-docs from sample-api/, loaded once for all tests.
+SAMPLE_API = ari.spec.load_dir('sample-api')
+
 
 class AriTestCase(unittest.TestCase):
     """Base class for mock ARI server.
+
+    The client is built from the sample-api spec, so the api-docs are only
+    served over HTTP for tests which call serve_api().
     """
 
     BASE_URL = "http://ari.py/ari"
@@ -19,8 +26,8 @@ class AriTestCase(unittest.TestCase):
         """
         super(AriTestCase, self).setUp()
         httpretty.enable()
-        self.serve_api()
-        self.uut = ari.connect('http://ari.py/', 'test', 'test')
+        self.uut = ari.connect('http://ari.py/', 'test', 'test',
+                               spec=SAMPLE_API)
 
     def tearDown(self):
         """Cleanup.
@@ -3,12 +3,17 @@
 """WebSocket testing.
 """
 
+import gc
+import socket
 import unittest
 import ari
+import ari.model
 import httpretty
 
-from ari_test.utils import AriTestCase
+from ari.reconnect import Backoff
+from ari_test.utils import AriTestCase, SAMPLE_API
 from swaggerpy.http_client import SynchronousHttpClient
+from websocket import WebSocketConnectionClosedException
 
 BASE_URL = "http://ari.py/ari"
 
@@ -51,6 +56,22 @@ class WebSocketTest(AriTestCase):
         ]
         self.assertEqual(expected, self.actual)
 
+    def test_skip_without_listeners(self):
+        messages = [
+            '{"type": "ev", "data": 1}',
+            '{"type": "ChannelVarset", "channel": {"id": "c1"}}',
+            '{"type" : "not_ev", "data": 3}',
+            '{"type": "not_ev", "nested": {"type": "ev"}}',
+            '{"type": "StasisStart", "channel": {"id": "c1"}}'
+        ]
+        uut = connect(BASE_URL, messages)
+        uut.on_event("ev", self.record_event)
+        uut.on_object_id_event("StasisStart", self.noop,
+                               ari.model.Channel, "Channel", "c2")
+        uut.run('test')
+        self.assertEqual([{"type": "ev", "data": 1}], self.actual)
+        self.assertEqual(2, uut.skipped_events)
+
     def test_unsubscribe(self):
         messages = [
             '{"type": "ev", "data": 1}',
@@ -140,6 +161,132 @@ class WebSocketTest(AriTestCase):
         ]
         self.assertEqual(expected, self.actual)
 
+    def test_subclass_on_event(self):
+        messages = [
+            '{"type": "StasisEnd", "channel": {"id": "test-channel"}}',
+        ]
+
+        # noinspection PyDocstring
+        class MyChannel(ari.model.Channel):
+            __slots__ = ()
+
+        uut = connect(BASE_URL, messages)
+        channel = MyChannel(uut, {"id": "test-channel"})
+        channel.on_event('StasisEnd', lambda c, ev: self.record_event(c))
+        # A plain Channel listener for the same channel gets a Channel
+        plain = ari.model.Channel(uut, {"id": "test-channel"})
+        plain.on_event('StasisEnd', lambda c, ev: self.record_event(c))
+        uut.run('test')
+        self.assertEqual(['test-channel'] * 2, [c.id for c in self.actual])
+        self.assertEqual([MyChannel, ari.model.Channel],
+                         [type(c) for c in self.actual])
+
+    def test_channel_on_event_unsubscribe(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        messages = [
+            '{"type": "ChannelStateChange", "channel": {"id": "test-channel"}}'
+        ] * 2
+
+        uut = connect(BASE_URL, messages)
+        channel = uut.channels.get(channelId='test-channel')
+
+        def only_once(channel, event):
+            self.record_event(event)
+            self.once.close()
+
+        self.once = channel.on_event('ChannelStateChange', only_once)
+        uut.run('test')
+
+        expected = [
+            {"type": "ChannelStateChange", "channel": {"id": "test-channel"}}
+        ]
+        self.assertEqual(expected, self.actual)
+        self.assertEqual({}, uut.object_listeners)
+        # The second event was skipped, now that nothing listens for it
+        self.assertEqual({}, uut.object_routes)
+        self.assertEqual(1, uut.skipped_events)
+
+    def test_managed_subscriptions(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        self.serve(POST, 'applications', 'test', 'subscription',
+                   body='{"name": "test"}')
+        self.serve(DELETE, 'applications', 'test', 'subscription',
+                   body='{"name": "test"}')
+        messages = [
+            '{"type": "ChannelStateChange", "channel": {"id": "test-channel"}}'
+        ]
+
+        uut = connect(BASE_URL, messages, manage_subscriptions=True)
+        channel = uut.channels.get(channelId='test-channel')
+
+        def cb(channel, event):
+            self.record_event(event)
+            self.first.close()
+            second.close()
+
+        self.first = channel.on_event('ChannelStateChange', cb)
+        second = channel.on_event('ChannelVarset', self.noop)
+        # Nothing to subscribe until the application is running
+        self.assertEqual(GET, httpretty.last_request().method)
+        self.assertEqual(set(['channel:test-channel']),
+                         uut.subscriptions.sources())
+        uut.run('test')
+
+        subscription_requests = [
+            (r.method, r.querystring['eventSource'])
+            for r in httpretty.HTTPretty.latest_requests
+            if r.path.startswith('/ari/applications')]
+        self.assertEqual([(POST, ['channel:test-channel']),
+                          (DELETE, ['channel:test-channel'])],
+                         subscription_requests)
+        self.assertEqual(set(), uut.subscriptions.sources())
+
+    def test_managed_subscriptions_close(self):
+        self.serve(POST, 'applications', 'test', 'subscription',
+                   body='{"name": "test"}')
+        messages = [
+            '{"type": "ChannelStateChange", "channel": {"id": "c1"}}'
+        ]
+        for reconnect in (False, True):
+            uut = connect(BASE_URL, messages, manage_subscriptions=True)
+            channel = ari.model.Channel(uut, {"id": "c1"})
+
+            def cb(channel, event):
+                uut.close()
+                # Closing listeners after the client is closed is harmless
+                listener.close()
+
+            listener = channel.on_event('ChannelStateChange', cb)
+            uut.run('test', reconnect=reconnect, resync=False)
+            self.assertEqual(set(), uut.subscriptions.sources())
+
+    def test_bridge_on_event_multiple_fields(self):
+        self.serve(GET, 'bridges', 'test-bridge',
+                   body='{"id": "test-bridge"}')
+        messages = [
+            '{"type": "BridgeMerged", "bridge": {"id": "ignore-me"}, '
+            '"bridge_from": {"id": "test-bridge"}}',
+            '{"type": "BridgeMerged", "bridge": {"id": "ignore-me"}, '
+            '"bridge_from": {"id": "ignore-me-too"}}'
+        ]
+
+        uut = connect(BASE_URL, messages)
+        bridge = uut.bridges.get(bridgeId='test-bridge')
+
+        def cb(bridges, event):
+            self.record_event(
+                sorted((k, v.id) for (k, v) in bridges.items()))
+
+        bridge.on_event('BridgeMerged', cb)
+        uut.run('test')
+
+        expected = [
+            [('bridge', 'ignore-me'), ('bridge_from', 'test-bridge')]
+        ]
+        self.assertEqual(expected, self.actual)
+
     def test_arbitrary_callback_arguments(self):
         self.serve(GET, 'channels', 'test-channel',
                    body='{"id": "test-channel"}')
@@ -173,6 +320,236 @@ class WebSocketTest(AriTestCase):
         expected = [1, 2, obj, 2.0, None, [1, 2, 3]]
         self.assertEqual(expected, self.actual)
 
+    def test_shared_objects(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel"}')
+        messages = [
+            '{"type": "StasisStart", "channel": {"id": "test-channel"}}',
+            '{"type": "StasisStart", "channel": {"id": "test-channel"}}'
+        ]
+        uut = connect(BASE_URL, messages)
+        channel = uut.channels.get(channelId='test-channel')
+        created = []
+
+        def factory(client, channel_json):
+            obj = ari.model.Channel(client, channel_json)
+            created.append(obj)
+            return obj
+
+        def cb(channel, event, *args):
+            self.record_event(channel)
+
+        uut.on_object_event('StasisStart', cb, factory, 'Channel')
+        uut.on_object_event('StasisStart', cb, factory, 'Channel', 1)
+        uut.on_object_event('StasisStart', cb, factory, 'Channel', 2)
+        uut.on_channel_event('StasisStart', cb)
+        channel.on_event('StasisStart', cb)
+        uut.run('test')
+
+        # One object per event for the three factory listeners
+        self.assertEqual(2, len(created))
+        self.assertEqual(10, len(self.actual))
+        self.assertEqual([created[0]] * 3, self.actual[0:3])
+        self.assertTrue(self.actual[3] is self.actual[4])
+        self.assertFalse(self.actual[3] is self.actual[8])
+        self.assertEqual({}, uut.promoted)
+
+    def test_identity_map(self):
+        self.serve(GET, 'channels', 'test-channel',
+                   body='{"id": "test-channel", "state": "Ring"}')
+        messages = [
+            '{"type": "ChannelStateChange",'
+            ' "channel": {"id": "test-channel", "state": "Up"}}',
+            '{"type": "ChannelStateChange",'
+            ' "channel": {"id": "other-channel", "state": "Up"}}',
+        ]
+
+        uut = connect(BASE_URL, messages, identity_map=True)
+        channel = uut.channels.get(channelId='test-channel')
+        self.assertTrue(channel is uut.channels.get(channelId='test-channel'))
+        uut.on_channel_event('ChannelStateChange',
+                             lambda c, ev: self.record_event(c))
+        uut.run('test')
+
+        self.assertTrue(channel is self.actual[0])
+        self.assertEqual('Up', channel.json['state'])
+        self.assertEqual('other-channel', self.actual[1].id)
+        # Only objects which are still referenced are kept
+        del self.actual[:]
+        gc.collect()
+        self.assertEqual([(ari.model.Channel, 'test-channel')],
+                         uut.identity_map.keys())
+
+    def test_futures_in_listener(self):
+        self.serve(POST, 'channels', 'test-channel', 'answer')
+        self.serve(POST, 'channels', 'test-channel', 'ring')
+        messages = [
+            '{"type": "StasisStart", "channel": {"id": "test-channel"}}',
+        ]
+
+        def on_start(channel, event):
+            futures = [channel.futures.answer(), channel.futures.ring()]
+            self.record_event([f.result(timeout=5) for f in futures])
+
+        uut = connect(BASE_URL, messages)
+        uut.on_channel_event('StasisStart', on_start)
+        uut.run('test')
+        self.assertEqual([[None, None]], self.actual)
+
+    def test_response_cache_invalidation(self):
+        self.serve(GET, 'endpoints', body='[]')
+        messages = [
+            '{"type": "EndpointStateChange",'
+            ' "endpoint": {"technology": "SIP", "resource": "1000"}}',
+        ]
+
+        uut = connect(BASE_URL, messages, cache_ttls={'endpoints.list': 60})
+        uut.endpoints.list()
+        uut.endpoints.list()
+        uut.run('test')
+        uut.endpoints.list()
+        self.assertEqual({'entries': 1, 'hits': 1, 'misses': 2,
+                          'evictions': 0, 'invalidations': 1},
+                         uut.response_cache.stats())
+
+    def serve_application(self, *bodies):
+        """Serve the test application's subscriptions, one body per request,
+        then the last one.
+        """
+        self.serve(GET, 'applications', 'test', responses=[
+            httpretty.Response(body) for body in bodies])
+
+    def test_reconnect(self):
+        self.serve(GET, 'channels', responses=[
+            httpretty.Response('[{"id": "c1"}, {"id": "c2"}, {"id": "x1"}]'),
+            httpretty.Response('[{"id": "c1"}, {"id": "c3"}, {"id": "x2"}]'),
+        ])
+        # x1 and x2 are not the application's, so are not reported on
+        self.serve_application('{"channel_ids": ["c1", "c2"]}',
+                               '{"channel_ids": ["c1", "c3"],'
+                               ' "bridge_ids": ["b1"]}')
+        self.serve(GET, 'bridges', responses=[
+            httpretty.Response('[]'),
+            httpretty.Response('[{"id": "b1"}]'),
+        ])
+        http_client = WebSocketStubClient([])
+        http_client.connections = [
+            ['{"type": "ChannelDestroyed", "channel": {"id": "c2"}}'],
+            socket.error("Connection refused"),
+            ['{"type": "Done"}'],
+        ]
+        uut = ari.Client(BASE_URL, http_client, spec=SAMPLE_API)
+        uut.exception_handler = raise_exceptions
+        for event_type in ('ChannelCreated', 'ChannelDestroyed',
+                           'BridgeCreated'):
+            uut.on_event(event_type, lambda ev: self.record_event(
+                (ev['type'], ev.get('channel', ev.get('bridge'))['id'],
+                 ev.get('synthesized', False))))
+        uut.on_event('Done', lambda ev: uut.close())
+        uut.run('test', reconnect=Backoff(initial=0.01))
+
+        self.assertEqual([('ChannelDestroyed', 'c2', False),
+                          ('ChannelCreated', 'c3', True),
+                          ('BridgeCreated', 'b1', True)], self.actual)
+        # The refused connection was never opened
+        self.assertEqual(1, uut.reconnects)
+        self.assertEqual([], http_client.connections)
+
+    def test_reconnect_after_error(self):
+        self.serve(GET, 'channels', responses=[
+            httpretty.Response('[{"id": "c1"}]'),
+            httpretty.Response('[{"id": "c1"}]'),
+            httpretty.Response('[{"id": "c1"}, {"id": "c2"}]'),
+        ])
+        self.serve(GET, 'bridges', body='[]')
+        self.serve_application('{"channel_ids": ["c1", "c2"]}')
+        http_client = WebSocketStubClient([])
+        http_client.connections = [
+            ['{"type": "ev"}', WebSocketConnectionClosedException()],
+            ['{"type": "Done"}'],
+        ]
+        uut = ari.Client(BASE_URL, http_client, spec=SAMPLE_API,
+                         cache_ttls={'channels.list': 60})
+        uut.exception_handler = raise_exceptions
+        uut.on_event('ChannelCreated', lambda ev: self.record_event(
+            ev['channel']['id']))
+        uut.on_event('Done', lambda ev: uut.close())
+        uut.channels.list()
+        uut.run('test', reconnect=Backoff(initial=0.01))
+
+        self.assertEqual(1, uut.reconnects)
+        # Resync does not use the cached list, which is dropped
+        self.assertEqual(['c2'], self.actual)
+        self.assertEqual(['c1', 'c2'], [c.id for c in uut.channels.list()])
+
+    def test_reconnect_stasis(self):
+        self.serve(GET, 'channels', responses=[
+            httpretty.Response('[]'),
+            httpretty.Response('[{"id": "c1"}, {"id": "c2"}, {"id": "c3"}]'),
+        ])
+        self.serve(GET, 'bridges', body='[]')
+        self.serve_application('{"channel_ids": ["c1", "c2", "c3"]}')
+        http_client = WebSocketStubClient([])
+        http_client.connections = [
+            # Stasis applications are not sent ChannelCreated
+            ['{"type": "StasisStart", "channel": {"id": "c1"}}',
+             '{"type": "StasisStart", "channel": {"id": "c2"}}',
+             '{"type": "StasisEnd", "channel": {"id": "c2"}}'],
+            ['{"type": "Done"}'],
+        ]
+        uut = ari.Client(BASE_URL, http_client, spec=SAMPLE_API)
+        uut.exception_handler = raise_exceptions
+        uut.on_event('ChannelCreated', lambda ev: self.record_event(
+            ev['channel']['id']))
+        uut.on_event('Done', lambda ev: uut.close())
+        uut.run('test', reconnect=Backoff(initial=0.01))
+
+        # Only c3 is new to the application
+        self.assertEqual(['c3'], self.actual)
+
+    def test_reconnect_gives_up(self):
+        http_client = WebSocketStubClient([])
+        http_client.connections = [socket.error("Connection refused")] * 3
+        uut = ari.Client(BASE_URL, http_client, spec=SAMPLE_API)
+        try:
+            uut.run('test', reconnect=Backoff(initial=0.01, retries=2),
+                    resync=False)
+            self.fail("Should have given up")
+        except socket.error:
+            pass
+        self.assertEqual([], http_client.connections)
+
+    def test_reconnect_clean_close(self):
+        http_client = WebSocketStubClient([])
+        # Closed by Asterisk without a message, then after one
+        http_client.connections = [[], [], ['{"type": "ev"}'], [], []]
+        uut = ari.Client(BASE_URL, http_client, spec=SAMPLE_API)
+        uut.on_event('ev', self.record_event)
+        backoff = Backoff(initial=0.01, retries=2)
+        delays = []
+        next_delay = backoff.next_delay
+
+        def record_delay():
+            delays.append(backoff.failures)
+            return next_delay()
+
+        backoff.next_delay = record_delay
+        uut.run('test', reconnect=backoff, resync=False)
+
+        # Every close waits; the message starts the delays over
+        self.assertEqual([0, 1, 0, 1, 2], delays)
+        self.assertEqual([{'type': 'ev'}], self.actual)
+        self.assertEqual([], http_client.connections)
+
+    def test_backoff(self):
+        uut = Backoff(initial=1, maximum=5, jitter=0.5, retries=5)
+        delays = [uut.next_delay() for _ in range(6)]
+        for (delay, base) in zip(delays, [1, 2, 4, 5, 5]):
+            self.assertTrue(base / 2.0 <= delay <= base)
+        self.assertEqual(None, delays[-1])
+        uut.reset()
+        self.assertTrue(uut.next_delay() <= 1)
+
     def test_bad_event_type(self):
         uut = connect(BASE_URL, [])
         try:
@@ -208,11 +585,16 @@ class WebSocketStubConnection(object):
     def recv(self):
         """Fake receive method
 
-        :return: Next message, or None if no more messages.
+        :return: Next message, or '' (as for a close frame) if no more
+                 messages.
+        :raises Exception: If the next message is an exception.
         """
         if self.messages:
-            return str(self.messages.pop())
-        return None
+            message = self.messages.pop()
+            if isinstance(message, Exception):
+                raise message
+            return str(message)
+        return ''
 
     def send_close(self):
         """Fake send_close method
@@ -235,6 +617,8 @@ class WebSocketStubClient(SynchronousHttpClient):
     def __init__(self, messages):
         super(WebSocketStubClient, self).__init__()
         self.messages = messages
+        # If set, the messages (or exception to raise) for each connection
+        self.connections = None
 
     def ws_connect(self, url, params=None):
         """Fake connect method.
@@ -246,6 +630,11 @@ class WebSocketStubClient(SynchronousHttpClient):
         :param params: Ignored.
         :return: Stub connection.
         """
+        if self.connections is not None:
+            messages = self.connections.pop(0)
+            if isinstance(messages, Exception):
+                raise messages
+            return WebSocketStubConnection(messages)
         return WebSocketStubConnection(self.messages)
 
 
@@ -257,16 +646,17 @@ def raise_exceptions(ex):
     raise
 
 
-def connect(base_url, messages):
+def connect(base_url, messages, **kwargs):
     """Connect, with a WebSocket client test double that merely retuns the
      series of given messages.
 
     :param base_url: Base URL for REST calls.
     :param messages: Message strings to return from the WebSocket.
+    :param kwargs: Additional arguments for ari.Client.
     :return: ARI client with stubbed WebSocket.
     """
     http_client = WebSocketStubClient(messages)
-    client = ari.Client(base_url, http_client)
+    client = ari.Client(base_url, http_client, spec=SAMPLE_API, **kwargs)
     client.exception_handler = raise_exceptions
     return client
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""Benchmark of JSON codecs on realistic ARI payloads.
+
+Compares the stdlib json module against each installed codec from
+ari.codec.FAST_CODECS, decoding typical WebSocket events and a large
+channels.list response.
+
+::
+
+    $ PYTHONPATH=. python benchmarks/codec_bench.py
+"""
+
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+import importlib
+import json
+import timeit
+
+from ari.codec import FAST_CODECS
+
+
+def channel(n):
+    """Build a realistic channel JSON object.
+
+    :param n: Channel number.
+    :return: Channel.
+    """
+    return {
+        "id": "1413987323.%d" % n,
+        "name": "PJSIP/1000-%08x" % n,
+        "state": "Up",
+        "caller": {"name": "Alice", "number": "1000"},
+        "connected": {"name": "", "number": ""},
+        "accountcode": "",
+        "dialplan": {"context": "default", "exten": "7000", "priority": 2},
+        "creationtime": "2014-10-22T09:15:23.486-0500",
+        "language": "en",
+    }
+
+
+EVENTS = {
+    'StasisStart': {
+        "type": "StasisStart", "application": "hello",
+        "timestamp": "2014-10-22T09:15:23.497-0500",
+        "args": ["arg1", "arg2"], "channel": channel(1),
+    },
+    'ChannelVarset': {
+        "type": "ChannelVarset", "application": "hello",
+        "timestamp": "2014-10-22T09:15:23.501-0500",
+        "variable": "CHANNEL(language)", "value": "en",
+        "channel": channel(1),
+    },
+    'ChannelDtmfReceived': {
+        "type": "ChannelDtmfReceived", "application": "hello",
+        "timestamp": "2014-10-22T09:15:25.118-0500",
+        "digit": "5", "duration_ms": 120, "channel": channel(1),
+    },
+}
+
+CHANNEL_LIST = [channel(n) for n in range(500)]
+
+
+def bench(codec, payload, number):
+    """Time decoding a payload.
+
+    :param codec: Codec module.
+    :param payload: JSON string.
+    :param number: Number of decodes per timing run.
+    :return: Best time per decode, in microseconds.
+    """
+    timer = timeit.Timer(lambda: codec.loads(payload))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main():
+    """Run the benchmark, and print a table of results.
+    """
+    codecs = [('json', json)]
+    for name in FAST_CODECS:
+        try:
+            codecs.append((name, importlib.import_module(name)))
+        except ImportError:
+            print("%s is not installed; skipping" % name)
+
+    payloads = [(name, json.dumps(event), 20000)
+                for (name, event) in sorted(EVENTS.items())]
+    payloads.append(('channels.list (500)', json.dumps(CHANNEL_LIST), 50))
+
+    print("%-22s %s" % ('payload', ' '.join('%18s' % c for (c, _) in codecs)))
+    for (name, payload, number) in payloads:
+        baseline = None
+        cells = []
+        for (_, codec) in codecs:
+            usec = bench(codec, payload, number)
+            baseline = baseline or usec
+            cells.append('%9.1fus %5.1fx' % (usec, baseline / usec))
+        print("%-22s %s" % (name, ' '.join('%18s' % c for c in cells)))
+
+
+if __name__ == '__main__':
+    main()
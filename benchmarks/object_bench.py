@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""Benchmark of domain object memory use and construction time.
+
+Builds Channel objects the way event dispatch does, reporting the memory
+held by each object (not counting its JSON, which is shared with the event)
+and the time to construct one.
+
+::
+
+    $ PYTHONPATH=. python benchmarks/object_bench.py
+"""
+
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+import sys
+import timeit
+
+import ari.client
+import ari.spec
+
+from ari.model import Channel
+from codec_bench import channel
+from swaggerpy.http_client import SynchronousHttpClient
+
+
+def object_size(obj):
+    """Gets the memory held by an object itself, and its __dict__ if it has
+    one.
+
+    :param obj: Object.
+    :return: Size in bytes.
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main():
+    """Run the benchmark, and print the results.
+    """
+    client = ari.client.Client('http://localhost:8088/',
+                               SynchronousHttpClient(),
+                               spec=ari.spec.load_dir('sample-api'))
+    channel_json = channel(1)
+
+    obj = Channel(client, channel_json)
+    print("bytes per object:   %d" % object_size(obj))
+
+    number = 100000
+    timer = timeit.Timer(lambda: Channel(client, channel_json))
+    usec = min(timer.repeat(repeat=5, number=number)) / number * 1e6
+    print("construction time:  %.2fus" % usec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Benchmark of response promotion.
+
+Promotes a small response for every operation in sample-api, once by
+compiling the promotion on every call (ari.model.promote), and once with the
+plans compiled when the client was built, as Client.invoke does.
+
+::
+
+    $ PYTHONPATH=. python benchmarks/promote_bench.py
+"""
+
+#
+# Copyright (c) 2013, Digium, Inc.
+#
+
+import requests
+import timeit
+
+import ari.client
+import ari.model
+import ari.spec
+
+from swaggerpy.http_client import SynchronousHttpClient
+
+#: JSON with the id fields of every domain class.
+OBJECT = '{"id": "x", "name": "x", "technology": "SIP", "resource": "1000"}'
+
+
+def response(operation_json):
+    """Build a response for an operation.
+
+    :param operation_json: JSON model from Swagger API.
+    :return: Response with a single object, a list of one, or no content.
+    :rtype:  requests.Response
+    """
+    resp = requests.Response()
+    response_class = operation_json['responseClass']
+    if response_class == 'void':
+        resp.status_code = requests.codes.no_content
+        resp._content = ''
+    else:
+        resp.status_code = requests.codes.ok
+        resp._content = OBJECT
+        if response_class.startswith('List['):
+            resp._content = '[%s]' % OBJECT
+    return resp
+
+
+def main():
+    """Run the benchmark, and print the results.
+    """
+    client = ari.client.Client('http://localhost:8088/',
+                               SynchronousHttpClient(),
+                               spec=ari.spec.load_dir('sample-api'))
+    opers = [(oper, response(oper.json))
+             for repo in client.repositories.values()
+             for oper in repo.operations.values()
+             if not oper.json.get('is_websocket')]
+
+    def per_call():
+        for (oper, resp) in opers:
+            ari.model.promote(client, resp, oper.json)
+
+    def compiled():
+        for (oper, resp) in opers:
+            oper.promotion(resp)
+
+    number = 2000
+    print("%d operations" % len(opers))
+    for (name, fn) in (('promote()', per_call), ('compiled plan', compiled)):
+        timer = timeit.Timer(fn)
+        usec = min(timer.repeat(repeat=5, number=number)) / number / \
+            len(opers) * 1e6
+        print("%-15s %.2fus per response" % (name, usec))
+
+
+if __name__ == '__main__':
+    main()
@@ -28,5 +28,8 @@ setup(
         "Programming Language :: Python",
     ],
     tests_require=["coverage", "httpretty", "nose", "tissue"],
-    install_requires=["swaggerpy"],
+    install_requires=["futures", "swaggerpy"],
+    entry_points={
+        "console_scripts": ["ari-codegen = ari.codegen:main"],
+    },
 )